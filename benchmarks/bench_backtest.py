@@ -0,0 +1,89 @@
+#
+# bench_backtest -- compares a moving average crossover backtest on
+# candles with fxcmpy_replay and with the vectorized backtest_candles(),
+# and runs a parameter sweep with one and several processes.
+#
+# The speedup of the sweep is bounded by the number of CPUs.
+#
+# usage: PYTHONPATH=. python benchmarks/bench_backtest.py
+#
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from fxcmpy import backtest_candles, fxcmpy_replay, run_parameter_sweep
+
+CANDLES = 100000
+GRID = {'fast': [5, 10, 20, 40, 80], 'slow': [100, 200, 400, 800]}
+
+
+def make_candles(candles):
+    random = np.random.RandomState(0)
+    close = 1.2 + random.standard_normal(candles).cumsum() * 3e-4
+    opens = np.concatenate(([1.2], close[:-1]))
+    spread = random.uniform(1e-4, 3e-4, candles)
+    return pd.DataFrame({'bidopen': opens, 'bidclose': close,
+                         'bidhigh': np.maximum(opens, close),
+                         'bidlow': np.minimum(opens, close),
+                         'askopen': opens + spread, 'askclose': close + spread,
+                         'askhigh': np.maximum(opens, close) + spread,
+                         'asklow': np.minimum(opens, close) + spread},
+                        index=pd.date_range('2010-01-01', periods=candles,
+                                            freq='h', name='date'))
+
+
+def crossover(data, fast, slow):
+    close = data['bidclose']
+    return np.sign(close.rolling(fast).mean() -
+                   close.rolling(slow).mean()).fillna(0).to_numpy()
+
+
+def replay_crossover(data, fast, slow):
+    """ The same strategy executed bar by bar at the close. """
+    signals = crossover(data, fast, slow)
+    replay = fxcmpy_replay({'EUR/USD': data})
+    state = {'row': 0, 'position': 0}
+
+    def on_candle(msg, prices):
+        target = signals[state['row']]
+        state['row'] += 1
+        if target != state['position']:
+            state['position'] = target
+            replay.close_all_for_symbol(msg['Symbol'])
+            if target > 0:
+                replay.create_market_buy_order(msg['Symbol'], 10)
+            elif target < 0:
+                replay.create_market_sell_order(msg['Symbol'], 10)
+    replay.subscribe_market_data('EUR/USD', (on_candle,))
+    replay.run(close_positions=True)
+    return replay.balance - 50000
+
+
+if __name__ == '__main__':
+    data = make_candles(CANDLES)
+    print('%s candles, %s CPUs' % (CANDLES, os.cpu_count()))
+    t0 = time.perf_counter()
+    replayed = replay_crossover(data, 20, 200)
+    t1 = time.perf_counter()
+    result = backtest_candles(data, crossover(data, 20, 200),
+                              execution='close')
+    t2 = time.perf_counter()
+    print('one backtest: replay {:6.3f} s | vectorized {:6.4f} s | '
+          'speedup {:5.0f}x | P&L {:.2f} / {:.2f}'
+          .format(t1 - t0, t2 - t1, (t1 - t0) / (t2 - t1), replayed,
+                  result['pnl'].iloc[-1]))
+
+    sets = np.prod([len(values) for values in GRID.values()])
+    results = list()
+    for processes in (1, os.cpu_count() or 1, 4):
+        t0 = time.perf_counter()
+        run_parameter_sweep(data, crossover, GRID, processes=processes)
+        seconds = time.perf_counter() - t0
+        results.append(seconds)
+        print('sweep of {} sets, {} processes: {:6.3f} s | {:6.1f} sets/s '
+              '| speedup {:4.1f}x'.format(sets, processes, seconds,
+                                          sets / seconds,
+                                          results[0] / seconds))
@@ -0,0 +1,58 @@
+#
+# bench_candles_decode -- compares the decoding of a get_candles() server
+# answer with the former DataFrame based path.
+#
+# usage: PYTHONPATH=. python benchmarks/bench_candles_decode.py
+#
+
+import random
+import timeit
+
+import pandas as pd
+
+from fxcmpy import fxcmpy
+
+ROWS = 10000
+REPEAT = 50
+
+
+def make_candles(rows):
+    candles = list()
+    for i in range(rows):
+        prices = [round(1.1 + random.random() * 0.01, 5) for _ in range(8)]
+        candles.append([1500000000 + 60 * i] + prices +
+                       [random.randint(1, 500)])
+    return candles
+
+
+def decode_dataframe(candles, to_add):
+    """ The decoding of get_candles() up to version 1.1.16."""
+    ret = pd.DataFrame(candles, columns=fxcmpy.CANDLES_COLUMNS)
+    ret['date'] = pd.to_datetime(ret['date'], unit='s')
+    ret = ret[to_add]
+    ret.set_index('date', inplace=True)
+    return ret
+
+
+def decode_columns(candles, to_add, dtype='float64'):
+    return fxcmpy.__candles_to_frame__(candles, to_add, True, dtype)
+
+
+if __name__ == '__main__':
+    candles = make_candles(ROWS)
+    cases = [('all columns', list(fxcmpy.CANDLES_COLUMNS)),
+             ('bids', list(fxcmpy.CANDLES_COLUMNS_BID)),
+             ('bidclose', ['date', 'bidclose'])]
+    print('%s candles, mean of %s runs' % (ROWS, REPEAT))
+    for name, to_add in cases:
+        old = timeit.timeit(lambda: decode_dataframe(candles, to_add),
+                            number=REPEAT) / REPEAT
+        new = timeit.timeit(lambda: decode_columns(candles, to_add),
+                            number=REPEAT) / REPEAT
+        new32 = timeit.timeit(lambda: decode_columns(candles, to_add,
+                                                     'float32'),
+                              number=REPEAT) / REPEAT
+        print('{:14}dataframe {:7.2f} ms | columns {:7.2f} ms | '
+              'columns float32 {:7.2f} ms | speedup {:5.1f}x'
+              .format(name + ':', old * 1000, new * 1000, new32 * 1000,
+                      old / new))
@@ -0,0 +1,78 @@
+#
+# bench_candles_stream -- compares time and peak memory of parsing a
+# candles server answer as a whole with the streaming parser.
+#
+# usage: PYTHONPATH=. python benchmarks/bench_candles_stream.py
+#
+
+import gzip
+import json
+import random
+import time
+import tracemalloc
+import zlib
+
+import numpy as np
+
+from fxcmpy import fxcmpy
+from fxcmpy.fxcmpy_candles_parser import fxcmpy_candles_parser
+
+ROWS = 10000
+CHUNK_SIZE = 65536
+
+
+def make_answer(rows):
+    candles = list()
+    for i in range(rows):
+        prices = [round(1.1 + random.random() * 0.01, 5) for _ in range(8)]
+        candles.append([1500000000 + 60 * i] + prices +
+                       [random.randint(1, 500)])
+    data = {'response': {'executed': True}, 'instrument_id': '1',
+            'period_id': 'm1', 'candles': candles}
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+def iter_chunks(body):
+    """ Decompress body chunk by chunk like requests' iter_content()."""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for i in range(0, len(body), CHUNK_SIZE):
+        yield decompressor.decompress(body[i:i + CHUNK_SIZE])
+    yield decompressor.flush()
+
+
+def parse_buffered(body):
+    """ The parsing of __handle_request__ up to version 1.1.16."""
+    data = json.loads(gzip.decompress(body))
+    candles = np.asarray(data['candles'], dtype=float)
+    return fxcmpy.__candles_to_frame__(candles, fxcmpy.CANDLES_COLUMNS, True)
+
+
+def parse_streamed(body):
+    parser = fxcmpy_candles_parser(len(fxcmpy.CANDLES_COLUMNS))
+    for chunk in iter_chunks(body):
+        parser.feed(chunk)
+    candles, data = parser.close()
+    return fxcmpy.__candles_to_frame__(candles, fxcmpy.CANDLES_COLUMNS, True)
+
+
+def measure(func, body):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    func(body)
+    seconds = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+if __name__ == '__main__':
+    raw = make_answer(ROWS)
+    body = gzip.compress(raw)
+    print('%s candles, %.2f MB json, %.2f MB gzip'
+          % (ROWS, len(raw) / 1e6, len(body) / 1e6))
+    assert parse_buffered(body).equals(parse_streamed(body))
+    for name, func in [('buffered', parse_buffered),
+                       ('streamed', parse_streamed)]:
+        seconds, peak = measure(func, body)
+        print('{:10}{:8.2f} ms | peak memory {:7.2f} MB'
+              .format(name + ':', seconds * 1000, peak / 1e6))
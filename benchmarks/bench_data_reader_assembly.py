@@ -0,0 +1,61 @@
+#
+# bench_data_reader_assembly -- compares time and peak memory of
+# assembling the weekly data sets of the data readers with the former
+# concat in the week loop.
+#
+# usage: PYTHONPATH=. python benchmarks/bench_data_reader_assembly.py
+#
+
+import gzip
+import time
+import tracemalloc
+from io import BytesIO
+
+import pandas as pd
+
+from bench_data_reader_download import make_week
+from fxcmpy import fxcmpy_tick_data_reader
+
+TICKS = 50000
+WEEKS = (13, 26, 52, 104)
+
+
+def assemble_loop(datasets):
+    """ The assembly of __fetch_data__ up to version 1.1.16."""
+    data = pd.DataFrame()
+    for week in datasets:
+        if len(data) == 0:
+            data = week
+        else:
+            data = pd.concat((data, week))
+    return data
+
+
+def assemble_once(datasets):
+    return fxcmpy_tick_data_reader.__assemble__(None, datasets)
+
+
+def measure(func, datasets):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    func(datasets)
+    seconds = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+if __name__ == '__main__':
+    week = pd.read_csv(BytesIO(gzip.decompress(make_week(TICKS))),
+                       encoding='utf-16', index_col=0)
+    week_mb = week.memory_usage(deep=True).sum() / 1e6
+    print('%s ticks and %.1f MB per week, peak memory above the weekly '
+          'data sets' % (TICKS, week_mb))
+    for weeks in WEEKS:
+        datasets = [week.copy() for _ in range(weeks)]
+        line = '{:4} weeks'.format(weeks)
+        for name, func in [('loop', assemble_loop), ('once', assemble_once)]:
+            seconds, peak = measure(func, datasets)
+            line += ' | {} {:7.3f} s {:8.1f} MB'.format(name, seconds,
+                                                       peak / 1e6)
+        print(line)
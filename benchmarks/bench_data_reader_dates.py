@@ -0,0 +1,65 @@
+#
+# bench_data_reader_dates -- compares the date parsing and range queries
+# of fxcmpy_tick_data_reader.get_data() with the former implementation.
+#
+# usage: PYTHONPATH=. python benchmarks/bench_data_reader_dates.py
+#
+
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from fxcmpy import fxcmpy_tick_data_reader
+
+TICKS = 2000000
+QUERIES = 100
+
+
+def make_data(ticks):
+    random = np.random.RandomState(0)
+    start = np.datetime64('2018-01-01T22:00:00.000')
+    times = start + np.sort(random.randint(0, 180 * 86400000, ticks)) \
+        .astype('timedelta64[ms]')
+    index = pd.DatetimeIndex(times).strftime('%m/%d/%Y %H:%M:%S.%f').str[:-3]
+    bid = 1.2 + random.standard_normal(ticks).cumsum() * 1e-5
+    return pd.DataFrame({'Bid': bid, 'Ask': bid + 2e-4},
+                        index=pd.Index(index, dtype=object, name='DateTime'))
+
+
+def reader(data):
+    ret = fxcmpy_tick_data_reader.__new__(fxcmpy_tick_data_reader)
+    ret.data = data
+    ret.store = None
+    return ret
+
+
+def query_mask(data, start, end):
+    """ The range query of get_data() up to version 1.1.16."""
+    data = data[data.index >= start]
+    return data[data.index <= end]
+
+
+if __name__ == '__main__':
+    data = make_data(TICKS)
+    print('%s ticks' % TICKS)
+
+    old = timeit.timeit(lambda: pd.to_datetime(data.index.values,
+                                               format='%m/%d/%Y %H:%M:%S.%f'),
+                        number=1)
+    new = timeit.timeit(lambda: reader(data).__parse_dates__(
+                                    data.index.values), number=1)
+    print('parse dates:   to_datetime {:7.3f} s | fixed width {:7.3f} s | '
+          'speedup {:5.1f}x'.format(old, new, old / new))
+
+    ticks = reader(data)
+    adjusted = ticks.get_data()
+    starts = adjusted.index[np.random.randint(0, TICKS // 2, QUERIES)]
+    ends = starts + pd.Timedelta(days=7)
+    old = timeit.timeit(lambda: [query_mask(adjusted, s, e)
+                                 for s, e in zip(starts, ends)], number=1)
+    new = timeit.timeit(lambda: [ticks.get_data(s, e)
+                                 for s, e in zip(starts, ends)], number=1)
+    print('range queries: masks       {:7.3f} ms | binary search {:5.3f} ms '
+          '| speedup {:5.1f}x'.format(old / QUERIES * 1000,
+                                      new / QUERIES * 1000, old / new))
@@ -0,0 +1,89 @@
+#
+# bench_data_reader_download -- compares sequential and concurrent weekly
+# downloads of fxcmpy_tick_data_reader against a local HTTP server which
+# serves synthetic weekly tick files with a fixed latency.
+#
+# usage: PYTHONPATH=. python benchmarks/bench_data_reader_download.py
+#
+
+import datetime as dt
+import gzip
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from fxcmpy import fxcmpy_tick_data_reader
+
+WEEKS = 26
+TICKS = 20000
+LATENCY = 0.1
+
+
+def make_week(ticks, codec='utf-16', seed=0, week=1):
+    """ Return a gzipped tick file of the given week of 2018 in the format
+    of FXCM."""
+    random = np.random.RandomState(seed)
+    start = np.datetime64('2018-01-07T22:00:00.000') + \
+        np.timedelta64(7 * (week - 1), 'D')
+    times = start + np.sort(random.randint(0, 5 * 86400000, ticks)) \
+        .astype('timedelta64[ms]')
+    text = times.astype(dt.datetime)
+    bid = 1.2 + random.standard_normal(ticks).cumsum() * 1e-5
+    lines = ['DateTime,Bid,Ask']
+    for t, b in zip(text, bid):
+        lines.append('%s,%.5f,%.5f'
+                     % (t.strftime('%m/%d/%Y %H:%M:%S.%f')[:-3], b, b + 2e-4))
+    return gzip.compress(('\r\n'.join(lines) + '\r\n').encode(codec))
+
+
+def serve(body, latency=LATENCY):
+    """ Start a local server answering every GET request with body after
+    latency seconds, body may be a function of the requested path. Returns
+    the server and its base url."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            time.sleep(latency)
+            content = body(self.path) if callable(body) else body
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://127.0.0.1:%s' % server.server_port
+
+
+def local_reader(base):
+    class reader(fxcmpy_tick_data_reader):
+        url = base + '/%s/%s/%s.csv.gz'
+    return reader
+
+
+if __name__ == '__main__':
+    body = make_week(TICKS)
+    server, base = serve(body)
+    reader = local_reader(base)
+    start = dt.datetime(2018, 1, 1)
+    stop = start + dt.timedelta(weeks=WEEKS - 1)
+    print('%s weeks, %s ticks and %.2f MB per week, latency %s s'
+          % (WEEKS, TICKS, len(body) / 1e6, LATENCY))
+    results = list()
+    for workers in (1, 4, 8):
+        t0 = time.perf_counter()
+        data = reader('EURUSD', start, stop, max_workers=workers).get_raw_data()
+        seconds = time.perf_counter() - t0
+        results.append(seconds)
+        print('{:2} workers: {:6.2f} s | {:6.2f} MB/s | speedup {:4.1f}x'
+              .format(workers, seconds, WEEKS * len(body) / 1e6 / seconds,
+                      results[0] / seconds))
+    server.shutdown()
@@ -0,0 +1,59 @@
+#
+# bench_data_reader_stream -- compares the peak memory of parsing a weekly
+# tick file as a whole with the streaming parser of the data readers.
+#
+# usage: PYTHONPATH=. python benchmarks/bench_data_reader_stream.py
+#
+
+import gzip
+import time
+import tracemalloc
+from io import BytesIO, StringIO
+
+import pandas as pd
+
+from bench_data_reader_download import make_week
+from fxcmpy import fxcmpy_tick_data_reader
+
+TICKS = (25000, 100000, 400000)
+
+
+def parse_buffered(body):
+    """ The parsing of __fetch_dataset__ up to version 1.1.16."""
+    buf = BytesIO(body)
+    f = gzip.GzipFile(fileobj=buf)
+    data = f.read()
+    data_str = data.decode('utf-16')
+    return pd.read_csv(StringIO(data_str), index_col=0)
+
+
+def parse_streamed(body):
+    reader = fxcmpy_tick_data_reader.__new__(fxcmpy_tick_data_reader)
+    return reader.__read_dataset__(BytesIO(body))
+
+
+def measure(func, body):
+    """ Return the time and the peak memory above the size of the result."""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    data = func(body)
+    seconds = time.perf_counter() - t0
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak - size, data
+
+
+if __name__ == '__main__':
+    print('peak memory above the size of the parsed week')
+    for ticks in TICKS:
+        body = make_week(ticks)
+        line = '{:7} ticks, {:5.1f} MB gzip'.format(ticks, len(body) / 1e6)
+        results = list()
+        for name, func in [('buffered', parse_buffered),
+                           ('streamed', parse_streamed)]:
+            seconds, overhead, data = measure(func, body)
+            results.append(data)
+            line += ' | {} {:6.2f} s {:7.1f} MB'.format(name, seconds,
+                                                       overhead / 1e6)
+        assert results[0].equals(results[1])
+        print(line)
@@ -0,0 +1,57 @@
+#
+# bench_loader -- compares loading several symbols from cached weekly files
+# in one process with load_history() on a process pool.
+#
+# The speedup is bounded by the number of CPUs, on a single CPU the pool
+# only adds the cost of starting the processes and the handoff.
+#
+# usage: PYTHONPATH=. python benchmarks/bench_loader.py
+#
+
+import datetime as dt
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from bench_data_reader_download import make_week, serve
+
+from fxcmpy import fxcmpy_tick_data_reader, load_history
+
+SYMBOLS = ['EURUSD', 'USDJPY', 'GBPUSD', 'EURCHF']
+WEEKS = 4
+TICKS = 100000
+
+
+def weekly_file(path):
+    week = int(path.rsplit('/', 1)[1].split('.')[0])
+    return make_week(TICKS, seed=week, week=week)
+
+
+if __name__ == '__main__':
+    server, base = serve(weekly_file, latency=0)
+    start = dt.datetime(2018, 1, 8)
+    stop = start + dt.timedelta(weeks=WEEKS - 1)
+    cache_dir = tempfile.mkdtemp()
+    # the forked processes inherit the patched url
+    patch = mock.patch.object(fxcmpy_tick_data_reader, 'url',
+                              base + '/%s/%s/%s.csv.gz')
+    patch.start()
+    try:
+        load_history(SYMBOLS, start, stop, processes=1, cache_dir=cache_dir)
+        print('%s symbols, %s weeks, %s ticks per week, %s CPUs'
+              % (len(SYMBOLS), WEEKS, TICKS, os.cpu_count()))
+        results = list()
+        for processes in (1, 2, len(SYMBOLS)):
+            t0 = time.perf_counter()
+            data = load_history(SYMBOLS, start, stop, processes=processes,
+                                cache_dir=cache_dir, offline=True)
+            seconds = time.perf_counter() - t0
+            results.append(seconds)
+            print('{:2} processes: {:6.2f} s | speedup {:4.1f}x'
+                  .format(processes, seconds, results[0] / seconds))
+    finally:
+        patch.stop()
+        server.shutdown()
+        shutil.rmtree(cache_dir)
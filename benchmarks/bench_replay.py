@@ -0,0 +1,83 @@
+#
+# bench_replay -- measures the ticks per second of fxcmpy_replay without
+# callbacks, with an empty callback and with a moving average crossover
+# strategy trading through the simulated order layer.
+#
+# By default the callbacks get the price history as DataFrame, a slice of
+# the data built for every event at about 15 microseconds. With
+# lazy_history=True they get a fxcmpy_price_history, which builds the slice
+# only if it is used.
+#
+# usage: PYTHONPATH=. python benchmarks/bench_replay.py
+#
+
+import numpy as np
+import pandas as pd
+
+from fxcmpy import fxcmpy_replay
+
+TICKS = 1000000
+
+
+def make_ticks(ticks):
+    random = np.random.RandomState(0)
+    start = np.datetime64('2018-01-07T22:00:00.000')
+    times = start + np.sort(random.randint(0, 26 * 7 * 86400000, ticks)) \
+        .astype('timedelta64[ms]')
+    bid = 1.2 + random.standard_normal(ticks).cumsum() * 1e-5
+    return pd.DataFrame({'Bid': bid, 'Ask': bid + 2e-4},
+                        index=pd.DatetimeIndex(times))
+
+
+def crossover(replay, fast=200, slow=1000):
+    """ A strategy as it would be written for subscribe_market_data(). """
+    state = {'sum_fast': 0.0, 'sum_slow': 0.0, 'long': None}
+    window = list()
+
+    def on_tick(data, prices):
+        bid = data['Rates'][0]
+        window.append(bid)
+        state['sum_fast'] += bid
+        state['sum_slow'] += bid
+        if len(window) > fast:
+            state['sum_fast'] -= window[-fast - 1]
+        if len(window) > slow:
+            state['sum_slow'] -= window.pop(0)
+        if len(window) < slow:
+            return
+        is_long = state['sum_fast'] / fast > state['sum_slow'] / slow
+        if is_long != state['long']:
+            state['long'] = is_long
+            replay.close_all_for_symbol(data['Symbol'])
+            if is_long:
+                replay.create_market_buy_order(data['Symbol'], 10)
+            else:
+                replay.create_market_sell_order(data['Symbol'], 10)
+    return on_tick
+
+
+def noop(data, prices):
+    pass
+
+
+if __name__ == '__main__':
+    ticks = make_ticks(TICKS)
+    print('%s ticks' % TICKS)
+    for name, lazy in (('no callback', False), ('empty callback', False),
+                       ('empty callback', True),
+                       ('crossover strategy', False),
+                       ('crossover strategy', True)):
+        replay = fxcmpy_replay({'EUR/USD': ticks}, lazy_history=lazy)
+        callbacks = ()
+        if name == 'empty callback':
+            callbacks = (noop,)
+        elif name == 'crossover strategy':
+            callbacks = (crossover(replay),)
+        if lazy:
+            name += ', lazy'
+        replay.subscribe_market_data('EUR/USD', callbacks)
+        stats = replay.run(close_positions=True)
+        print('{:24} {:6.2f} s | {:10,.0f} ticks/s | {:5} trades | '
+              'balance {:10.2f}'.format(name, stats['seconds'],
+                                        stats['events_per_second'],
+                                        stats['trades'], stats['balance']))
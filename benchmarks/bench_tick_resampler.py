@@ -0,0 +1,59 @@
+#
+# bench_tick_resampler -- compares resampling ticks into bid/ask bars with
+# generic pandas calls and with fxcmpy_tick_resampler, at once and in
+# chunks.
+#
+# usage: PYTHONPATH=. python benchmarks/bench_tick_resampler.py
+#
+
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from fxcmpy import fxcmpy_tick_resampler
+
+TICKS = 5000000
+CHUNK_SIZE = 50000
+FREQ = '1min'
+
+
+def make_ticks(ticks):
+    random = np.random.RandomState(0)
+    start = np.datetime64('2018-01-07T22:00:00.000')
+    times = start + np.sort(random.randint(0, 26 * 7 * 86400000, ticks)) \
+        .astype('timedelta64[ms]')
+    bid = 1.2 + random.standard_normal(ticks).cumsum() * 1e-5
+    ask = bid + random.uniform(1e-4, 3e-4, ticks)
+    return pd.DataFrame({'Bid': bid, 'Ask': ask},
+                        index=pd.DatetimeIndex(times))
+
+
+def resample_pandas(data, freq):
+    """ Bid/ask OHLC, spread statistics and tick counts with pandas. """
+    bid = data['Bid'].resample(freq).ohlc().add_prefix('bid')
+    ask = data['Ask'].resample(freq).ohlc().add_prefix('ask')
+    spread = (data['Ask'] - data['Bid']).resample(freq).agg(
+                 ['mean', 'min', 'max']).add_prefix('spread')
+    count = data['Bid'].resample(freq).count().rename('tickqty')
+    ret = pd.concat([bid, ask, spread, count], axis=1)
+    return ret[ret['tickqty'] > 0]
+
+
+def chunks(data, chunk_size):
+    return (data.iloc[first:first + chunk_size]
+            for first in range(0, len(data), chunk_size))
+
+
+if __name__ == '__main__':
+    data = make_ticks(TICKS)
+    print('%s ticks, %s bars' % (TICKS, FREQ))
+    old = timeit.timeit(lambda: resample_pandas(data, FREQ), number=1)
+    once = timeit.timeit(lambda: fxcmpy_tick_resampler(FREQ).resample(
+                                     [data]), number=1)
+    streamed = timeit.timeit(lambda: fxcmpy_tick_resampler(FREQ).resample(
+                                         chunks(data, CHUNK_SIZE)), number=1)
+    print('pandas {:6.3f} s | resampler {:6.3f} s, speedup {:4.1f}x | '
+          'chunks of {} {:6.3f} s, speedup {:4.1f}x'
+          .format(old, once, old / once, CHUNK_SIZE, streamed,
+                  old / streamed))
@@ -0,0 +1,61 @@
+#
+# bench_tick_store -- compares a range query of a new reader on cached
+# weekly files, which parses the files, with a reader on the memory-mapped
+# columnar store.
+#
+# usage: PYTHONPATH=. python benchmarks/bench_tick_store.py
+#
+
+import datetime as dt
+import shutil
+import tempfile
+import time
+
+from bench_data_reader_download import local_reader, make_week, serve
+
+WEEKS = 13
+TICKS = 100000
+
+
+def weekly_file(path):
+    week = int(path.rsplit('/', 1)[1].split('.')[0])
+    return make_week(TICKS, seed=week, week=week)
+
+
+def timed(func):
+    t0 = time.perf_counter()
+    ret = func()
+    return time.perf_counter() - t0, ret
+
+
+if __name__ == '__main__':
+    server, base = serve(weekly_file, latency=0)
+    reader = local_reader(base)
+    start = dt.datetime(2018, 1, 8)
+    stop = start + dt.timedelta(weeks=WEEKS - 1)
+    query = (dt.datetime(2018, 2, 6), dt.datetime(2018, 2, 7))
+    cache_dir = tempfile.mkdtemp()
+    store_dir = tempfile.mkdtemp()
+    try:
+        reader('EURUSD', start, stop, cache_dir=cache_dir)
+        seconds, _ = timed(lambda: reader('EURUSD', start, stop,
+                                          cache_dir=cache_dir,
+                                          store_dir=store_dir,
+                                          offline=True))
+        print('%s weeks, %s ticks per week, conversion into the store '
+              '%.2f s' % (WEEKS, TICKS, seconds))
+        parsed, data = timed(lambda: reader('EURUSD', start, stop,
+                                            cache_dir=cache_dir,
+                                            offline=True).get_data(*query))
+        mapped, view = timed(lambda: reader('EURUSD', start, stop,
+                                            cache_dir=cache_dir,
+                                            store_dir=store_dir,
+                                            offline=True).get_data(*query))
+        assert data.equals(view)
+        print('one day of %s ticks: parsing files %.3f s | memory-mapped '
+              'store %.4f s | speedup %.0fx'
+              % (len(view), parsed, mapped, parsed / mapped))
+    finally:
+        server.shutdown()
+        shutil.rmtree(cache_dir)
+        shutil.rmtree(store_dir)
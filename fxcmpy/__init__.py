@@ -3,8 +3,27 @@ from fxcmpy.fxcmpy_open_position import fxcmpy_open_position
 from fxcmpy.fxcmpy_closed_position import fxcmpy_closed_position 
 from fxcmpy.fxcmpy_order import fxcmpy_order 
 from fxcmpy.fxcmpy_oco_order import fxcmpy_oco_order 
+from fxcmpy.fxcmpy_pl_engine import fxcmpy_pl_engine
+from fxcmpy.fxcmpy_risk_engine import fxcmpy_risk_engine
+from fxcmpy.fxcmpy_risk_engine import RiskLimitError
+from fxcmpy.fxcmpy_archive import fxcmpy_archive
+from fxcmpy.fxcmpy_snapshot import fxcmpy_snapshot
+from fxcmpy.fxcmpy_candle_cache import fxcmpy_candle_cache
+from fxcmpy.fxcmpy_request_cache import fxcmpy_request_cache
+from fxcmpy.fxcmpy_resample import resample_candles
+from fxcmpy.fxcmpy_tick_resampler import fxcmpy_tick_resampler
+from fxcmpy.fxcmpy_backfill import fxcmpy_backfill
+from fxcmpy.fxcmpy_backfill import find_candle_gaps
 from fxcmpy.fxcmpy_data_reader import fxcmpy_candles_data_reader
 from fxcmpy.fxcmpy_data_reader import fxcmpy_tick_data_reader
+from fxcmpy.fxcmpy_file_cache import fxcmpy_file_cache
+from fxcmpy.fxcmpy_tick_store import fxcmpy_tick_store
+from fxcmpy.fxcmpy_loader import load_history
+from fxcmpy.fxcmpy_replay import fxcmpy_replay
+from fxcmpy.fxcmpy_replay import fxcmpy_price_history
+from fxcmpy.fxcmpy_backtest import backtest_candles
+from fxcmpy.fxcmpy_backtest import get_backtest_stats
+from fxcmpy.fxcmpy_backtest import run_parameter_sweep
 
 __version__ = '1.1.16'
 
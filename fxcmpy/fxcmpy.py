@@ -14,10 +14,15 @@
 #
 
 import requests
+from requests.adapters import HTTPAdapter
 from socketIO_client import SocketIO
 from socketIO_client.exceptions import ConnectionError
-from threading import Thread
+from threading import Condition, Event, RLock, Thread
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from operator import itemgetter
 import json
+import numpy as np
 import pandas as pd
 import sys
 import time
@@ -26,10 +31,18 @@ import configparser
 import logging
 import os
 
+from fxcmpy.fxcmpy_archive import fxcmpy_archive
+from fxcmpy.fxcmpy_backfill import fxcmpy_backfill
+from fxcmpy.fxcmpy_candle_cache import fxcmpy_candle_cache
+from fxcmpy.fxcmpy_candles_parser import fxcmpy_candles_parser
 from fxcmpy.fxcmpy_closed_position import fxcmpy_closed_position
 from fxcmpy.fxcmpy_open_position import fxcmpy_open_position
 from fxcmpy.fxcmpy_oco_order import fxcmpy_oco_order
 from fxcmpy.fxcmpy_order import fxcmpy_order
+from fxcmpy.fxcmpy_pl_engine import fxcmpy_pl_engine
+from fxcmpy.fxcmpy_request_cache import fxcmpy_request_cache
+from fxcmpy.fxcmpy_resample import resample_candles
+from fxcmpy.fxcmpy_snapshot import fxcmpy_snapshot
 
 from urllib.parse import unquote
 
@@ -62,6 +75,23 @@ class fxcmpy(object):
                        'askopen', 'askclose', 'askhigh', 'asklow', 'tickqty']
     CANDLES_COLUMNS_ASK = ['date', 'askopen', 'askclose', 'askhigh', 'asklow']
     CANDLES_COLUMNS_BID = ['date', 'bidopen', 'bidclose', 'bidhigh', 'bidlow']
+    # server limit of candles per request and the length of the periods
+    MAX_CANDLES = 10000
+    # ranges of the candle cache ending earlier than this many seconds ago
+    # are final, the server does not deliver further candles for them
+    CANDLE_CACHE_FINAL_AGE = 7 * 86400
+    STREAM_CHUNK_SIZE = 65536
+    # seconds between two checks of the retention thread for records
+    # older than max_age
+    RETENTION_INTERVAL = 10
+    PERIOD_SECONDS = {'m1': 60, 'm5': 300, 'm15': 900, 'm30': 1800,
+                      'H1': 3600, 'H2': 7200, 'H3': 10800, 'H4': 14400,
+                      'H6': 21600, 'H8': 28800, 'D1': 86400, 'W1': 604800,
+                      'M1': 2678400}
+    # models kept as local tables: model -> (table attribute, key field)
+    MODEL_TABLES = {'Offer': ('offer_table', 'offerId'),
+                    'Account': ('account_table', 'accountId'),
+                    'Summary': ('summary_table', 'offerId')}
 
     debug = False
 
@@ -152,6 +182,10 @@ class fxcmpy(object):
                                 format=form)
 
         self.logger = logging.getLogger('FXCM')
+        # one pool of keep-alive connections shared by all requests
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=4,
+                                                   pool_maxsize=32))
         self.socket = None
         self.request_header = None
         self.default_account = None
@@ -161,10 +195,29 @@ class fxcmpy(object):
         self.orders = dict()
         self.old_orders = dict()
         self.offers = dict()
+        self.offer_table = dict()
+        self.account_table = dict()
+        self.summary_table = dict()
         self.open_pos = dict()
         self.closed_pos = dict()
         self.oco_orders = dict()
+        self.write_lock = RLock()
+        self.snapshot = fxcmpy_snapshot(0)
         self.add_callbacks = dict()
+        self.pl_engine = fxcmpy_pl_engine(self)
+        self.risk_engine = None
+        self.retention = {'max_count': None, 'max_age': None}
+        self.retention_times = {'old_orders': dict(), 'closed_pos': dict()}
+        self.retention_thread = None
+        self.retention_stop = Event()
+        self.archive = None
+        self.candle_cache = None
+        self.request_cache = None
+        self.request_cache_ttl = {'ttl_ratio': 0.1, 'max_ttl': 3600}
+        self.backfill = None
+        # trading requests in flight, background requests wait for them
+        self.trading_requests = 0
+        self.trading_idle = Condition()
         self.connection_status = 'unset'
         self.connect()
 
@@ -193,8 +246,14 @@ class fxcmpy(object):
         self.subscribe_data_model('ClosedPosition')
 
     def close(self):
+        if self.backfill is not None:
+            self.backfill.stop()
+        self.__stop_retention__()
         if self.is_connected():
             self.socket.disconnect()
+        if self.archive is not None:
+            self.archive.close()
+        self.session.close()
 
     def connect(self):
         """ Connect to the FXCM server."""
@@ -527,13 +586,18 @@ class fxcmpy(object):
             self.logger.error('position id must be an integer.')
             raise TypeError('position id must be an integer.')
 
-        if position_id in self.closed_pos:
-            return self.closed_pos[position_id]
-        else:
-            self.logger.warn('No closed position with given id %s.'
-                             % position_id)
-            raise ValueError('No closed position with given id %s.'
-                             % position_id)
+        closed_pos = self.snapshot.closed_pos
+        if position_id in closed_pos:
+            return closed_pos[position_id]
+
+        pos = self.__load_archived__('closed_pos', position_id)
+        if pos is not None:
+            return pos
+
+        self.logger.warn('No closed position with given id %s.'
+                         % position_id)
+        raise ValueError('No closed position with given id %s.'
+                         % position_id)
 
     def get_order(self, order_id):
         """ Returns the order object for a given order id.
@@ -548,12 +612,17 @@ class fxcmpy(object):
         The fxcmpy_order object.
         """
 
-        if order_id in self.orders:
-            return self.orders[order_id]
-        elif order_id in self.old_orders:
-            return self.old_orders[order_id]
-        else:
-            raise ValueError('No order with id %s' % order_id)
+        snapshot = self.snapshot
+        if order_id in snapshot.orders:
+            return snapshot.orders[order_id]
+        elif order_id in snapshot.old_orders:
+            return snapshot.old_orders[order_id]
+
+        order = self.__load_archived__('old_orders', order_id)
+        if order is not None:
+            return order
+
+        raise ValueError('No order with id %s' % order_id)
 
     def get_oco_order_ids(self):
         """ Return a list of the available oco order ids."""
@@ -608,6 +677,186 @@ class fxcmpy(object):
         else:
             raise ValueError('Symbol %s is not subscripted' % symbol)
 
+    def get_offer(self, symbol):
+        """ Return the offer of an instrument from the local offer table
+        without a server request.
+
+        Arguments:
+
+        symbol: string or integer,
+            the symbol as given by get_instruments_for_candles() or the
+            offer id of the instrument.
+
+        Returns:
+
+        The offer data, including pip size ('pip') and rate precision
+        ('ratePrecision'), as dict. The data is kept up to date only while
+        the 'Offer' model is subscribed via subscribe_data_model().
+        """
+
+        if symbol in self.offers:
+            symbol = self.offers[symbol]
+        try:
+            return self.offer_table[int(symbol)]
+        except:
+            raise ValueError('Unknown offer %s.' % symbol)
+
+    def get_account(self, account_id=None):
+        """ Return the account data from the local account table without a
+        server request.
+
+        Arguments:
+
+        account_id: integer (Default None),
+            the account's id. If not given, the default account is used.
+
+        Returns:
+
+        The account data as dict. The data is kept up to date only while the
+        'Account' model is subscribed via subscribe_data_model().
+        """
+
+        if account_id is None:
+            account_id = self.default_account
+        try:
+            return self.account_table[int(account_id)]
+        except:
+            raise ValueError('Unknown account id %s.' % account_id)
+
+    def get_local_offers(self, kind='dataframe'):
+        """ Return the local 'Offer' table without a server request.
+
+        Arguments:
+
+        kind: one of 'dataframe' (default) or 'list',
+            how to return the data, either as list or as a pandas DataFrame.
+
+        """
+
+        return self.__get_local_table__('Offer', kind)
+
+    def get_local_accounts(self, kind='dataframe'):
+        """ Return the local 'Account' table without a server request.
+
+        Arguments:
+
+        kind: one of 'dataframe' (default) or 'list',
+            how to return the data, either as list or as a pandas DataFrame.
+
+        """
+
+        return self.__get_local_table__('Account', kind)
+
+    def get_local_summary(self, kind='dataframe'):
+        """ Return the local 'Summary' table without a server request. The
+        table is filled by subscribe_data_model('Summary').
+
+        Arguments:
+
+        kind: one of 'dataframe' (default) or 'list',
+            how to return the data, either as list or as a pandas DataFrame.
+
+        """
+
+        return self.__get_local_table__('Summary', kind)
+
+    def get_snapshot(self):
+        """ Return the current fxcmpy_snapshot object, a consistent and
+        immutable view of the tables orders, old_orders, open_pos, closed_pos,
+        oco_orders, prices, offer_table, account_table and summary_table
+        which is safe to read from any thread."""
+
+        return self.snapshot
+
+    def get_pl_engine(self):
+        """ Return the fxcmpy_pl_engine object which recomputes the P&L of
+        the open positions on every price update of subscribed instruments.
+
+        The P&L of a position is only updated by the engine if its symbol is
+        subscribed via subscribe_market_data().
+        """
+
+        return self.pl_engine
+
+    def set_retention(self, max_count=None, max_age=None, path=None):
+        """ Limit the number of records kept in memory in old_orders and
+        closed_pos.
+
+        Arguments:
+
+        max_count: integer or None (default None),
+            the maximal number of records per table, the oldest records are
+            evicted first. If None, the number is not limited.
+
+        max_age: number or None (default None),
+            the maximal time in seconds a record is kept after it entered the
+            table. Expired records are evicted by a background thread at
+            most RETENTION_INTERVAL seconds late. If None, the age is not
+            limited.
+
+        path: string or None (default None),
+            path of a SQLite file evicted records are appended to. If given,
+            get_order() and get_closed_position() read evicted records from
+            there. If None, evicted records are dropped.
+        """
+
+        if max_count is not None:
+            try:
+                max_count = int(max_count)
+            except:
+                raise TypeError('max_count must be an integer.')
+            if max_count < 0:
+                raise ValueError('max_count must not be negative.')
+
+        if max_age is not None:
+            try:
+                max_age = float(max_age)
+            except:
+                raise TypeError('max_age must be a number.')
+
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
+        if path is not None:
+            self.archive = fxcmpy_archive(path)
+
+        self.__stop_retention__()
+        with self.write_lock:
+            self.retention = {'max_count': max_count, 'max_age': max_age}
+            now = time.time()
+            for table in self.retention_times:
+                times = self.retention_times[table]
+                for key in getattr(self, table):
+                    if key not in times:
+                        times[key] = now
+                self.__apply_retention__(table)
+        if max_age is not None:
+            self.retention_stop.clear()
+            self.retention_thread = Thread(target=self.__run_retention__,
+                                           args=(max_age,), daemon=True)
+            self.retention_thread.start()
+
+    def get_risk_engine(self):
+        """ Return the pre-trade risk engine or None if no engine is set."""
+
+        return self.risk_engine
+
+    def set_risk_engine(self, risk_engine):
+        """ Set the pre-trade risk engine.
+
+        Arguments:
+
+        risk_engine: fxcmpy_risk_engine or None,
+            the engine which checks the orders of open_trade(),
+            create_entry_order() and create_oco_order() before they are sent
+            to the server. If None, no checks are performed.
+        """
+
+        if risk_engine is not None and not hasattr(risk_engine,
+                                                   'check_orders'):
+            raise TypeError('risk_engine must be of type fxcmpy_risk_engine.')
+        self.risk_engine = risk_engine
+
     def get_subscribed_symbols(self):
         """ Returns a list of symbols for the subscribed instruments."""
 
@@ -706,6 +955,9 @@ class fxcmpy(object):
                                  % (func.__name__, model))
                 self.add_callbacks[model][func.__name__] = func
 
+        if model == 'Summary':
+            self.__collect_model_table__('Summary', self.get_summary('list'))
+
         params = {'models': model}
         self.__handle_request__(method='trading/subscribe',
                                        params=params, protocol='post')
@@ -715,7 +967,12 @@ class fxcmpy(object):
             self.socket.on('OpenPosition', self.__on_open_pos_update__)
         elif model == 'ClosedPosition':
             self.socket.on('ClosedPosition', self.__on_closed_pos_update__)
-
+        elif model == 'Offer':
+            self.socket.on('Offer', self.__on_offer_update__)
+        elif model == 'Account':
+            self.socket.on('Account', self.__on_account_update__)
+        elif model == 'Summary':
+            self.socket.on('Summary', self.__on_summary_update__)
         else:
             self.socket.on(model, self.__on_model_update__)
 
@@ -731,8 +988,11 @@ class fxcmpy(object):
         self.__handle_request__(method='unsubscribe', params=params,
                                        protocol='post')
 
-        if symbol in self.prices:
-            del self.prices[symbol]
+        with self.write_lock:
+            if symbol in self.prices:
+                prices = dict(self.prices)
+                del prices[symbol]
+                self.__publish__(prices=prices)
         if symbol in self.add_callbacks:
             del self.add_callbacks[symbol]
 
@@ -983,6 +1243,8 @@ class fxcmpy(object):
             except:
                 raise ValueError('trailing step must be a number.')
 
+        self.__check_risk__([(symbol, is_buy, amount, account_id)])
+
         params = {
                   'account_id': account_id,
                   'symbol': symbol,
@@ -1436,6 +1698,8 @@ class fxcmpy(object):
             except:
                 raise ValueError('trailing step must be a number.')
 
+        self.__check_risk__([(symbol, is_buy, amount, account_id)])
+
         params = {
                   'account_id': account_id,
                   'symbol': symbol,
@@ -1717,6 +1981,10 @@ class fxcmpy(object):
         except:
             raise ValueError('trailing_stop_step2 must be a number.')
 
+        self.__check_risk__([(symbol, is_buy, amount, account_id),
+                             (symbol, is_buy2, amount, account_id)],
+                            exclusive=True)
+
         params = {
                   'account_id': account_id,
                   'symbol': symbol,
@@ -1762,7 +2030,10 @@ class fxcmpy(object):
 
         bulk_id = orders[0].__ocoBulkId__
         oco_order = fxcmpy_oco_order(bulk_id, orders, self,  self.logger)
-        self.oco_orders[bulk_id] = oco_order
+        with self.write_lock:
+            oco_orders = dict(self.oco_orders)
+            oco_orders[bulk_id] = oco_order
+            self.__publish__(oco_orders=oco_orders)
         return oco_order
 
     def add_to_oco(self, order_ids, oco_bulk_id=0):
@@ -1849,6 +2120,107 @@ class fxcmpy(object):
         self.__handle_request__(method='trading/edit_oco',
                                        params=params, protocol='post')
 
+    def set_candle_cache(self, path):
+        """ Set the directory of a persistent candle cache.
+
+        Arguments:
+
+        path: string or None,
+            the cache directory. If given, get_candles() requests with a
+            start date are served from the cache and only missing ranges are
+            fetched from the server. If None, the cache is disabled.
+        """
+
+        if path is None:
+            self.candle_cache = None
+        else:
+            self.candle_cache = fxcmpy_candle_cache(path)
+
+    def get_candle_cache(self):
+        """ Return the fxcmpy_candle_cache object or None if no cache is
+        set. Use its get_stats() method for hit latency and cache size."""
+
+        return self.candle_cache
+
+    def set_request_cache(self, max_size=128, ttl_ratio=0.1, max_ttl=3600):
+        """ Enable an in-memory LRU cache for the requests of get_candles().
+        Identical requests which are in flight at the same time share one
+        server request.
+
+        Arguments:
+
+        max_size: integer or None (default 128),
+            the maximal number of cached answers. If None, the cache is
+            disabled.
+
+        ttl_ratio: float (default 0.1),
+            the time to live of an answer which may contain a still forming
+            candle as fraction of the candles' period, e.g. 6 seconds for
+            'm1' candles.
+
+        max_ttl: number (default 3600),
+            the maximal time to live in seconds, used for answers containing
+            complete candles only.
+        """
+
+        if max_size is None:
+            self.request_cache = None
+            return
+        try:
+            ttl_ratio = float(ttl_ratio)
+            max_ttl = float(max_ttl)
+        except:
+            raise TypeError('ttl_ratio and max_ttl must be numbers.')
+        self.request_cache = fxcmpy_request_cache(max_size)
+        self.request_cache_ttl = {'ttl_ratio': ttl_ratio, 'max_ttl': max_ttl}
+
+    def get_request_cache(self):
+        """ Return the fxcmpy_request_cache object or None if no cache is
+        set."""
+
+        return self.request_cache
+
+    def set_backfill(self, interval=60, min_delay=1.0, callback=None):
+        """ Start a background backfill of candle series.
+
+        Series registered with the watch() method of the returned
+        fxcmpy_backfill object are checked every interval seconds for
+        missing candles, which are requested while no trading request is in
+        flight.
+
+        Arguments:
+
+        interval: number or None (default 60),
+            the time in seconds between two checks. If None, the backfill is
+            stopped and removed.
+
+        min_delay: number (default 1.0),
+            the minimal time in seconds between two backfill requests.
+
+        callback: callable or None (default None),
+            called with the arguments instrument, period and the received
+            candles as pandas DataFrame after every backfill.
+
+        Returns:
+
+        The fxcmpy_backfill object or None.
+        """
+
+        if self.backfill is not None:
+            self.backfill.stop()
+            self.backfill = None
+        if interval is None:
+            return None
+        self.backfill = fxcmpy_backfill(self, interval, min_delay, callback)
+        self.backfill.start()
+        return self.backfill
+
+    def get_backfill(self):
+        """ Return the fxcmpy_backfill object or None if no backfill is
+        set."""
+
+        return self.backfill
+
     def get_instruments_for_candles(self):
         """ Return a list of all available instruments to receive historical
         data for."""
@@ -1857,7 +2229,8 @@ class fxcmpy(object):
 
     def get_candles(self, instrument='', offer_id=None, period='H1', number=10,
                     start=None, end=None, with_index=True, columns=[], 
-                    stop=None):
+                    stop=None, max_workers=4, progress=None,
+                    dtype='float64'):
         """Return historical data from the fxcm database as pandas.DataFrame.
 
         Arguments:
@@ -1883,7 +2256,9 @@ class fxcmpy(object):
             'D1', 'W1', or 'M1'.
 
         number: integer (default 10),
-            the number of candles to receive.
+            the number of candles to receive. Ignored if start is given.
+            Numbers above the server limit of 10000 candles are fetched page
+            by page.
 
         start: datetime.datetime, datetime.date or string (defaut None),
             the first date to receive data for. If it is a string, the date is 
@@ -1891,7 +2266,8 @@ class fxcmpy(object):
 
         end: datetime.datetime, datetime.date or string (default None),
             the last date to receive data for. If it is a string, the date is 
-            in format YYYY-MM-DD hh:mm. 
+            in format YYYY-MM-DD hh:mm. If start is given and end is None,
+            data up to now is received.
 
         with_index: boolean (default True),
             whether the column 'date' should server as index in the resulting
@@ -1911,12 +2287,258 @@ class fxcmpy(object):
 
             The column 'date' is always included.
 
+        max_workers: integer (default 4),
+            the maximal number of concurrent requests if the range between
+            start and end exceeds the server limit of 10000 candles and is
+            split into several requests.
+
+        progress: callable or None (default None),
+            called with two positional arguments, the number of finished
+            requests and the total number of requests, after each request.
+
+        dtype: one of 'float64' (default) or 'float32',
+            the data type of the price columns. The column 'tickqty' is
+            always of type int32.
+
         Returns:
 
         A pandas DataFrame containing the requested data.
 
         """
 
+        if end == None and stop is not None:
+            end = stop
+
+        frames = list(self.iter_candles(instrument, offer_id, period, number,
+                                        start, end, False, columns,
+                                        max_workers, progress, dtype))
+        if len(frames) > 1:
+            frames = [frame for frame in frames if len(frame) > 0] or frames
+        if len(frames) == 1:
+            ret = frames[0]
+        else:
+            ret = pd.concat(frames, ignore_index=True)
+            ret = ret.drop_duplicates(subset='date', keep='last')
+            ret = ret.sort_values('date', kind='stable')
+            if start is None:
+                ret = ret.iloc[-number:]
+            ret = ret.reset_index(drop=True)
+
+        if with_index:
+            ret.set_index('date', inplace=True)
+        return ret
+
+    def get_candles_panel(self, instruments, period='H1', start=None,
+                          end=None, number=10, columns=['bidclose', 'askclose'],
+                          layout='columns', max_workers=8,
+                          return_failures=False):
+        """ Return the candles of several instruments as one aligned
+        pandas DataFrame. The instruments are fetched concurrently over the
+        pooled connections of the session.
+
+        Arguments:
+
+        instruments: list of strings,
+            the instruments as given by get_instruments_for_candles().
+
+        period, start, end, number, columns:
+            see get_candles().
+
+        layout: one of 'columns' (default) or 'rows',
+            with 'columns', the result is indexed by date and has a column
+            MultiIndex (instrument, field). With 'rows', the result has a row
+            MultiIndex (date, instrument) and the fields as columns.
+
+        max_workers: integer (default 8),
+            the maximal number of concurrent requests.
+
+        return_failures: boolean (default False),
+            whether to return a tuple (panel, failures) with failures a dict
+            mapping the failed instruments to the raised exceptions. Failed
+            instruments are logged and missing in the panel in any case.
+
+        Returns:
+
+        A pandas DataFrame with the candles of all instruments, dates which
+        are missing for an instrument are filled with NaN.
+        """
+
+        if layout not in ('columns', 'rows'):
+            raise ValueError("layout must be 'columns' or 'rows'.")
+        try:
+            max_workers = int(max_workers)
+        except:
+            raise TypeError('max_workers must be an integer.')
+        if max_workers < 1:
+            raise ValueError('max_workers must be a positive integer.')
+
+        instruments = list(instruments)
+        frames = dict()
+        failures = dict()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = dict()
+            for instrument in instruments:
+                futures[instrument] = executor.submit(self.get_candles,
+                                                      instrument,
+                                                      period=period,
+                                                      number=number,
+                                                      start=start, end=end,
+                                                      columns=columns,
+                                                      max_workers=1)
+            for instrument in instruments:
+                try:
+                    frames[instrument] = futures[instrument].result()
+                except Exception as inst:
+                    self.logger.error('Can not fetch candles for %s: %s.'
+                                      % (instrument, inst))
+                    failures[instrument] = inst
+
+        if len(frames) == 0:
+            ret = pd.DataFrame()
+        elif layout == 'columns':
+            ret = pd.concat(frames, axis=1, names=['instrument', 'field'],
+                            sort=True)
+        else:
+            ret = pd.concat(frames, axis=0, names=['instrument', 'date'])
+            ret = ret.swaplevel(0, 1).sort_index()
+
+        if return_failures:
+            return ret, failures
+        else:
+            return ret
+
+    def get_candles_multi(self, instrument='', periods=(), offer_id=None,
+                          base='m1', start=None, end=None, with_index=True,
+                          columns=[], **kwargs):
+        """ Return candles of several periods with one download.
+
+        The candles of period base are fetched with get_candles() and
+        resampled locally into all requested periods, aligned to the FXCM
+        trading sessions, see resample_candles().
+
+        Arguments:
+
+        instrument, offer_id, start, end, with_index, columns:
+            see get_candles(). Further keyword arguments are passed to
+            get_candles() as well.
+
+        periods: list of strings,
+            the requested granularities, each not finer than base.
+
+        base: string (default 'm1'),
+            the granularity of the downloaded candles.
+
+        Returns:
+
+        A dict with the periods as keys and pandas DataFrames as values.
+        """
+
+        if base not in self.PERIODS:
+            raise ValueError('base must be one of %s.' % self.PERIODS)
+        for period in periods:
+            if period not in self.PERIODS:
+                raise ValueError('periods must be out of %s.' % self.PERIODS)
+            if self.PERIOD_SECONDS[period] < self.PERIOD_SECONDS[base]:
+                raise ValueError('Period %s is finer than base %s.'
+                                 % (period, base))
+
+        data = self.get_candles(instrument, offer_id, base, start=start,
+                                end=end, with_index=with_index,
+                                columns=columns, **kwargs)
+        ret = dict()
+        for period in periods:
+            if period == base:
+                ret[period] = data
+            else:
+                ret[period] = resample_candles(data, period)
+        return ret
+
+    def iter_candles(self, instrument='', offer_id=None, period='H1',
+                     number=10, start=None, end=None, with_index=True,
+                     columns=[], max_workers=4, progress=None,
+                     dtype='float64'):
+        """ Memory-bounded variant of get_candles(). Returns a generator
+        which yields the data of every server request as pandas.DataFrame.
+
+        If start is given, the range between start and end is split into
+        windows of at most 10000 candles. The windows are fetched with up to
+        max_workers concurrent requests and yielded in chronological order,
+        at most max_workers windows are held in memory at a time. Without
+        start, the pages of the number last candles are yielded from the
+        newest to the oldest.
+
+        For the arguments, see get_candles().
+        """
+
+        offer_id = self.__get_offer_id__(instrument, offer_id)
+
+        if period not in self.PERIODS:
+            self.logger.error('Error in get_candles: Illegal period: %s.'
+                              % period)
+            raise ValueError('period must be one of %s.' % self.PERIODS)
+        if type(number) != int or number < 1:
+            self.logger.error('Error in get_candles: Illegal param. number: %s'
+                              % number)
+            raise ValueError('number must be a positive integer.')
+
+        try:
+            max_workers = int(max_workers)
+        except:
+            raise TypeError('max_workers must be an integer.')
+        if max_workers < 1:
+            raise ValueError('max_workers must be a positive integer.')
+
+        if progress is not None and not callable(progress):
+            raise ValueError('progress must be callable.')
+
+        if dtype not in ('float64', 'float32', np.float64, np.float32):
+            raise ValueError("dtype must be 'float64' or 'float32'.")
+
+        start = self.__get_timestamp__(start, 'start')
+        end = self.__get_timestamp__(end, 'end')
+        to_add = self.__get_candles_columns__(columns)
+
+        if start is not None and self.candle_cache is not None:
+            if end is None:
+                end = int(time.time())
+            yield self.__get_cached_candles__(offer_id, period, start, end,
+                                              to_add, with_index, max_workers,
+                                              progress, dtype)
+        elif start is not None:
+            if end is None:
+                end = int(time.time())
+            windows = self.__get_candles_windows__(period, start, end)
+            params = [{'num': self.MAX_CANDLES, 'from': ws, 'to': we}
+                      for (ws, we) in windows]
+            frames = self.__fetch_candles_windows__(offer_id, period,
+                                                    params, max_workers,
+                                                    progress)
+            for candles in frames:
+                yield self.__candles_to_frame__(candles, to_add, with_index,
+                                                dtype)
+        else:
+            # page backwards from end until number candles are received
+            remaining = number
+            total = -(-number // self.MAX_CANDLES)
+            done = 0
+            while remaining > 0:
+                params = {'num': min(remaining, self.MAX_CANDLES)}
+                if end is not None:
+                    params['to'] = end
+                candles = self.__fetch_candles__(offer_id, period, params)
+                done += 1
+                if progress is not None:
+                    progress(done, total)
+                yield self.__candles_to_frame__(candles, to_add, with_index,
+                                                dtype)
+                if len(candles) == 0 or remaining <= len(candles):
+                    break
+                remaining -= len(candles)
+                end = int(candles[:, 0].min()) - 1
+
+    def __get_offer_id__(self, instrument, offer_id):
+        """ Return the offer id for the given instrument or offer id."""
+
         if instrument == '' and offer_id == None:
             self.logger.error('Error in get_candles: No instrument given!.')
             msg = ('Please provide either an instrument or an offer_id')
@@ -1936,79 +2558,43 @@ class fxcmpy(object):
             if offer_id not in self.offers.values():
                 self.logger.error('Unknown offer_id: %s' % offer_id)
                 raise ValueError('Unknown offer_id: %s' % offer_id)
+        return offer_id
 
-        if period not in self.PERIODS:
-            self.logger.error('Error in get_candles: Illegal period: %s.'
-                              % period)
-            raise ValueError('period must be one of %s.' % self.PERIODS)
-        if type(number) != int or number < 1 or number > 10000:
-            self.logger.error('Error in get_candles: Illegal param. number: %s'
-                              % number)
-            raise ValueError('number must be a integer betwenn 0 and 10000.')
-
-        params = {
-                  'num': number,
-                 }
-
-        if start:
-            if isinstance(start, str):
-                try:
-                    start = dt.datetime.strptime(start, '%Y-%m-%d %H:%M')
-                except:
-                    msg = "start must either be a datetime object or a string"
-                    msg += " in format 'YYYY-MM-DD hh:mm'."
-                    raise ValueError(msg)
+    def __get_timestamp__(self, date, name):
+        """ Return the unix timestamp in seconds of a candles date
+        argument or None if date is None."""
 
-            elif isinstance(start, dt.datetime) or isinstance(start, dt.date):
-                pass
-            else:
-                msg = "start must either be a datetime object or a string"
-                msg += " in format 'YYYY-MM-DD hh:mm'."
-                raise ValueError(msg)
+        if not date:
+            return None
 
-            start = ((start - dt.datetime(1970, 1, 1)) / 
-                     dt.timedelta(seconds=1))
+        msg = "%s must either be a datetime object or a string" % name
+        msg += " in format 'YYYY-MM-DD hh:mm'."
+        if isinstance(date, str):
             try:
-                start = int(start)
+                date = dt.datetime.strptime(date, '%Y-%m-%d %H:%M')
             except:
-                self.logger.error('Error in get_candles:')
-                self.logger.error('Illegal value for start: %s.' % start)
-                raise ValueError('start must be a datetime object.')
-            params['from'] = start
-
-        if end == None and stop is not None:
-            end = stop
-
-        if end:
-            if isinstance(end, str):
-                try:
-                    end = dt.datetime.strptime(end, '%Y-%m-%d %H:%M')
-                except:
-                    msg = "end must either be a datetime object or a string"
-                    msg += " in format 'YYYY-MM-DD hh:mm'."
-                    raise ValueError(msg)
-
-            elif isinstance(end, dt.datetime) or isinstance(end, dt.date):
-                pass
-            else:
-                msg = "end must either be a datetime object or a string"
-                msg += " in format 'YYYY-MM-DD hh:mm'."
                 raise ValueError(msg)
+        elif isinstance(date, dt.datetime):
+            pass
+        elif isinstance(date, dt.date):
+            date = dt.datetime(date.year, date.month, date.day)
+        else:
+            raise ValueError(msg)
 
-            end = ((end - dt.datetime(1970, 1, 1)) / dt.timedelta(seconds=1))
-            try:
-                end = int(end)
-            except:
-                self.logger.error('Error in get_candles:')
-                self.logger.error('Illegal value for end: %s.' % stop)
-                raise ValueError('end must be a datetime object.')
-            params['to'] = end
+        try:
+            return int((date - dt.datetime(1970, 1, 1)) /
+                       dt.timedelta(seconds=1))
+        except:
+            self.logger.error('Error in get_candles:')
+            self.logger.error('Illegal value for %s: %s.' % (name, date))
+            raise ValueError('%s must be a datetime object.' % name)
 
-        data = self.__handle_request__(method='candles/%s/%s'
-                                       % (offer_id, period), params=params)
+    def __get_candles_columns__(self, columns):
+        """ Return the list of candle columns to include for the given
+        columns argument of get_candles()."""
 
         if len(columns) == 0:
-            to_add = self.CANDLES_COLUMNS
+            to_add = list(self.CANDLES_COLUMNS)
         else:
             to_add = ['date', ]
         for field in columns:
@@ -2028,15 +2614,224 @@ class fxcmpy(object):
 '%s', 'asks', 'bids'."
                 raise ValueError(msg % (field,
                                         "','".join(self.CANDLES_COLUMNS)))
+        return to_add
+
+    def __get_candles_windows__(self, period, start, end):
+        """ Split the range from start to end into windows of at most
+        MAX_CANDLES candles of the given period."""
+
+        span = self.MAX_CANDLES * self.PERIOD_SECONDS[period]
+        windows = list()
+        window_start = start
+        while True:
+            window_end = min(window_start + span - 1, end)
+            windows.append((window_start, window_end))
+            if window_end >= end:
+                break
+            window_start = window_end + 1
+        return windows
+
+    def __fetch_candles_windows__(self, offer_id, period, params, max_workers,
+                                  progress):
+        """ Fetch the candles for a list of request parameters with up to
+        max_workers concurrent requests. Returns a generator which yields
+        the candles of each request in the order of requests."""
+
+        if len(params) == 1:
+            candles = self.__fetch_candles__(offer_id, period, params[0])
+            if progress is not None:
+                progress(1, 1)
+            yield candles
+            return
 
-        if 'candles' in data:
-            ret = pd.DataFrame(data['candles'], columns=self.CANDLES_COLUMNS)
-            ret['date'] = pd.to_datetime(ret['date'], unit='s')
+        total = len(params)
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            pending = deque()
+            submitted = 0
+            done = 0
+            while done < total:
+                while submitted < total and len(pending) < max_workers:
+                    pending.append(executor.submit(self.__fetch_candles__,
+                                                   offer_id, period,
+                                                   params[submitted]))
+                    submitted += 1
+                candles = pending.popleft().result()
+                done += 1
+                if progress is not None:
+                    progress(done, total)
+                yield candles
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def __get_cached_candles__(self, offer_id, period, start, end, to_add,
+                               with_index, max_workers, progress, dtype):
+        """ Return the candles between start and end as pandas DataFrame,
+        served from the candle cache and completed with the missing ranges
+        from the server. Only complete candles are cached. Ranges ending
+        less than CANDLE_CACHE_FINAL_AGE seconds ago are marked as covered
+        up to their last candle only, so candles the server delivers late
+        are requested again next time."""
+
+        cache = self.candle_cache
+        t0 = time.time()
+        instrument = self.__get_instrument__(offer_id)
+        # candles starting after complete are still forming
+        complete = min(end, int(time.time()) - self.PERIOD_SECONDS[period])
+        final = int(time.time()) - self.CANDLE_CACHE_FINAL_AGE
+
+        windows = list()
+        if start <= complete:
+            for (gap_start, gap_end) in cache.get_gaps(instrument, period,
+                                                       start, complete):
+                windows += self.__get_candles_windows__(period, gap_start,
+                                                        gap_end)
+        cached = len(windows)
+        if end > complete:
+            windows += self.__get_candles_windows__(period,
+                                                    max(start, complete + 1),
+                                                    end)
+
+        covered = list()
+        recent = list()
+        params = [{'num': self.MAX_CANDLES, 'from': ws, 'to': we}
+                  for (ws, we) in windows]
+        if len(params) > 0:
+            cache.record_miss()
+            fetched = self.__fetch_candles_windows__(offer_id, period, params,
+                                                     max_workers, progress)
+            try:
+                for i, candles in enumerate(fetched):
+                    if i >= cached:
+                        recent.append(candles)
+                        continue
+                    (window_start, window_end) = windows[i]
+                    if window_end >= final:
+                        # not final yet, covered up to the last candle only
+                        last = final
+                        if len(candles) > 0:
+                            last = max(int(candles[-1][0]), final)
+                        window_end = min(window_end, last)
+                    if window_end >= window_start:
+                        covered.append((candles, window_start, window_end))
+            finally:
+                # one write for all windows, also those fetched before an
+                # error
+                cache.add_many(instrument, period, covered)
+
+        if start <= complete:
+            data = cache.load(instrument, period, start, complete)
+            if len(recent) > 0:
+                data = np.concatenate([data] + recent)
+        elif len(recent) > 0:
+            data = np.concatenate(recent)
         else:
-            ret = pd.DataFrame(columns=self.CANDLES_COLUMNS)
+            data = np.empty((0, len(self.CANDLES_COLUMNS)))
+        if len(params) == 0:
+            cache.record_hit(time.time() - t0)
+
+        return self.__candles_to_frame__(data, to_add, with_index, dtype)
+
+    def __get_instrument__(self, offer_id):
+        """ Return the symbol for the given offer id."""
+
+        for symbol in self.offers:
+            if self.offers[symbol] == offer_id:
+                return symbol
+        return str(offer_id)
+
+    def __fetch_candles__(self, offer_id, period, params):
+        """ Send one candles request and return the list of candles."""
+
+        if self.request_cache is None:
+            return self.__request_candles__(offer_id, period, params)
+
+        period_seconds = self.PERIOD_SECONDS[period]
+        max_ttl = self.request_cache_ttl['max_ttl']
+        if 'to' in params and params['to'] < time.time() - period_seconds:
+            ttl = max_ttl
+        else:
+            ttl = min(period_seconds * self.request_cache_ttl['ttl_ratio'],
+                      max_ttl)
+        key = (offer_id, period, tuple(sorted(params.items())))
+        return self.request_cache.get(key, ttl,
+                                      lambda: self.__request_candles__(
+                                                  offer_id, period, params))
+
+    def __request_candles__(self, offer_id, period, params):
+        """ Send one candles request and return the candles as 2-dimensional
+        float array in the order of CANDLES_COLUMNS.
+
+        The answer is requested gzip compressed and parsed while it is
+        received. If the streamed answer can not be parsed, the request is
+        repeated and the answer parsed as a whole.
+        """
+
+        method = 'candles/%s/%s' % (offer_id, period)
+        width = len(self.CANDLES_COLUMNS)
+        req = self.__handle_request__(method=method, params=params,
+                                      stream=True)
+        parser = fxcmpy_candles_parser(width)
+        try:
+            for chunk in req.iter_content(chunk_size=self.STREAM_CHUNK_SIZE):
+                parser.feed(chunk)
+            candles, data = parser.close()
+        except Exception as inst:
+            self.logger.warn('Can not parse streamed candles: %s, '
+                             'repeating the request.' % inst)
+            data = self.__handle_request__(method=method, params=params)
+            candles = np.asarray(data.get('candles', list()), dtype=float)
+            return candles.reshape(-1, width)
+        finally:
+            req.close()
+
+        self.__check_response__(data)
+        if candles is None:
+            return np.empty((0, width))
+        return candles
+
+    @classmethod
+    def __candles_to_frame__(cls, candles, to_add, with_index,
+                             dtype='float64'):
+        """ Return the candles as pandas DataFrame with the columns
+        to_add.
+
+        The candles, either the list of lists of the server answer or a
+        2-dimensional array, are decoded column by column directly into typed
+        arrays: int64 timestamps, prices of type dtype and int32 tick
+        quantities. Columns not in to_add are never decoded.
+        """
 
-        ret = ret[to_add]
+        is_array = isinstance(candles, np.ndarray)
+        if is_array and candles.ndim != 2:
+            # e.g. an empty 1-dimensional array
+            candles = candles.reshape(-1, len(cls.CANDLES_COLUMNS))
+        number = len(candles)
+        data = dict()
+        for field in to_add:
+            i = cls.CANDLES_COLUMNS.index(field)
+            if field == 'date':
+                col_type = np.int64
+            elif field == 'tickqty':
+                col_type = np.int32
+            else:
+                col_type = dtype
+            if is_array:
+                values = candles[:, i].astype(col_type)
+            elif col_type is np.int64 or col_type is np.int32:
+                # the server may send integral values as floats
+                values = np.fromiter(map(itemgetter(i), candles), np.float64,
+                                     number).astype(col_type)
+            else:
+                values = np.fromiter(map(itemgetter(i), candles), col_type,
+                                     number)
+            if field == 'date':
+                values = pd.to_datetime(values, unit='s')
+            data[field] = values
 
+        ret = pd.DataFrame(data, columns=to_add, copy=False)
         if with_index:
             ret.set_index('date', inplace=True)
         return ret
@@ -2050,26 +2845,33 @@ class fxcmpy(object):
             if 'accountId' in acc and acc['accountId'] != '':
                 self.account_ids.add(int(acc['accountId']))
         self.account_ids = list(self.account_ids)
+        self.__collect_model_table__('Account', data)
 
     def __collect_orders__(self):
         """ Collects available orders and stores them in self.orders."""
 
         data = self.get_orders('list')
-        for order in data:
-            if 'orderId' in order and order['orderId'] != '':
-                self.orders[int(order['orderId'])] = fxcmpy_order(self, order)
+        with self.write_lock:
+            orders = dict(self.orders)
+            for order in data:
+                if 'orderId' in order and order['orderId'] != '':
+                    orders[int(order['orderId'])] = fxcmpy_order(self, order)
+            self.__publish__(orders=orders)
 
     def __collect_oco_orders__(self):
         """ Collect available oco orders and stores them in self.oco_orders."""
 
-        for order in self.orders.values():
-            if order.__ocoBulkId__ != 0:
-                if order.__ocoBulkId__ in self.oco_orders:
-                    self.oco_orders[order.__ocoBulkId__].__add__(order)
-                else:
-                    oco = fxcmpy_oco_order(order.__ocoBulkId__, [order, ], self,
-                                         self.logger)
-                    self.oco_orders[order.__ocoBulkId__] = oco
+        with self.write_lock:
+            oco_orders = dict(self.oco_orders)
+            for order in self.orders.values():
+                if order.__ocoBulkId__ != 0:
+                    if order.__ocoBulkId__ in oco_orders:
+                        oco_orders[order.__ocoBulkId__].__add__(order)
+                    else:
+                        oco = fxcmpy_oco_order(order.__ocoBulkId__, [order, ],
+                                               self, self.logger)
+                        oco_orders[order.__ocoBulkId__] = oco
+            self.__publish__(oco_orders=oco_orders)
 
     def __collect_offers__(self):
         """ Collect available offers and stores them in self.offers, a dict
@@ -2079,18 +2881,177 @@ class fxcmpy(object):
         for offer in offers:
             if 'currency' in offer and 'offerId' in offer:
                 self.offers[offer['currency']] = int(offer['offerId'])
+        self.__collect_model_table__('Offer', offers)
+
+    def __collect_model_table__(self, model, data):
+        """ Store the datasets of a model snapshot in the model's local
+        table."""
+
+        table_name, key_field = self.MODEL_TABLES[model]
+        table = dict()
+        for dataset in data:
+            key = self.__get_model_key__(dataset, key_field)
+            if key is not None:
+                table[key] = dict(dataset)
+        with self.write_lock:
+            self.__publish__(**{table_name: table})
+
+    def __get_model_key__(self, dataset, key_field):
+        if key_field not in dataset or dataset[key_field] == '':
+            return None
+        try:
+            return int(dataset[key_field])
+        except:
+            return dataset[key_field]
+
+    def __get_local_table__(self, model, kind):
+        table = getattr(self, self.MODEL_TABLES[model][0])
+        data = list(table.values())
+        if kind == 'list':
+            return data
+        else:
+            return pd.DataFrame(data)
+
+    def __get_pip_size__(self, symbol):
+        """ Return the pip size of the given symbol. """
+
+        try:
+            pip = float(self.offer_table[self.offers[symbol]]['pip'])
+        except:
+            pip = 0
+        if pip > 0:
+            return pip
+        elif 'JPY' in symbol:
+            return 0.01
+        else:
+            return 0.0001
 
     def __collect_positions__(self):
         data = self.get_open_positions('list')
-        for pos in data:
-            if 'tradeId' in pos and pos['tradeId'] != '':
-                self.open_pos[int(pos['tradeId'])] = fxcmpy_open_position(self,
-                                                                        pos)
-        data = self.get_closed_positions('list')
-        for po in data:
-            if 'tradeId' in po and po['tradeId'] != '':
-                self.closed_pos[int(po['tradeId'])] = fxcmpy_closed_position(self,
-                                                                           po)
+        data_closed = self.get_closed_positions('list')
+        with self.write_lock:
+            open_pos = dict(self.open_pos)
+            for pos in data:
+                if 'tradeId' in pos and pos['tradeId'] != '':
+                    open_pos[int(pos['tradeId'])] = fxcmpy_open_position(self,
+                                                                         pos)
+            closed_pos = dict(self.closed_pos)
+            for po in data_closed:
+                if 'tradeId' in po and po['tradeId'] != '':
+                    closed_pos[int(po['tradeId'])] = fxcmpy_closed_position(
+                                                                      self, po)
+            self.__publish__(open_pos=open_pos, closed_pos=closed_pos)
+        self.pl_engine.invalidate()
+
+    def __publish__(self, **tables):
+        """ Swap in new versions of the given tables and publish a new
+        snapshot. Must be called with write_lock held, the given dicts must
+        not be changed afterwards."""
+
+        for table in tables:
+            setattr(self, table, tables[table])
+        self.snapshot = fxcmpy_snapshot(self.snapshot.version + 1,
+                                        **dict((table, getattr(self, table))
+                                               for table in
+                                               fxcmpy_snapshot.tables))
+
+    def __track_retention__(self, table, key):
+        """ Register a new record of old_orders or closed_pos with the
+        retention policy and evict expired records."""
+
+        with self.write_lock:
+            if (self.retention['max_count'] is None and
+                    self.retention['max_age'] is None):
+                return
+            self.retention_times[table][key] = time.time()
+            self.__apply_retention__(table)
+
+    def __run_retention__(self, max_age):
+        """ Evict the expired records of old_orders and closed_pos
+        periodically, otherwise records would expire only when new records
+        arrive. Runs in the retention thread."""
+
+        interval = max(min(max_age, self.RETENTION_INTERVAL), 0.01)
+        while not self.retention_stop.wait(interval):
+            try:
+                with self.write_lock:
+                    for table in self.retention_times:
+                        self.__apply_retention__(table)
+            except Exception as inst:
+                self.logger.error('Retention failed: %s.' % inst)
+
+    def __stop_retention__(self):
+        """ Stop the retention thread."""
+
+        self.retention_stop.set()
+        if self.retention_thread is not None:
+            self.retention_thread.join()
+            self.retention_thread = None
+
+    def __load_archived__(self, table, key):
+        """ Return the archived record of old_orders or closed_pos with the
+        given id or None if there is no archive, no such record or the
+        record can not be read."""
+
+        if self.archive is None:
+            return None
+        try:
+            return self.archive.load(table, key, self)
+        except:
+            self.logger.error('Can not read record %s of %s from the '
+                              'archive: %s.' % (key, table,
+                                                sys.exc_info()[1]))
+            return None
+
+    def __apply_retention__(self, table):
+        """ Evict the oldest records of old_orders or closed_pos which
+        violate the retention policy. Must be called with write_lock
+        held."""
+
+        records = getattr(self, table)
+        times = self.retention_times[table]
+        max_count = self.retention['max_count']
+        max_age = self.retention['max_age']
+
+        evicted = dict()
+        if max_count is not None and len(records) > max_count:
+            for key in list(records)[:len(records) - max_count]:
+                evicted[key] = records[key]
+        if max_age is not None:
+            limit = time.time() - max_age
+            for key in list(times):
+                if times[key] >= limit:
+                    break
+                if key in records:
+                    evicted[key] = records[key]
+                else:
+                    del times[key]
+        if len(evicted) == 0:
+            return
+
+        if self.archive is not None:
+            try:
+                self.archive.store(table, evicted)
+            except:
+                self.logger.error('Can not archive records of %s: %s.'
+                                  % (table, sys.exc_info()[1]))
+        records = dict(records)
+        for key in evicted:
+            records.pop(key, None)
+            times.pop(key, None)
+        self.__publish__(**{table: records})
+        self.logger.info('Evicted %s records from %s.' % (len(evicted), table))
+
+    def __check_risk__(self, orders, exclusive=False):
+        """ Check the new orders, given as tuples (symbol, is_buy, amount,
+        account_id), with the risk engine if one is set."""
+
+        if self.risk_engine is None:
+            return
+        orders = [{'symbol': symbol, 'is_buy': is_buy in (True, 'true'),
+                   'amount': amount, 'account_id': account_id}
+                  for (symbol, is_buy, amount, account_id) in orders]
+        self.risk_engine.check_orders(self, orders, exclusive=exclusive)
 
     def __connect__(self):
         try:
@@ -2139,8 +3100,30 @@ class fxcmpy(object):
                                     protocol='post')
             self.socket.on(symbol, self.__on_price_update__)
 
-    def __handle_request__(self, method='', params={}, protocol='get'):
-        """ Sends server requests. """
+    def __handle_request__(self, method='', params={}, protocol='get',
+                           stream=False):
+        """ Sends server requests and counts the trading requests in
+        flight, see __send_request__(). """
+
+        if not method.startswith('trading/'):
+            return self.__send_request__(method, params, protocol, stream)
+        with self.trading_idle:
+            self.trading_requests += 1
+        try:
+            return self.__send_request__(method, params, protocol, stream)
+        finally:
+            with self.trading_idle:
+                self.trading_requests -= 1
+                self.trading_idle.notify_all()
+
+    def __send_request__(self, method='', params={}, protocol='get',
+                         stream=False):
+        """ Sends server requests.
+
+        With stream=True, the GET request asks for a gzip compressed answer
+        and the response object is returned unread, the caller must check
+        the answer with __check_response__() and close the response.
+        """
 
         if method == '':
             self.logger.error('Error in __handle__requests__: No method given')
@@ -2173,8 +3156,8 @@ class fxcmpy(object):
         self.logger.info('Sending request to %s/%s, parameter: %s.'
                          % (self.trading_url, method, params))
         if protocol == 'post':
-            req = requests.post('%s:443/%s' % (self.trading_url, method),
-                                headers=self.request_headers, data=params)
+            req = self.session.post('%s:443/%s' % (self.trading_url, method),
+                                    headers=self.request_headers, data=params)
             self.logger.info('Sending POST Request:')
             self.logger.info('URL: %s' % req.url)
             self.logger.info('Payload: %s' % req.request.body)
@@ -2182,8 +3165,13 @@ class fxcmpy(object):
             self.logger.info('Params: %s' % params)
 
         else:
-            req = requests.get('%s:443/%s' % (self.trading_url, method),
-                               headers=self.request_headers, params=params)
+            headers = self.request_headers
+            if stream:
+                headers = dict(headers)
+                headers['Accept-Encoding'] = 'gzip'
+            req = self.session.get('%s:443/%s' % (self.trading_url, method),
+                                   headers=headers, params=params,
+                                   stream=stream)
             self.logger.info('Sending GET Request:')
             self.logger.info('URL: %s' % req.url)
             self.logger.info('Headers: %s' % req.request.headers)
@@ -2197,12 +3185,23 @@ class fxcmpy(object):
                               % (req.status_code,
                                  unquote(req.text)))
 
+        if stream:
+            return req
+
         try:
             data = req.json()
         except:
             self.logger.error('Can not parse server answer to json object: %s.'
                               % req.text)
 
+        self.__check_response__(data)
+        self.logger.debug('Server answer: %s.' % data)
+        return data
+
+    def __check_response__(self, data):
+        """ Raises a ServerError if the server answer data reports an
+        error. """
+
         if 'response' not in data or 'executed' not in data['response']:
             self.logger.error('Malformed response %s' % data)
             raise ServerError('Malformed response')
@@ -2218,9 +3217,6 @@ class fxcmpy(object):
                                   % data['response'])
                 raise ServerError('FXCM Server returns an unknown error.')
 
-        self.logger.debug('Server answer: %s.' % data)
-        return data
-
     def __on_price_update__(self, msg):
         data = json.loads(msg)
 
@@ -2229,10 +3225,20 @@ class fxcmpy(object):
         temp_data = pd.DataFrame([data['Rates']],
                                  columns=['Bid', 'Ask', 'High', 'Low'],
                                  index=[date])
-        if symbol not in self.prices:
-            self.prices[symbol] = temp_data
-        else:
-            self.prices[symbol] = pd.concat([self.prices[symbol], temp_data])
+        with self.write_lock:
+            prices = dict(self.prices)
+            if symbol not in prices:
+                prices[symbol] = temp_data
+            else:
+                prices[symbol] = pd.concat([prices[symbol], temp_data])
+            self.__publish__(prices=prices)
+
+        try:
+            self.pl_engine.__on_price_update__(symbol, float(data['Rates'][0]),
+                                               float(data['Rates'][1]))
+        except:
+            self.logger.error('P&L update for %s raised an error: %s.'
+                              % (symbol, sys.exc_info()[1]))
 
         if symbol in self.add_callbacks:
             callbacks = self.add_callbacks[symbol]
@@ -2256,6 +3262,68 @@ class fxcmpy(object):
         except:
             pass
 
+    def __on_offer_update__(self, msg):
+        """ Gets called when the offer stream sends new data."""
+
+        self.__on_model_table_update__('Offer', msg)
+
+    def __on_account_update__(self, msg):
+        """ Gets called when the account stream sends new data."""
+
+        self.__on_model_table_update__('Account', msg)
+
+    def __on_summary_update__(self, msg):
+        """ Gets called when the summary stream sends new data."""
+
+        self.__on_model_table_update__('Summary', msg)
+
+    def __on_model_table_update__(self, model, msg):
+        """ Apply a delta of the Offer, Account or Summary stream to the
+        local table of the model.
+
+        Arguments:
+
+        model: string,
+            one of 'Offer', 'Account' or 'Summary'.
+
+        msg: string,
+            a json like data object.
+        """
+
+        try:
+            data = json.loads(msg)
+        except:
+            self.logger.warn('Got non json answer in %s stream, ignoring.'
+                             % model)
+            self.logger.warn(msg)
+            return -1
+
+        table_name, key_field = self.MODEL_TABLES[model]
+        key = self.__get_model_key__(data, key_field)
+        if key is None:
+            self.logger.debug('Update data without %s: %s' % (key_field, data))
+        else:
+            with self.write_lock:
+                table = dict(getattr(self, table_name))
+                if 'action' in data and data['action'] == 'D':
+                    table.pop(key, None)
+                else:
+                    row = dict(table.get(key, dict()))
+                    row.update(data)
+                    row.pop('action', None)
+                    table[key] = row
+                self.__publish__(**{table_name: table})
+
+        if model in self.add_callbacks:
+            callbacks = self.add_callbacks[model]
+            for func in callbacks:
+                try:
+                    callbacks[func](data)
+                except:
+                    self.logger.error('Call of %s raised an error:' % func)
+                    self.logger.error(sys.exc_info()[0])
+                    self.logger.error(sys.exc_info()[1])
+
     def __on_message__(self, msg):
         # Answers not always json objects, so we have to log the raw answer
         try:
@@ -2283,7 +3351,10 @@ class fxcmpy(object):
         if 'action' in data and data['action'] == 'I':
             self.logger.info('Got a insert event for orders: %s.' % data)
             order_id = int(data['orderId'])
-            self.orders[order_id] = fxcmpy_order(self, data)
+            with self.write_lock:
+                orders = dict(self.orders)
+                orders[order_id] = fxcmpy_order(self, data)
+                self.__publish__(orders=orders)
 
         elif 'action' in data and data['action'] == 'D':
             self.logger.warn('Got a delete event for orders: %s.' % data)
@@ -2296,8 +3367,13 @@ class fxcmpy(object):
                     except:
                         pass
 
-                self.old_orders[order_id] = order
-                del self.orders[order_id]
+                with self.write_lock:
+                    orders = dict(self.orders)
+                    old_orders = dict(self.old_orders)
+                    old_orders[order_id] = order
+                    del orders[order_id]
+                    self.__publish__(orders=orders, old_orders=old_orders)
+                self.__track_retention__('old_orders', order_id)
 
         elif ('action' in data and
               data['action'] != 'I' and data['action'] != 'D' and
@@ -2358,10 +3434,19 @@ class fxcmpy(object):
             if 'action' in data and data['action'] == 'I':
                 self.logger.warn('Got a insert event for open positions: %s.'
                                  % data)
-                self.open_pos[trade_id] = fxcmpy_open_position(self, data)
+                with self.write_lock:
+                    open_pos = dict(self.open_pos)
+                    open_pos[trade_id] = fxcmpy_open_position(self, data)
+                    self.__publish__(open_pos=open_pos)
+                self.pl_engine.invalidate(open_pos[trade_id].get_currency())
             elif 'action' in data and data['action'] == 'D':
                 self.logger.warn('Got a delete event for open posi: %s' % data)
-                del self.open_pos[trade_id]
+                if trade_id in self.open_pos:
+                    with self.write_lock:
+                        open_pos = dict(self.open_pos)
+                        symbol = open_pos.pop(trade_id).get_currency()
+                        self.__publish__(open_pos=open_pos)
+                    self.pl_engine.invalidate(symbol)
 
             elif ('action' in data and
                   data['action'] != 'I' and data['action'] != 'D' and
@@ -2374,6 +3459,11 @@ class fxcmpy(object):
                 pos = self.open_pos[trade_id]
                 for field in data:
                     pos.__set_attribute__(field, data[field])
+                # without price stream, the engine serves the server's values
+                if ('amountK' in data or 'open' in data or 'isBuy' in data or
+                        'currencyPoint' in data or
+                        pos.get_currency() not in self.prices):
+                    self.pl_engine.invalidate(pos.get_currency())
 
         if 'OpenPosition' in self.add_callbacks:
             callbacks = self.add_callbacks['OpenPosition']
@@ -2408,10 +3498,17 @@ class fxcmpy(object):
             if 'action' in data and data['action'] == 'I':
                 self.logger.warn('Got a insert event for closed positions: %s.'
                                  % data)
-                self.closed_pos[trade_id] = fxcmpy_closed_position(self, data)
+                with self.write_lock:
+                    closed_pos = dict(self.closed_pos)
+                    closed_pos[trade_id] = fxcmpy_closed_position(self, data)
+                    self.__publish__(closed_pos=closed_pos)
+                self.__track_retention__('closed_pos', trade_id)
             elif 'action' in data and data['action'] == 'D':
                 self.logger.warn('Got delete event for closed pos: %s' % data)
-                del self.closed_pos[trade_id]
+                with self.write_lock:
+                    closed_pos = dict(self.closed_pos)
+                    closed_pos.pop(trade_id, None)
+                    self.__publish__(closed_pos=closed_pos)
 
             elif ('action' in data and
                   data['action'] != 'I' and data['action'] != 'D' and
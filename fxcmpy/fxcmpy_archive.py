@@ -0,0 +1,124 @@
+#
+# fxcmpy_archive -- A Python Wrapper Class for the
+# RESTful API as provided by FXCM Forex Capital Markets Ltd.
+#
+# Proof-of-Concept | Prototype Version for Illustration
+# by The Python Quants GmbH
+#
+# The codes contained herein come without warranties or representations,
+# to the extent permitted by applicable law.
+#
+# Read the RISK DISCLAIMER carefully.
+#
+# (c) FXCM Forex Capital Markets Ltd.
+#
+
+
+import pickle
+import sqlite3
+from threading import Lock
+
+from fxcmpy.fxcmpy_closed_position import fxcmpy_closed_position
+from fxcmpy.fxcmpy_order import fxcmpy_order
+
+
+class fxcmpy_archive(object):
+    """ A SQLite store for orders and closed positions evicted from the
+    in-memory tables of a fxcmpy connection by the retention policy.
+
+    Caution:
+
+    Do not initialize the archive manually, use the set_retention() method
+    of the fxcmpy class instead.
+    """
+
+    tables = {'old_orders': fxcmpy_order,
+              'closed_pos': fxcmpy_closed_position}
+
+    def __init__(self, path):
+        """ Constructor.
+
+        Arguments:
+
+        path: string,
+            path of the SQLite database file, created if it does not exist.
+        """
+
+        self.path = path
+        self.lock = Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.lock:
+            for table in self.tables:
+                self.db.execute('CREATE TABLE IF NOT EXISTS %s '
+                                '(id INTEGER PRIMARY KEY, data BLOB)' % table)
+            self.db.commit()
+
+    def close(self):
+        """ Close the database file."""
+
+        with self.lock:
+            self.db.close()
+
+    def store(self, table, records):
+        """ Append records to the archive.
+
+        Arguments:
+
+        table: string, one of 'old_orders' or 'closed_pos',
+            the table the records are evicted from.
+
+        records: dict,
+            the records to store, ids as keys and fxcmpy_order or
+            fxcmpy_closed_position objects as values.
+        """
+
+        rows = [(int(key), self.__dump__(obj)) for key, obj in records.items()]
+        with self.lock:
+            self.db.executemany('INSERT OR REPLACE INTO %s VALUES (?, ?)'
+                                % table, rows)
+            self.db.commit()
+
+    def load(self, table, key, connection):
+        """ Return the archived record of the given table with the given id
+        or None if there is no such record."""
+
+        with self.lock:
+            row = self.db.execute('SELECT data FROM %s WHERE id = ?' % table,
+                                  (int(key),)).fetchone()
+        if row is None:
+            return None
+        return self.__load__(self.tables[table], row[0], connection)
+
+    def get_ids(self, table):
+        """ Return the ids of all archived records of the given table."""
+
+        with self.lock:
+            rows = self.db.execute('SELECT id FROM %s ORDER BY id'
+                                   % table).fetchall()
+        return [row[0] for row in rows]
+
+    def __dump__(self, obj):
+        """ Serialize the attributes of an order or position object."""
+
+        attributes = dict()
+        for para in obj.parameter:
+            attributes[para] = getattr(obj, '__%s__' % para)
+        if isinstance(obj, fxcmpy_order):
+            attributes['tradeId'] = obj.__tradeId__
+        return pickle.dumps(attributes, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def __load__(self, cls, data, connection):
+        """ Rebuild an order or position object without re-parsing its
+        attributes."""
+
+        attributes = pickle.loads(data)
+        obj = cls.__new__(cls)
+        obj.__con__ = connection
+        obj.parameter = set()
+        if cls is fxcmpy_order:
+            obj.logger = connection.logger
+            obj.__tradeId__ = attributes.pop('tradeId', 0)
+        for para, value in attributes.items():
+            obj.parameter.add(para)
+            setattr(obj, '__%s__' % para, value)
+        return obj
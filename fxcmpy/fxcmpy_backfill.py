@@ -0,0 +1,343 @@
+#
+# fxcmpy_backfill -- A Python Wrapper Class for the
+# RESTful API as provided by FXCM Forex Capital Markets Ltd.
+#
+# Proof-of-Concept | Prototype Version for Illustration
+# by The Python Quants GmbH
+#
+# The codes contained herein come without warranties or representations,
+# to the extent permitted by applicable law.
+#
+# Read the RISK DISCLAIMER carefully.
+#
+# (c) FXCM Forex Capital Markets Ltd.
+#
+
+
+import logging
+import time
+from threading import Event, Lock, Thread
+
+import numpy as np
+import pandas as pd
+
+from fxcmpy.fxcmpy_resample import PERIOD_FREQUENCIES, SESSION_OFFSET
+from fxcmpy.fxcmpy_resample import SESSION_TIMEZONE, get_session_labels
+
+
+def is_trading_time(index):
+    """ Return a boolean array which is True for the dates of index, given
+    in UTC, at which the market is open, i.e. from Sunday 17:00 to Friday
+    17:00 New York time. Holidays are not taken into account."""
+
+    index = pd.DatetimeIndex(index)
+    if index.tz is None:
+        index = index.tz_localize('UTC')
+    local = index.tz_convert(SESSION_TIMEZONE).tz_localize(None)
+    # the sessions from Monday to Friday start at midnight when shifted
+    return np.asarray((local + SESSION_OFFSET).dayofweek < 5)
+
+
+def find_candle_gaps(index, period, end=None):
+    """ Return the missing candles of a series as list of ranges.
+
+    The candles expected between the first date of index and end are
+    derived from period and the trading calendar, see is_trading_time().
+    Candles of periods from 'H2' upwards are expected at the start of the
+    buckets of resample_candles().
+
+    Arguments:
+
+    index: pandas.DatetimeIndex,
+        the dates of the candles held, in UTC.
+
+    period: string,
+        the granularity of the candles, one of 'm1', 'm5', 'm15', 'm30',
+        'H1', 'H2', 'H3', 'H4', 'H6', 'H8', 'D1', 'W1' or 'M1'.
+
+    end: datetime or None (default None),
+        the date of the last expected candle. If None, the last date of index
+        is used.
+
+    Returns:
+
+    A list of tuples (first, last) with the dates of the first and the last
+    missing candle of every gap.
+    """
+
+    if period not in PERIOD_FREQUENCIES and period not in ('W1', 'M1'):
+        raise ValueError('period must be one of %s.'
+                         % (list(PERIOD_FREQUENCIES) + ['W1', 'M1']))
+    index = pd.DatetimeIndex(index)
+    if len(index) == 0:
+        return list()
+    first = index.min()
+    last = index.max()
+    if end is not None:
+        last = max(last, pd.Timestamp(end))
+
+    if period in ('m1', 'm5', 'm15', 'm30', 'H1'):
+        expected = pd.date_range(first, last, freq=PERIOD_FREQUENCIES[period])
+        expected = expected[is_trading_time(expected)]
+    else:
+        hours = pd.date_range(first.floor('h'), last, freq='h')
+        hours = hours[is_trading_time(hours)]
+        expected = pd.DatetimeIndex(np.unique(
+                       get_session_labels(hours, period).values))
+        expected = expected[(expected >= first) & (expected <= last)]
+
+    missing = np.flatnonzero(~expected.isin(index))
+    if len(missing) == 0:
+        return list()
+    # consecutive expected candles form one gap
+    breaks = np.flatnonzero(np.diff(missing) > 1)
+    starts = np.concatenate(([missing[0]], missing[breaks + 1]))
+    ends = np.concatenate((missing[breaks], [missing[-1]]))
+    return [(expected[s], expected[e]) for s, e in zip(starts, ends)]
+
+
+class fxcmpy_backfill(object):
+    """ Keeps rolling candle series complete.
+
+    The watched series are checked regularly against the period and the
+    trading calendar. Missing candles are requested with get_candles() in
+    the background, one request at a time and only while no trading request
+    of the connection is in flight. Every gap is requested once, gaps the
+    server has no candles for, e.g. on holidays, are not requested again.
+
+    Caution:
+
+    Do not initialize the backfill manually, use the set_backfill() method
+    of the fxcmpy class instead.
+    """
+
+    def __init__(self, connection, interval=60, min_delay=1.0,
+                 callback=None):
+        """ Constructor.
+
+        Arguments:
+
+        connection: fxcmpy object,
+            the connection to request the candles from.
+
+        interval: number (default 60),
+            the time in seconds between two checks of the series.
+
+        min_delay: number (default 1.0),
+            the minimal time in seconds between two backfill requests.
+
+        callback: callable or None (default None),
+            called with the arguments instrument, period and the received
+            candles as pandas DataFrame after every backfill.
+        """
+
+        try:
+            interval = float(interval)
+            min_delay = float(min_delay)
+        except:
+            raise TypeError('interval and min_delay must be numbers.')
+        if interval <= 0:
+            raise ValueError('interval must be positive.')
+
+        self.con = connection
+        self.interval = interval
+        self.min_delay = min_delay
+        self.callback = callback
+        self.logger = logging.getLogger('FXCM')
+        self.lock = Lock()
+        self.series = dict()
+        self.columns = dict()
+        self.requested = dict()
+        self.stats = {'checks': 0, 'gaps': 0, 'requests': 0, 'candles': 0,
+                      'failures': 0}
+        self.last_request = 0
+        self.stop_event = Event()
+        self.thread = None
+
+    def watch(self, instrument, period='H1', data=None, number=100,
+              columns=[]):
+        """ Start watching a series.
+
+        Arguments:
+
+        instrument: string,
+            the instrument of the series.
+
+        period: string (default 'H1'),
+            the granularity of the series.
+
+        data: pandas.DataFrame or None (default None),
+            the candles held, with the dates as index or in the column
+            'date'. If None, the last number candles are requested.
+
+        number: integer (default 100),
+            the number of candles to request if data is None.
+
+        columns: list (default []),
+            the columns to request if data is None, see get_candles().
+        """
+
+        if period not in self.con.PERIOD_SECONDS:
+            raise ValueError('period must be one of %s.'
+                             % list(self.con.PERIOD_SECONDS))
+        if data is None:
+            data = self.con.get_candles(instrument, period=period,
+                                        number=number, columns=columns)
+        elif 'date' in data.columns:
+            data = data.set_index('date')
+        key = (instrument, period)
+        with self.lock:
+            self.series[key] = data.sort_index()
+            self.columns[key] = [col for col in data.columns
+                                 if col in self.con.CANDLES_COLUMNS]
+            self.requested[key] = set()
+
+    def unwatch(self, instrument, period='H1'):
+        """ Stop watching a series."""
+
+        key = (instrument, period)
+        with self.lock:
+            for table in (self.series, self.columns, self.requested):
+                table.pop(key, None)
+
+    def update(self, instrument, period, candles):
+        """ Add new candles, e.g. from a live feed, to a watched series."""
+
+        if 'date' in candles.columns:
+            candles = candles.set_index('date')
+        self.__merge__((instrument, period), candles)
+
+    def get_series(self, instrument, period='H1'):
+        """ Return the candles of a watched series as pandas DataFrame."""
+
+        key = (instrument, period)
+        with self.lock:
+            if key not in self.series:
+                raise ValueError('%s %s is not watched.' % key)
+            return self.series[key]
+
+    def get_gaps(self, instrument, period='H1'):
+        """ Return the gaps of a watched series which have not been
+        requested yet, see find_candle_gaps()."""
+
+        key = (instrument, period)
+        with self.lock:
+            if key not in self.series:
+                raise ValueError('%s %s is not watched.' % key)
+            index = self.series[key].index
+            requested = set(self.requested[key])
+        # candles are expected up to the last complete one
+        end = pd.Timestamp(int(time.time()) - self.con.PERIOD_SECONDS[period],
+                           unit='s')
+        gaps = find_candle_gaps(index, period, end)
+        return [gap for gap in gaps if gap not in requested]
+
+    def check(self):
+        """ Check all watched series once and backfill their gaps."""
+
+        with self.lock:
+            keys = list(self.series)
+        self.stats['checks'] += 1
+        for key in keys:
+            try:
+                gaps = self.get_gaps(*key)
+            except ValueError:
+                # unwatched meanwhile
+                continue
+            self.stats['gaps'] += len(gaps)
+            for gap in gaps:
+                if self.stop_event.is_set():
+                    return
+                self.__backfill__(key, gap)
+
+    def start(self):
+        """ Start checking the series in a background thread."""
+
+        if self.is_running():
+            return
+        self.stop_event.clear()
+        self.thread = Thread(target=self.__run__, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """ Stop the background thread."""
+
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def is_running(self):
+        """ Return True if the background thread is running."""
+
+        return self.thread is not None and self.thread.is_alive()
+
+    def get_stats(self):
+        """ Return a dict with the number of checks, detected gaps, backfill
+        requests, received candles and failed requests."""
+
+        return dict(self.stats)
+
+    def __run__(self):
+        while not self.stop_event.is_set():
+            try:
+                self.check()
+            except Exception as inst:
+                self.logger.error('Candle backfill failed: %s.' % inst)
+            self.stop_event.wait(self.interval)
+
+    def __backfill__(self, key, gap):
+        """ Request the candles of one gap and merge them into the series."""
+
+        self.__wait_for_idle__()
+        if self.stop_event.is_set():
+            return
+        instrument, period = key
+        self.last_request = time.time()
+        self.stats['requests'] += 1
+        try:
+            candles = self.con.get_candles(instrument, period=period,
+                                           start=gap[0].to_pydatetime(),
+                                           end=gap[1].to_pydatetime(),
+                                           columns=self.columns.get(key, []),
+                                           max_workers=1)
+        except Exception as inst:
+            self.stats['failures'] += 1
+            self.logger.warning('Can not backfill %s %s from %s to %s: %s.'
+                                % (instrument, period, gap[0], gap[1], inst))
+            return
+        # the server may not yet have the candles of a gap which just ended
+        recent = time.time() - 2 * self.con.PERIOD_SECONDS[period]
+        with self.lock:
+            if key not in self.requested:
+                return
+            if len(candles) > 0 or gap[1].timestamp() < recent:
+                self.requested[key].add(gap)
+        self.logger.info('Backfilled %s candles of %s %s from %s to %s.'
+                         % (len(candles), instrument, period, gap[0], gap[1]))
+        self.stats['candles'] += len(candles)
+        if len(candles) > 0:
+            self.__merge__(key, candles)
+            if self.callback is not None:
+                self.callback(instrument, period, candles)
+
+    def __wait_for_idle__(self):
+        """ Wait for min_delay after the last backfill request and until no
+        trading request of the connection is in flight."""
+
+        wait = self.last_request + self.min_delay - time.time()
+        if wait > 0:
+            self.stop_event.wait(wait)
+        idle = self.con.trading_idle
+        with idle:
+            while (self.con.trading_requests > 0 and
+                   not self.stop_event.is_set()):
+                idle.wait(1)
+
+    def __merge__(self, key, candles):
+        with self.lock:
+            if key not in self.series:
+                raise ValueError('%s %s is not watched.' % key)
+            data = pd.concat([self.series[key], candles])
+            data = data[~data.index.duplicated(keep='last')].sort_index()
+            self.series[key] = data
@@ -0,0 +1,250 @@
+#
+# fxcmpy_backtest -- A Python Wrapper Class for the
+# RESTful API as provided by FXCM Forex Capital Markets Ltd.
+#
+# Proof-of-Concept | Prototype Version for Illustration
+# by The Python Quants GmbH
+#
+# The codes contained herein come without warranties or representations,
+# to the extent permitted by applicable law.
+#
+# Read the RISK DISCLAIMER carefully.
+#
+# (c) FXCM Forex Capital Markets Ltd.
+#
+
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+PRICE_COLUMNS = ('bidopen', 'bidclose', 'askopen', 'askclose')
+
+
+def backtest_candles(data, signals, amount=10, balance=50000,
+                     execution='open', symbol=None, account_currency='USD'):
+    """ Backtest a signal series on bid/ask candles with array operations.
+
+    signals[t] is the position wanted after the candle t closed, in
+    multiples of amount. With execution='open' it is entered at the open
+    of the next candle, with execution='close' at the close of candle t
+    itself, which assumes the signal is known before the candle closes.
+    Buys are filled at the ask, sells at the bid, so every change of the
+    position pays the spread. Long positions are valued at the bid close,
+    short positions at the ask close.
+
+    Arguments:
+
+    data: pandas.DataFrame,
+        candles as returned by fxcmpy.get_candles() or
+        fxcmpy_candles_data_reader.get_data(), indexed by date.
+
+    signals: array-like,
+        one target position per candle, e.g. -1, 0 and 1. NaN means no
+        position.
+
+    amount: number (default 10),
+        the amount in lots of 1000 units of a position of size 1.
+
+    balance: number (default 50000),
+        the initial balance.
+
+    execution: string (default 'open'),
+        'open' or 'close', see above.
+
+    symbol: string or None (default None),
+        the symbol of the candles, e.g. 'USD/JPY'. If its base currency is
+        account_currency, the P&L accrued in every candle is converted with
+        its close price, otherwise the P&L is in the quote currency.
+
+    account_currency: string (default 'USD'),
+        the currency of the account.
+
+    Returns:
+
+    A pandas DataFrame indexed like data with the columns 'position',
+    'trade' (the change of the position), 'fill' (the fill price of the
+    trade), 'pnl' (the accumulated P&L), 'equity' and 'drawdown' (the
+    distance of the equity to its running maximum).
+    """
+
+    prices = __get_prices__(data)
+    ret = __backtest__(prices, __get_signals__(signals, len(data)), amount,
+                       balance, execution, symbol, account_currency)
+    return pd.DataFrame(ret, index=data.index,
+                        columns=['position', 'trade', 'fill', 'pnl',
+                                 'equity', 'drawdown'])
+
+
+def get_backtest_stats(result, balance=50000):
+    """ Return a dict with the final P&L ('pnl'), the return on balance
+    ('return'), the number of position changes ('trades'), the maximal
+    drawdown absolute ('max_drawdown') and relative to the running maximum
+    of the equity ('max_drawdown_pct') and the fraction of candles with an
+    open position ('exposure') of a result of backtest_candles(). """
+
+    return __get_stats__(dict((col, result[col].to_numpy())
+                              for col in result.columns), balance)
+
+
+def run_parameter_sweep(data, strategy, parameters, processes=None,
+                        amount=10, balance=50000, execution='open',
+                        symbol=None, account_currency='USD'):
+    """ Backtest a strategy for many parameter sets on a process pool.
+
+    The candles are handed to every process once when the pool starts, the
+    tasks are the parameter sets only and every process returns the
+    statistics of get_backtest_stats().
+
+    Arguments:
+
+    data: pandas.DataFrame,
+        the candles, see backtest_candles().
+
+    strategy: callable,
+        called as strategy(data, **params), returns the signals of one
+        parameter set. Must be a module level function, the processes
+        import it by name.
+
+    parameters: dict of lists or list of dicts,
+        the parameter sets, a dict of lists is expanded into the grid of
+        all combinations.
+
+    processes: integer or None (default None),
+        the number of processes, the number of CPUs if None. With 1 all
+        backtests are run in the calling process.
+
+    amount, balance, execution, symbol, account_currency:
+        see backtest_candles().
+
+    Returns:
+
+    A pandas DataFrame with one row per parameter set holding the
+    parameters and the statistics.
+    """
+
+    if isinstance(parameters, dict):
+        names = list(parameters)
+        parameters = [dict(zip(names, values)) for values in
+                      itertools.product(*[parameters[name]
+                                          for name in names])]
+    parameters = list(parameters)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    try:
+        processes = int(processes)
+    except:
+        raise TypeError('processes must be an integer.')
+    if processes < 1:
+        raise ValueError('processes must be a positive integer.')
+    options = {'amount': amount, 'balance': balance, 'execution': execution,
+               'symbol': symbol, 'account_currency': account_currency}
+
+    processes = min(processes, len(parameters))
+    if processes <= 1:
+        __init_worker__(data, strategy, options)
+        stats = [__run_worker__(params) for params in parameters]
+    else:
+        with ProcessPoolExecutor(max_workers=processes,
+                                 initializer=__init_worker__,
+                                 initargs=(data, strategy, options)) \
+                as executor:
+            chunksize = max(1, len(parameters) // (processes * 4))
+            stats = list(executor.map(__run_worker__, parameters,
+                                      chunksize=chunksize))
+    return pd.DataFrame([dict(params, **stat)
+                         for params, stat in zip(parameters, stats)])
+
+
+__worker__ = dict()
+
+
+def __init_worker__(data, strategy, options):
+    """ Keep the candles, their price arrays and the strategy of a sweep in
+    the process. """
+
+    __worker__['data'] = data
+    __worker__['prices'] = __get_prices__(data)
+    __worker__['strategy'] = strategy
+    __worker__['options'] = options
+
+
+def __run_worker__(params):
+    data = __worker__['data']
+    options = __worker__['options']
+    signals = __get_signals__(__worker__['strategy'](data, **params),
+                              len(data))
+    ret = __backtest__(__worker__['prices'], signals, **options)
+    return __get_stats__(ret, options['balance'])
+
+
+def __get_prices__(data):
+    """ Return the bid and ask open and close prices of the candles as
+    float64 arrays. """
+
+    columns = dict((col.lower(), col) for col in data.columns)
+    missing = [col for col in PRICE_COLUMNS if col not in columns]
+    if missing:
+        raise ValueError('data misses the columns %s.' % missing)
+    return dict((col, data[columns[col]].to_numpy(dtype=np.float64))
+                for col in PRICE_COLUMNS)
+
+
+def __get_signals__(signals, length):
+    signals = np.asarray(signals, dtype=np.float64).ravel()
+    if len(signals) != length:
+        raise ValueError('signals must have one value per candle.')
+    return np.nan_to_num(signals, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def __backtest__(prices, signals, amount, balance, execution, symbol,
+                 account_currency):
+    """ Return the arrays of the backtest of the target positions
+    signals. """
+
+    if execution == 'open':
+        # the signal of candle t is entered at the open of candle t + 1
+        position = np.concatenate(([0.0], signals[:-1]))
+        bid, ask = prices['bidopen'], prices['askopen']
+    elif execution == 'close':
+        position = signals
+        bid, ask = prices['bidclose'], prices['askclose']
+    else:
+        raise ValueError("execution must be 'open' or 'close'.")
+    units = float(amount) * 1000
+    position = position * units
+    trade = np.diff(position, prepend=0.0)
+    fill = np.where(trade > 0, ask, np.where(trade < 0, bid, np.nan))
+    cash = -np.cumsum(trade * np.nan_to_num(fill))
+    mark = np.where(position > 0, prices['bidclose'], prices['askclose'])
+    pnl = cash + position * mark
+
+    if symbol is not None:
+        pair = symbol.replace('/', '')
+        if pair[:3] == account_currency and pair[3:] != account_currency:
+            # every increment is converted with the rate of its candle
+            pnl = np.cumsum(np.diff(pnl, prepend=0.0) / prices['bidclose'])
+    equity = balance + pnl
+    drawdown = equity - np.maximum.accumulate(equity)
+    return {'position': position / units, 'trade': trade / units,
+            'fill': fill, 'pnl': pnl, 'equity': equity,
+            'drawdown': drawdown}
+
+
+def __get_stats__(ret, balance):
+    equity = ret['equity']
+    if len(equity) == 0:
+        return {'pnl': 0.0, 'return': 0.0, 'trades': 0, 'max_drawdown': 0.0,
+                'max_drawdown_pct': 0.0, 'exposure': 0.0}
+    peak = np.maximum.accumulate(equity)
+    return {'pnl': float(ret['pnl'][-1]),
+            'return': float(ret['pnl'][-1] / balance),
+            'trades': int(np.count_nonzero(ret['trade'])),
+            'max_drawdown': float(ret['drawdown'].min()),
+            'max_drawdown_pct': float((ret['drawdown'] / peak).min()),
+            'exposure': float(np.count_nonzero(ret['position']) /
+                              len(equity))}
@@ -0,0 +1,279 @@
+#
+# fxcmpy_candle_cache -- A Python Wrapper Class for the
+# RESTful API as provided by FXCM Forex Capital Markets Ltd.
+#
+# Proof-of-Concept | Prototype Version for Illustration
+# by The Python Quants GmbH
+#
+# The codes contained herein come without warranties or representations,
+# to the extent permitted by applicable law.
+#
+# Read the RISK DISCLAIMER carefully.
+#
+# (c) FXCM Forex Capital Markets Ltd.
+#
+
+
+import json
+import os
+from threading import Lock
+
+import numpy as np
+
+
+class fxcmpy_candle_cache(object):
+    """ A persistent on-disk cache for the historical candles of
+    get_candles().
+
+    The candles of every instrument and period are stored column by column
+    in one NumPy .npz file, together with a JSON file listing the time ranges
+    which are completely covered. Requests for covered ranges are served
+    from disk, only the missing gaps are fetched from the server.
+
+    Usage:
+
+    con.set_candle_cache('/path/to/cache')
+    """
+
+    columns = ['date', 'bidopen', 'bidclose', 'bidhigh', 'bidlow',
+               'askopen', 'askclose', 'askhigh', 'asklow', 'tickqty']
+
+    def __init__(self, path):
+        """ Constructor.
+
+        Arguments:
+
+        path: string,
+            the directory of the cache, created if it does not exist.
+        """
+
+        self.path = path
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self.lock = Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'hit_time': 0.0,
+                      'fetched_ranges': 0}
+
+    def get_gaps(self, instrument, period, start, end):
+        """ Return the list of ranges (start, end) between start and end,
+        both unix timestamps in seconds, which are not covered by the
+        cache."""
+
+        gaps = list()
+        current = start
+        for (cov_start, cov_end) in self.__read_coverage__(instrument, period):
+            if cov_end < current:
+                continue
+            if cov_start > end:
+                break
+            if cov_start > current:
+                gaps.append((current, cov_start - 1))
+            current = max(current, cov_end + 1)
+            if current > end:
+                break
+        if current <= end:
+            gaps.append((current, end))
+        return gaps
+
+    def add(self, instrument, period, candles, start, end):
+        """ Add candles to the cache and mark the range from start to end as
+        covered.
+
+        Arguments:
+
+        instrument: string,
+            the instrument's symbol.
+
+        period: string,
+            the granularity of the candles.
+
+        candles: list of lists or 2-dimensional array,
+            the candles as delivered by the server, one row per candle in
+            the order of fxcmpy_candle_cache.columns.
+
+        start, end: integer,
+            the covered range in unix timestamps.
+        """
+
+        self.add_many(instrument, period, [(candles, start, end)])
+
+    def add_many(self, instrument, period, items):
+        """ Add the candles of several ranges to the cache with one write.
+
+        Arguments:
+
+        instrument: string,
+            the instrument's symbol.
+
+        period: string,
+            the granularity of the candles.
+
+        items: list of tuples,
+            the tuples (candles, start, end) as arguments of add().
+        """
+
+        items = list(items)
+        if len(items) == 0:
+            return
+        new = [np.asarray(candles, dtype=float).reshape(-1, len(self.columns))
+               for (candles, start, end) in items]
+        new = np.concatenate(new)
+        with self.lock:
+            old = self.__read_data__(instrument, period)
+            if len(new) > 0:
+                # new rows first, np.unique keeps the first occurrence
+                data = np.concatenate((new, old))
+                _, index = np.unique(data[:, 0], return_index=True)
+                data = data[index]
+            else:
+                data = old
+            coverage = self.__read_coverage__(instrument, period)
+            coverage = self.__merge_ranges__(coverage + [(start, end) for
+                                                         (candles, start, end)
+                                                         in items])
+            self.__write__(instrument, period, data, coverage)
+            self.stats['fetched_ranges'] += len(items)
+
+    def invalidate(self, instrument, period, start=None, end=None):
+        """ Remove the candles between start and end from the cache and mark
+        the range as not covered, so it is fetched again on the next request.
+
+        Arguments:
+
+        instrument: string,
+            the instrument's symbol.
+
+        period: string,
+            the granularity of the candles.
+
+        start, end: integer or None (default None),
+            the range in unix timestamps, open ended if None.
+        """
+
+        with self.lock:
+            coverage = self.__read_coverage__(instrument, period)
+            if len(coverage) == 0:
+                return
+            if start is None:
+                start = coverage[0][0]
+            if end is None:
+                end = coverage[-1][1]
+            remaining = list()
+            for (cov_start, cov_end) in coverage:
+                if cov_end < start or cov_start > end:
+                    remaining.append((cov_start, cov_end))
+                    continue
+                if cov_start < start:
+                    remaining.append((cov_start, start - 1))
+                if cov_end > end:
+                    remaining.append((end + 1, cov_end))
+            data = self.__read_data__(instrument, period)
+            dates = data[:, 0]
+            data = data[(dates < start) | (dates > end)]
+            self.__write__(instrument, period, data, remaining)
+
+    def load(self, instrument, period, start, end):
+        """ Return the cached candles between start and end as 2-dimensional
+        float array in the order of fxcmpy_candle_cache.columns."""
+
+        data = self.__read_data__(instrument, period)
+        dates = data[:, 0]
+        first = np.searchsorted(dates, start, side='left')
+        last = np.searchsorted(dates, end, side='right')
+        return data[first:last]
+
+    def record_hit(self, seconds):
+        """ Record a request served completely from disk."""
+
+        self.stats['hits'] += 1
+        self.stats['hit_time'] += seconds
+
+    def record_miss(self):
+        """ Record a request which needed data from the server."""
+
+        self.stats['misses'] += 1
+
+    def get_size(self):
+        """ Return the size of the cache on disk in bytes."""
+
+        size = 0
+        for root, dirs, files in os.walk(self.path):
+            for name in files:
+                size += os.path.getsize(os.path.join(root, name))
+        return size
+
+    def get_stats(self):
+        """ Return a dict with the number of cache hits and misses, the mean
+        latency of a hit in seconds and the size of the cache in bytes."""
+
+        stats = dict(self.stats)
+        if stats['hits'] > 0:
+            stats['mean_hit_latency'] = stats['hit_time'] / stats['hits']
+        else:
+            stats['mean_hit_latency'] = None
+        stats['size'] = self.get_size()
+        return stats
+
+    def clear(self, instrument=None, period=None):
+        """ Remove the cached data of an instrument and period, of all
+        periods of an instrument if period is None or everything if
+        instrument is None."""
+
+        with self.lock:
+            for root, dirs, files in os.walk(self.path):
+                for name in files:
+                    if instrument is not None:
+                        if os.path.basename(root) != self.__key__(instrument):
+                            continue
+                        if period is not None and \
+                                name.split('.')[0] != period:
+                            continue
+                    os.remove(os.path.join(root, name))
+
+    def __key__(self, instrument):
+        return instrument.replace('/', '_').replace(os.sep, '_')
+
+    def __filename__(self, instrument, period, extension):
+        return os.path.join(self.path, self.__key__(instrument),
+                            '%s.%s' % (period, extension))
+
+    def __read_coverage__(self, instrument, period):
+        filename = self.__filename__(instrument, period, 'json')
+        if not os.path.isfile(filename):
+            return list()
+        with open(filename, 'r') as f:
+            return [tuple(item) for item in json.load(f)]
+
+    def __read_data__(self, instrument, period):
+        filename = self.__filename__(instrument, period, 'npz')
+        if not os.path.isfile(filename):
+            return np.empty((0, len(self.columns)))
+        with np.load(filename) as columns:
+            return np.column_stack([columns[col] for col in self.columns])
+
+    def __write__(self, instrument, period, data, coverage):
+        directory = os.path.join(self.path, self.__key__(instrument))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        filename = self.__filename__(instrument, period, 'npz')
+        columns = dict()
+        columns['date'] = data[:, 0].astype(np.int64)
+        for i, col in enumerate(self.columns[1:-1], 1):
+            columns[col] = data[:, i]
+        columns['tickqty'] = data[:, -1].astype(np.int64)
+        with open(filename + '.tmp', 'wb') as f:
+            np.savez(f, **columns)
+        os.replace(filename + '.tmp', filename)
+        filename = self.__filename__(instrument, period, 'json')
+        with open(filename + '.tmp', 'w') as f:
+            json.dump([list(item) for item in coverage], f)
+        os.replace(filename + '.tmp', filename)
+
+    def __merge_ranges__(self, ranges):
+        merged = list()
+        for (start, end) in sorted(ranges):
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
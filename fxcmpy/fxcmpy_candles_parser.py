@@ -0,0 +1,136 @@
+#
+# fxcmpy_candles_parser -- A Python Wrapper Class for the
+# RESTful API as provided by FXCM Forex Capital Markets Ltd.
+#
+# Proof-of-Concept | Prototype Version for Illustration
+# by The Python Quants GmbH
+#
+# The codes contained herein come without warranties or representations,
+# to the extent permitted by applicable law.
+#
+# Read the RISK DISCLAIMER carefully.
+#
+# (c) FXCM Forex Capital Markets Ltd.
+#
+
+
+import codecs
+import json
+import re
+
+import numpy as np
+
+
+class fxcmpy_candles_parser(object):
+    """ An incremental parser for the JSON answer of a candles request.
+
+    The answer is fed chunk by chunk as it is received. The rows of the
+    'candles' array are converted into float blocks as soon as they are
+    complete, so the candles never exist as nested Python lists and the
+    memory needed is about the size of the resulting array.
+
+    Usage:
+
+    parser = fxcmpy_candles_parser()
+    for chunk in response.iter_content(65536):
+        parser.feed(chunk)
+    candles, data = parser.close()
+    """
+
+    start_pattern = re.compile(r'"candles"\s*:\s*\[')
+    end_pattern = re.compile(r'\]\s*\]')
+
+    def __init__(self, width=10, encoding='utf-8'):
+        """ Constructor.
+
+        Arguments:
+
+        width: integer (default 10),
+            the number of values of each candle.
+
+        encoding: string (default 'utf-8'),
+            the encoding of the bytes fed to the parser.
+        """
+
+        self.width = width
+        self.decoder = codecs.getincrementaldecoder(encoding)()
+        self.head = ''
+        self.tail = ''
+        self.buffer = ''
+        self.blocks = list()
+        # 0: before, 1: inside, 2: after the candles array
+        self.state = 0
+
+    def feed(self, chunk):
+        """ Parse the next chunk of the answer, bytes or string."""
+
+        if isinstance(chunk, bytes):
+            chunk = self.decoder.decode(chunk)
+        if self.state == 0:
+            self.head += chunk
+            match = self.start_pattern.search(self.head)
+            if match is None:
+                return
+            chunk = self.head[match.end():]
+            self.head = self.head[:match.end()]
+            self.state = 1
+        if self.state == 1:
+            self.__parse_rows__(self.buffer + chunk)
+        else:
+            self.tail += chunk
+
+    def close(self):
+        """ Finish parsing and return a tuple (candles, data).
+
+        candles is a 2-dimensional float array with one row per candle or
+        None if the answer has no candles array. data is the rest of the
+        answer as dict with an empty candles list.
+        """
+
+        self.feed(self.decoder.decode(b'', final=True))
+        if self.state == 0:
+            return None, json.loads(self.head)
+        if self.state == 1:
+            raise ValueError('Incomplete candles array.')
+        data = json.loads(self.head + ']' + self.tail)
+        if len(self.blocks) == 0:
+            candles = np.empty((0, self.width))
+        elif len(self.blocks) == 1:
+            candles = self.blocks[0]
+        else:
+            candles = np.concatenate(self.blocks)
+        self.blocks = list()
+        return candles, data
+
+    def __parse_rows__(self, text):
+        """ Convert all complete rows of text and keep the rest."""
+
+        text = text.lstrip(', \t\r\n')
+        if text.startswith(']'):
+            # end of the array, split from the last row by a chunk border
+            self.tail = text[1:]
+            self.buffer = ''
+            self.state = 2
+            return
+        match = self.end_pattern.search(text)
+        if match is not None:
+            rows = text[:match.start() + 1]
+            self.tail = text[match.end():]
+            self.buffer = ''
+            self.state = 2
+        else:
+            last = text.rfind(']')
+            rows = text[:last + 1]
+            self.buffer = text[last + 1:]
+        if rows != '':
+            self.__add_block__(rows)
+
+    def __add_block__(self, rows):
+        text = rows.replace('[', '').replace(']', '').replace('null', 'nan')
+        # converts straight into the array, without a list of strings
+        values = np.fromstring(text, dtype=np.float64, sep=',')
+        if len(values) != text.count(',') + 1:
+            raise ValueError('Malformed candles: %s...' % text[:50])
+        if len(values) % self.width != 0:
+            raise ValueError('Candles must have %s values.' % self.width)
+        self.blocks.append(values.reshape(-1, self.width))
@@ -9,10 +9,20 @@
 #
 
 import datetime as dt
-from io import BytesIO, StringIO
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import TextIOWrapper
 import gzip
-import urllib.request
+import time
+import numpy as np
 import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+import urllib3
+
+from fxcmpy.fxcmpy_file_cache import fxcmpy_file_cache
+from fxcmpy.fxcmpy_tick_store import fxcmpy_tick_store
+from fxcmpy.fxcmpy_tick_resampler import fxcmpy_tick_resampler
 
 
 class fxcmpy_tick_data_reader(object):
@@ -22,7 +32,14 @@ class fxcmpy_tick_data_reader(object):
                'GBPNZD', 'GBPUSD', 'GBPCHF', 'GBPJPY', 'GBPNZD', 'NZDCAD',
                'NZDCHF', 'NZDJPY', 'NZDUSD', 'USDCAD', 'USDCHF', 'USDJPY')
 
-    def __init__(self, symbol, start, stop):
+    url = 'https://tickdata.fxcorporate.com/%s/%s/%s.csv.gz'
+    codec = 'utf-16'
+    chunk_size = 50000
+    date_block_size = 1048576
+
+    def __init__(self, symbol, start, stop, max_workers=4, retries=3,
+                 backoff=0.5, cache_dir=None, offline=False, lazy=False,
+                 store_dir=None, store_dtype='float64'):
         """ Constructor of the class.
 
         Arguments:
@@ -37,6 +54,40 @@ class fxcmpy_tick_data_reader(object):
         stop: datetime.date,
             the last day to delivers data for.
 
+        max_workers: integer (default 4),
+            the maximal number of weekly files downloaded concurrently.
+
+        retries: integer (default 3),
+            the number of times a failed download is repeated.
+
+        backoff: number (default 0.5),
+            the time in seconds to wait before the first repetition, doubled
+            for every further one.
+
+        cache_dir: string or None (default None),
+            the directory of a persistent cache for the downloaded files,
+            see fxcmpy_file_cache. Files of completed weeks are downloaded
+            only once.
+
+        offline: boolean (default False),
+            whether to read all files from the cache without any network
+            access. Requires cache_dir.
+
+        lazy: boolean (default False),
+            if True, nothing is fetched by the constructor. Use iter_weeks()
+            or iter_chunks() to process the data week by week, the whole
+            range is fetched on the first call of get_raw_data() or
+            get_data().
+
+        store_dir: string or None (default None),
+            the directory of a columnar binary store, see fxcmpy_tick_store.
+            If given, the completed weeks are converted into the store once
+            and get_data() memory-maps the weeks it needs instead of parsing
+            the files.
+
+        store_dtype: string (default 'float64'),
+            the type of the prices in the store, 'float64' or 'float32'.
+
         """
 
         if not (isinstance(start, dt.datetime) or isinstance(start, dt.date)):
@@ -59,91 +110,481 @@ class fxcmpy_tick_data_reader(object):
         else:
             self.symbol = symbol
 
+        try:
+            self.max_workers = int(max_workers)
+            self.retries = int(retries)
+            self.backoff = float(backoff)
+        except:
+            raise TypeError('max_workers and retries must be integers, '
+                            'backoff must be a number.')
+        if self.max_workers < 1:
+            raise ValueError('max_workers must be a positive integer.')
+
+        if offline and cache_dir is None:
+            raise ValueError('offline mode requires a cache_dir.')
+        self.offline = offline
+        if cache_dir is None:
+            self.cache = None
+        else:
+            self.cache = fxcmpy_file_cache(cache_dir)
+
+        if store_dir is None:
+            self.store = None
+        else:
+            self.store = fxcmpy_tick_store(store_dir, store_dtype)
+        self.recent = None
+
+        self.lazy = lazy
         self.data = None
-        self.url = 'https://tickdata.fxcorporate.com/%s/%s/%s.csv.gz'
-        self.codec = 'utf-16'
-        if not isinstance(self, fxcmpy_candles_data_reader):
-            self.__fetch_data__()
-            
+        if not isinstance(self, fxcmpy_candles_data_reader) and not lazy:
+            self.__load__()
+
     def get_raw_data(self):
         """ Returns the raw data set as pandas DataFrame """
+        if self.data is None:
+            self.__fetch_data__()
         return self.data
 
     def get_data(self, start=None, end=None):
         """ Returns the requested data set as pandas DataFrame;
         DataFrame index is converted to DatetimeIndex object """
+        if self.store is not None:
+            return self.__get_stored_data__(start, end)
         try:
             self.data_adj
         except:
-            data = self.data.copy()
-            index = pd.to_datetime(data.index.values,
-                                   format='%m/%d/%Y %H:%M:%S.%f')
-            data.index = index
+            data = self.get_raw_data().copy()
+            data = self.__set_datetime_index__(data)
+            if not data.index.is_monotonic_increasing:
+                data = data.sort_index(kind='stable')
             self.data_adj = data
-        data = self.data_adj
-        if start is not None:
-            data = data[data.index >= start]
-        if end is not None:
-            data = data[data.index <= end]
-        return data
+        return self.__slice__(self.data_adj, start, end)
     
+    def iter_weeks(self, prefetch=1):
+        """ Yields the data set of every week, for 'D1' candles of every
+        year, as pandas DataFrame with DatetimeIndex. The next weeks are
+        fetched in the background, at most prefetch + 1 weeks are held at
+        a time.
+
+        Arguments:
+        ==========
+
+        prefetch: integer (default 1),
+            the number of weeks fetched ahead while a week is processed.
+        """
+        try:
+            prefetch = int(prefetch)
+        except:
+            raise TypeError('prefetch must be an integer.')
+        if prefetch < 0:
+            raise ValueError('prefetch must not be negative.')
+        for data in self.__iter_datasets__(self.__get_urls__(), prefetch):
+            yield self.__set_datetime_index__(data)
+
+    def iter_chunks(self, chunk_size=None, prefetch=1):
+        """ Yields the data in blocks of at most chunk_size rows as pandas
+        DataFrames with DatetimeIndex, see iter_weeks(). If chunk_size is
+        None, the chunk_size attribute of the class is used. """
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+        try:
+            chunk_size = int(chunk_size)
+        except:
+            raise TypeError('chunk_size must be an integer.')
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be a positive integer.')
+        for data in self.iter_weeks(prefetch):
+            for first in range(0, len(data), chunk_size):
+                yield data.iloc[first:first + chunk_size]
+
+    def resample(self, freq, start=None, end=None, chunk_size=None,
+                 prefetch=1):
+        """ Returns the ticks between start and end resampled to bars of
+        length freq as pandas DataFrame, see fxcmpy_tick_resampler. If the
+        data is not in memory or in the store yet, the weeks are streamed
+        chunk by chunk as by iter_chunks() and only the bars are kept.
+
+        Arguments:
+        ==========
+
+        freq: string or pandas.Timedelta,
+            a fixed frequency like '30s' or '5min', aligned to the Unix
+            epoch, or an FXCM period like 'H4' or 'D1', aligned to the
+            trading sessions.
+
+        start, end: datetime or None (default None),
+            the range of the ticks.
+
+        chunk_size, prefetch:
+            see iter_chunks().
+        """
+        if isinstance(self, fxcmpy_candles_data_reader):
+            raise TypeError('resample() requires tick data.')
+        resampler = fxcmpy_tick_resampler(freq)
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+        if self.store is not None or self.data is not None:
+            data = self.get_data(start, end)
+            chunks = (data.iloc[first:first + chunk_size]
+                      for first in range(0, len(data), chunk_size))
+        else:
+            chunks = (self.__slice__(chunk, start, end)
+                      for chunk in self.iter_chunks(chunk_size, prefetch))
+        return resampler.resample(chunks)
+
     @classmethod
     def get_available_symbols(cls):
         """ Return all symbols available"""
         return cls.symbols
 
-    def __fetch_data__(self):
-        """ Retrieve the data for the given symbol and the given time window """
-        self.data = pd.DataFrame()
+    def __slice__(self, data, start, end):
+        """ Returns the rows of data between start and end found by binary
+        search on the sorted index, the result is a slice. """
+        first = 0
+        last = len(data)
+        if start is not None:
+            first = data.index.searchsorted(pd.Timestamp(start), 'left')
+        if end is not None:
+            last = data.index.searchsorted(pd.Timestamp(end), 'right')
+        return data.iloc[first:max(first, last)]
+
+    def __set_datetime_index__(self, data):
+        """ Converts the index of data to a DatetimeIndex in place. """
+        data.index = self.__parse_dates__(data.index.values)
+        return data
+
+    def __parse_dates__(self, values):
+        """ Parses dates of the fixed width format 'MM/DD/YYYY HH:MM:SS.fff'
+        directly from their characters, in blocks of date_block_size dates.
+        Falls back to pd.to_datetime() for other formats. """
+        values = np.asarray(values)
+        dates = np.empty(len(values), dtype=np.int64)
+        for first in range(0, len(values), self.date_block_size):
+            last = first + self.date_block_size
+            if not self.__parse_date_block__(values[first:last],
+                                             dates[first:last]):
+                return pd.to_datetime(values, format='%m/%d/%Y %H:%M:%S.%f')
+        return pd.DatetimeIndex(dates.view('datetime64[ns]'))
+
+    def __parse_date_block__(self, values, dates):
+        """ Writes the dates of values as nanoseconds into dates, returns
+        False if values are not all of the same fixed width format. """
+        try:
+            chars = values.astype('S')
+        except:
+            return False
+        width = chars.itemsize
+        if width < 20 or width > 29:
+            return False
+        chars = chars.view(np.uint8).reshape(-1, width)
+        separators = {2: '/', 5: '/', 10: ' ', 13: ':', 16: ':', 19: '.'}
+        for i, c in separators.items():
+            if (chars[:, i] != ord(c)).any():
+                return False
+        # other characters, and the zero padding of shorter dates, wrap
+        # around to values above 9
+        digits = chars - np.uint8(ord('0'))
+        columns = [i for i in range(width) if i not in separators]
+        if digits[:, columns].max() > 9:
+            return False
+
+        def number(first, last):
+            ret = np.zeros(len(digits), dtype=np.int64)
+            for i in range(first, last):
+                ret = ret * 10 + digits[:, i]
+            return ret
+
+        months = (number(6, 10) - 1970) * 12 + number(0, 2) - 1
+        days = months.astype('datetime64[M]').astype('datetime64[D]')
+        dates[:] = days.astype('datetime64[ns]').astype(np.int64)
+        dates += (number(3, 5) - 1) * 86400000000000
+        dates += number(11, 13) * 3600000000000
+        dates += number(14, 16) * 60000000000
+        dates += number(17, 19) * 1000000000
+        dates += number(20, width) * 10 ** (29 - width)
+        return True
+
+    def __get_urls__(self):
+        """ Return tuples (url, final, partition) of the weekly files in
+        week order, final is True for completed weeks. """
+        urls = list()
         running_date = self.start
         seven_days = dt.timedelta(days=7)
         while running_date <= self.stop:
             year, week, noop = running_date.isocalendar()
-            url = self.url % (self.symbol, year, week)
-            data = self.__fetch_dataset__(url)
-            if len(self.data) == 0:
-                self.data = data
-            else:
-                self.data = pd.concat((self.data, data))
+            urls.append((self.url % (self.symbol, year, week),
+                         self.__is_final__(running_date),
+                         '%s-W%02d' % (year, week)))
             running_date = running_date + seven_days
-        
-    def __fetch_dataset__(self, url):
-        """ Fetch the data for the given symbol and for one week."""
+        return urls
+
+    def __get_store_name__(self):
+        """ Return the name of the data in the store. """
+        return self.symbol
+
+    def __is_final__(self, date):
+        """ Return True if the week of date ended at least one day ago. """
+        monday = dt.date(date.year, date.month, date.day)
+        monday -= dt.timedelta(days=monday.weekday())
+        return monday + dt.timedelta(days=8) <= dt.date.today()
+
+    def __load__(self):
+        """ Fetch the data, or convert it into the store if one is set. """
+        if self.store is None:
+            self.__fetch_data__()
+        else:
+            self.__fill_store__()
+
+    def __fill_store__(self):
+        """ Convert the completed weeks which are not stored yet into the
+        store, other weeks are kept in memory. """
+        name = self.__get_store_name__()
+        urls = [item for item in self.__get_urls__()
+                if not (item[1] and self.store.has(name, item[2]))]
+        recent = dict()
+        for item, data in zip(urls, self.__iter_datasets__(urls,
+                                                           self.max_workers)):
+            data = self.__set_datetime_index__(data)
+            if not data.index.is_monotonic_increasing:
+                data = data.sort_index(kind='stable')
+            if item[1]:
+                self.store.write(name, item[2], data)
+            else:
+                recent[item[2]] = data
+        self.recent = recent
+
+    def __get_stored_data__(self, start, end):
+        """ Return the data between start and end from the store and the
+        weeks kept in memory. """
+        if self.recent is None:
+            self.__fill_store__()
+        name = self.__get_store_name__()
+        partitions = [item[2] for item in self.__get_urls__()]
+        stored = set(self.store.get_partitions(name, start, end))
+        frames = list()
+        selected = [p for p in partitions if p in stored]
+        if len(selected) > 0:
+            frames.append(self.store.load(name, start, end, selected))
+        for partition in partitions:
+            if partition in self.recent:
+                frames.append(self.__slice__(self.recent[partition], start,
+                                             end))
+        frames = [data for data in frames if len(data) > 0]
+        if len(frames) == 0:
+            return self.store.load(name, start, end, [])
+        if len(frames) == 1:
+            return frames[0]
+        return pd.concat(frames)
+
+    def __fetch_data__(self):
+        """ Retrieve the data for the given symbol and the given time window """
+        self.data = self.__assemble__(self.__fetch_datasets__(
+                                          self.__get_urls__()))
+
+    def __assemble__(self, datasets):
+        """ Concatenate the weekly data sets at once, every row is copied
+        only one time. """
+        chunks = [data for data in datasets if len(data) > 0]
+        if len(chunks) == 0:
+            if len(datasets) > 0:
+                return datasets[0]
+            return pd.DataFrame()
+        if len(chunks) == 1:
+            return chunks[0]
+        return pd.concat(chunks)
+
+    def __fetch_datasets__(self, urls):
+        """ Fetch the files of the (url, final, partition) tuples urls
+        concurrently
+        over keep-alive connections and return the data sets in the order
+        of urls. """
+        return list(self.__iter_datasets__(urls, len(urls)))
+
+    def __iter_datasets__(self, urls, prefetch):
+        """ Yield the data sets of the (url, final, partition) tuples urls
+        in order.
+        Up to prefetch following files are fetched concurrently, with at
+        most max_workers threads. """
+        session = requests.Session()
+        workers = min(self.max_workers, prefetch + 1)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        executor = ThreadPoolExecutor(max_workers=workers)
+        pending = deque()
+        try:
+            submitted = 0
+            while submitted < len(urls) or len(pending) > 0:
+                while submitted < len(urls) and len(pending) <= prefetch:
+                    url, final = urls[submitted][:2]
+                    pending.append(executor.submit(self.__fetch_dataset__,
+                                                   session, url, final))
+                    submitted += 1
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            session.close()
+
+    def __fetch_dataset__(self, session, url, final=False):
+        """ Fetch the data for the given symbol and for one week, from the
+        cache if possible. """
+        if self.cache is None:
+            return self.__request__(session, url, self.__read_dataset__)
+        filename = self.__download__(session, url, final)
+        try:
+            with open(filename, 'rb') as f:
+                return self.__read_dataset__(f)
+        except EOFError:
+            # a truncated download must not stay in the cache
+            self.cache.remove(url)
+            raise IOError('Download of %s is incomplete.' % url)
+
+    def __download__(self, session, url, final=False):
+        """ Return the path of the file of url in the cache, the file is
+        downloaded unless it is cached. Requires a cache. """
+        filename = self.cache.get(url, mutable=self.offline)
+        if filename is not None:
+            return filename
+        if self.offline:
+            raise IOError('%s is not cached, can not fetch it in '
+                          'offline mode.' % url)
+        return self.__request__(session, url, lambda raw:
+                                self.cache.store(url, raw, final))
+
+    def __request__(self, session, url, handle):
+        """ Download url and return handle() of the streamed response body.
+        Failed downloads are repeated with exponential backoff. """
         print('Fetching data from: %s' % url)
-        requests = urllib.request.urlopen(url)
-        buf = BytesIO(requests.read())
-        f = gzip.GzipFile(fileobj=buf)
-        data = f.read()
-        data_str = data.decode(self.codec)
-        data_pandas = pd.read_csv(StringIO(data_str), index_col=0)
-        return data_pandas
+        for attempt in range(self.retries + 1):
+            try:
+                req = session.get(url, timeout=60, stream=True)
+                try:
+                    if req.status_code < 500:
+                        req.raise_for_status()
+                        return handle(req.raw)
+                    msg = 'status code %s' % req.status_code
+                finally:
+                    req.close()
+            except (requests.ConnectionError, requests.Timeout,
+                    urllib3.exceptions.HTTPError, EOFError) as inst:
+                msg = str(inst)
+            if attempt < self.retries:
+                print('Download of %s failed (%s), retrying.' % (url, msg))
+                time.sleep(self.backoff * 2 ** attempt)
+        raise IOError('Can not download %s: %s' % (url, msg))
+
+    def __read_dataset__(self, fileobj):
+        """ Parse a gzipped weekly file while it is read from fileobj. The
+        file is decompressed, decoded and parsed in chunks of chunk_size
+        rows, it never exists as a whole in memory. The chunks are copied
+        into arrays preallocated from the number of rows estimated after the
+        first chunk, which grow in place if the estimate is too small. """
+        size, position = self.__get_file_size__(fileobj)
+        index = None
+        columns = None
+        rows = 0
+        with gzip.GzipFile(fileobj=fileobj) as f:
+            text = TextIOWrapper(f, encoding=self.codec)
+            for chunk in pd.read_csv(text, index_col=0,
+                                     chunksize=self.chunk_size):
+                number = len(chunk)
+                if columns is None:
+                    capacity = self.__estimate_rows__(fileobj, size,
+                                                      position, number)
+                    first = chunk
+                    index = np.empty(capacity, dtype=object)
+                    columns = [np.empty(capacity, dtype=chunk[col].dtype)
+                               for col in chunk.columns]
+                elif rows + number > len(index):
+                    capacity = max(rows + number, len(index) * 5 // 4)
+                    for values in [index] + columns:
+                        values.resize(capacity, refcheck=False)
+                index[rows:rows + number] = chunk.index.to_numpy(dtype=object)
+                for i, col in enumerate(chunk.columns):
+                    values = chunk[col].to_numpy()
+                    if values.dtype != columns[i].dtype:
+                        # e.g. integral values in the first chunk only
+                        dtype = np.result_type(columns[i], values)
+                        columns[i] = columns[i].astype(dtype)
+                    columns[i][rows:rows + number] = values
+                rows += number
+                del chunk
+        if columns is None:
+            return pd.DataFrame()
+        for values in [index] + columns:
+            values.resize(rows, refcheck=False)
+        return pd.DataFrame(dict(zip(first.columns, columns)),
+                            index=pd.Index(index, dtype=first.index.dtype,
+                                           name=first.index.name, copy=False),
+                            copy=False)
+
+    def __get_file_size__(self, fileobj):
+        """ Return the size of the compressed file and the current position
+        in it, the size is None if it is unknown. """
+        try:
+            if fileobj.seekable():
+                position = fileobj.tell()
+                size = fileobj.seek(0, 2)
+                fileobj.seek(position)
+                return size, position
+        except:
+            pass
+        # a streamed response knows the remaining length
+        remaining = getattr(fileobj, 'length_remaining', None)
+        try:
+            position = fileobj.tell()
+        except:
+            return None, 0
+        if remaining is None:
+            return None, position
+        return position + remaining, position
+
+    def __estimate_rows__(self, fileobj, size, position, rows):
+        """ Return the estimated number of rows of the file from the rows of
+        the first chunk and the compressed bytes they took. """
+        try:
+            used = fileobj.tell() - position
+        except:
+            used = 0
+        if size is None or used <= 0:
+            return 4 * rows
+        # the parser reads ahead of the first chunk, so the estimate tends
+        # to be too small
+        return max(rows, int(rows * (size - position) / used * 1.1) + 1)
 
 class fxcmpy_candles_data_reader(fxcmpy_tick_data_reader):
-    def __init__(self, symbol, start, stop, period):
-        fxcmpy_tick_data_reader.__init__(self, symbol, start, stop)
+    url = 'https://candledata.fxcorporate.com/%s/%s/%s/%s.csv.gz'
+    url_year = 'https://candledata.fxcorporate.com/%s/%s/%s.csv.gz'
+    codec = 'utf-8'
+
+    def __init__(self, symbol, start, stop, period, max_workers=4, retries=3,
+                 backoff=0.5, cache_dir=None, offline=False, lazy=False,
+                 store_dir=None, store_dtype='float64'):
+        fxcmpy_tick_data_reader.__init__(self, symbol, start, stop,
+                                         max_workers, retries, backoff,
+                                         cache_dir, offline, lazy,
+                                         store_dir, store_dtype)
         if period not in ['m1', 'H1', 'D1']:
             raise ValueError("period must be one of 'm1', 'H1' or 'D1'")
         self.period = period
-        self.codec = 'utf-8'
-        self.url = 'https://candledata.fxcorporate.com/%s/%s/%s/%s.csv.gz'
-        self.__fetch_data__()
-
+        if not lazy:
+            self.__load__()
 
-    def __fetch_data__(self):
-        """ Fetch the data for the given symbol, period 
-        and the given time window. """
-        self.data = pd.DataFrame()
+    def __get_urls__(self):
+        """ Return tuples (url, final, partition) of the weekly or, for
+        period 'D1', yearly files in time order. """
+        urls = list()
         if self.period != 'D1':
             running_date = self.start
             seven_days = dt.timedelta(days=7)
             while running_date <= self.stop:
                 year, week, noop = running_date.isocalendar()
-                url = self.url % (self.period, self.symbol, year, week)
-                data = self.__fetch_dataset__(url)
-                if len(self.data) == 0:
-                    self.data = data
-                else:
-                    self.data = pd.concat((self.data, data))
+                urls.append((self.url % (self.period, self.symbol, year,
+                                         week),
+                             self.__is_final__(running_date),
+                             '%s-W%02d' % (year, week)))
                 running_date = running_date + seven_days
         else:
             start, noop, noop2 = self.start.isocalendar()
@@ -152,13 +593,12 @@ class fxcmpy_candles_data_reader(fxcmpy_tick_data_reader):
                 msg = "Candles with period 'D1' are restricted to years before %s"
                 raise ValueError(msg % dt.datetime.now().year ) 
             for year in range(start, stop+1):
-                url = 'https://candledata.fxcorporate.com/%s/%s/%s.csv.gz'
-                data = self.__fetch_dataset__(url % (self.period, self.symbol,
-                                                     year) )
-
-                if len(self.data) == 0:
-                    self.data = data
-                else:
-                    self.data = pd.concat((self.data, data))
+                urls.append((self.url_year % (self.period, self.symbol,
+                                              year), True, str(year)))
+        return urls
+
+    def __get_store_name__(self):
+        """ Return the name of the data in the store. """
+        return '%s_%s' % (self.symbol, self.period)
 
         
@@ -0,0 +1,238 @@
+#
+# fxcmpy_download -- A Python Wrapper Class for the
+# RESTful API as provided by FXCM Forex Capital Markets Ltd.
+#
+# Proof-of-Concept | Prototype Version for Illustration
+# by The Python Quants GmbH
+#
+# The codes contained herein come without warranties or representations,
+# to the extent permitted by applicable law.
+#
+# Read the RISK DISCLAIMER carefully.
+#
+# (c) FXCM Forex Capital Markets Ltd.
+#
+
+
+import argparse
+import datetime as dt
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from fxcmpy.fxcmpy_data_reader import fxcmpy_candles_data_reader
+from fxcmpy.fxcmpy_data_reader import fxcmpy_tick_data_reader
+
+
+PERIODS = ('ticks', 'm1', 'H1', 'D1')
+
+
+def main(argv=None):
+    """ Entry point of the command fxcmpy-download.
+
+    Downloads the weekly, for 'D1' candles the yearly, files of historical
+    ticks and candles of several symbols concurrently into a file cache
+    (--cache-dir) and/or converts them into a columnar store (--store-dir).
+    Files already complete in the cache or the store are skipped, so an
+    interrupted download resumes where it stopped. Weeks which are not
+    completed yet are only cached, never stored.
+
+    Usage:
+
+    fxcmpy-download EURUSD GBPUSD --start 2018-01-01 --stop 2018-06-30
+                    --period ticks --period m1 --store-dir ./store
+
+    Arguments:
+
+    argv: list of strings or None (default None),
+        the command line arguments, sys.argv[1:] if None.
+
+    Returns:
+
+    The exit status, 0 if all files were downloaded, 1 otherwise.
+    """
+
+    parser = __create_parser__()
+    args = parser.parse_args(argv)
+    if args.cache_dir is None and args.store_dir is None:
+        parser.error('at least one of --cache-dir and --store-dir is '
+                     'required.')
+    if args.workers < 1:
+        parser.error('--workers must be a positive integer.')
+
+    try:
+        tasks, complete = __create_tasks__(args)
+    except (TypeError, ValueError) as inst:
+        parser.error(str(inst))
+    print('%s files to download, %s files complete.'
+          % (len(tasks), complete))
+    if len(tasks) == 0:
+        return 0
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=args.workers)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    size = 0
+    rows = 0
+    failed = 0
+    t0 = time.time()
+    executor = ThreadPoolExecutor(max_workers=args.workers)
+    futures = dict((executor.submit(__download_file__, reader, session,
+                                    item), (reader, item))
+                   for reader, item in tasks)
+    try:
+        for done, future in enumerate(as_completed(futures), 1):
+            reader, item = futures[future]
+            label = __get_label__(reader, item)
+            try:
+                file_size, file_rows = future.result()
+            except (IOError, ValueError) as inst:
+                failed += 1
+                print('[%s/%s] %s failed: %s'
+                      % (done, len(tasks), label, inst))
+                continue
+            size += file_size
+            rows += file_rows
+            print('[%s/%s] %s done | %s'
+                  % (done, len(tasks), label,
+                     __format_throughput__(size, rows, time.time() - t0)))
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        for future in futures:
+            future.cancel()
+        print('Interrupted, run the same command again to resume.')
+        return 1
+    finally:
+        executor.shutdown(wait=True)
+        session.close()
+
+    print('Downloaded %s files in %.1f s, %s failed | %s'
+          % (len(tasks) - failed, time.time() - t0, failed,
+             __format_throughput__(size, rows, time.time() - t0)))
+    return 1 if failed > 0 else 0
+
+
+def __create_parser__():
+    parser = argparse.ArgumentParser(
+        prog='fxcmpy-download',
+        description='Download historical ticks and candles provided by '
+                    'FXCM into a local file cache or columnar store.')
+    parser.add_argument('symbols', nargs='+', metavar='SYMBOL',
+                        help='the symbols, e.g. EURUSD.')
+    parser.add_argument('--start', required=True, type=__parse_date__,
+                        help='the first day, YYYY-MM-DD.')
+    parser.add_argument('--stop', required=True, type=__parse_date__,
+                        help='the last day, YYYY-MM-DD.')
+    parser.add_argument('--period', action='append', dest='periods',
+                        choices=PERIODS,
+                        help="'ticks' or a candle period, may be repeated "
+                             "(default ticks).")
+    parser.add_argument('--workers', type=int, default=8,
+                        help='the number of concurrent downloads (default '
+                             '8).')
+    parser.add_argument('--retries', type=int, default=3,
+                        help='the number of repetitions of a failed '
+                             'download (default 3).')
+    parser.add_argument('--cache-dir',
+                        help='the directory of the file cache.')
+    parser.add_argument('--store-dir',
+                        help='the directory of the columnar store.')
+    parser.add_argument('--store-dtype', default='float64',
+                        choices=('float64', 'float32'),
+                        help='the type of the prices in the store (default '
+                             'float64).')
+    return parser
+
+
+def __parse_date__(text):
+    try:
+        return dt.datetime.strptime(text, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError('%s is not a date of the format '
+                                         'YYYY-MM-DD.' % text)
+
+
+def __create_tasks__(args):
+    """ Return the (reader, (url, final, partition)) tuples of the files to
+    download and the number of files which are complete already. """
+
+    tasks = list()
+    complete = 0
+    for period in args.periods or ['ticks']:
+        for symbol in args.symbols:
+            kwargs = {'max_workers': args.workers, 'retries': args.retries,
+                      'cache_dir': args.cache_dir,
+                      'store_dir': args.store_dir,
+                      'store_dtype': args.store_dtype, 'lazy': True}
+            if period == 'ticks':
+                reader = fxcmpy_tick_data_reader(symbol, args.start,
+                                                 args.stop, **kwargs)
+            else:
+                reader = fxcmpy_candles_data_reader(symbol, args.start,
+                                                    args.stop, period,
+                                                    **kwargs)
+            for item in reader.__get_urls__():
+                if __is_complete__(reader, item):
+                    complete += 1
+                elif item[1] or reader.cache is not None:
+                    tasks.append((reader, item))
+    return tasks, complete
+
+
+def __is_complete__(reader, item):
+    """ Return True if the file item is final and stored or cached. """
+
+    url, final, partition = item
+    if not final:
+        return False
+    if reader.store is not None:
+        return reader.store.has(reader.__get_store_name__(), partition)
+    return reader.cache.get(url) is not None
+
+
+def __download_file__(reader, session, item):
+    """ Download one file into the cache and, if it is final, into the
+    store. Returns the size of the downloaded file, if known, and the
+    number of stored rows. """
+
+    url, final, partition = item
+    if reader.store is None or not final:
+        filename = reader.__download__(session, url, final)
+        return os.path.getsize(filename), 0
+    data = reader.__fetch_dataset__(session, url, final)
+    data = reader.__set_datetime_index__(data)
+    if not data.index.is_monotonic_increasing:
+        data = data.sort_index(kind='stable')
+    reader.store.write(reader.__get_store_name__(), partition, data)
+    size = 0
+    if reader.cache is not None:
+        size = reader.cache.get_meta(url)['size']
+    return size, len(data)
+
+
+def __format_throughput__(size, rows, seconds):
+    """ Return the downloaded megabytes and stored rows with their rates,
+    the size is unknown without cache. """
+
+    seconds = max(seconds, 1e-9)
+    parts = list()
+    if size > 0:
+        parts.append('%.2f MB, %.2f MB/s' % (size / 1e6, size / 1e6 / seconds))
+    if rows > 0:
+        parts.append('%s rows, %.0f rows/s' % (rows, rows / seconds))
+    return ', '.join(parts) or 'nothing stored'
+
+
+def __get_label__(reader, item):
+    if isinstance(reader, fxcmpy_candles_data_reader):
+        return '%s %s %s' % (reader.symbol, reader.period, item[2])
+    return '%s %s' % (reader.symbol, item[2])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+#
+# fxcmpy_file_cache -- A Python Wrapper Class for the
+# RESTful API as provided by FXCM Forex Capital Markets Ltd.
+#
+# Proof-of-Concept | Prototype Version for Illustration
+# by The Python Quants GmbH
+#
+# The codes contained herein come without warranties or representations,
+# to the extent permitted by applicable law.
+#
+# Read the RISK DISCLAIMER carefully.
+#
+# (c) FXCM Forex Capital Markets Ltd.
+#
+
+
+import hashlib
+import json
+import os
+import time
+import uuid
+from threading import Lock
+
+
+class fxcmpy_file_cache(object):
+    """ A persistent local cache for the files downloaded by the data
+    readers.
+
+    Every file is stored under the SHA-256 hash of its url, together with a
+    JSON file holding the url, the SHA-256 hash of the content, the size and
+    whether the file is final. Files of completed weeks and years are final
+    and served from the cache forever, other files are downloaded again.
+    The content of a file is checked against its hash before it is served,
+    damaged files are removed.
+
+    Usage:
+
+    reader = fxcmpy_tick_data_reader('EURUSD', start, stop,
+                                     cache_dir='/path/to/cache')
+    """
+
+    block_size = 65536
+
+    def __init__(self, path):
+        """ Constructor.
+
+        Arguments:
+
+        path: string,
+            the directory of the cache, created if it does not exist.
+        """
+
+        self.path = path
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self.lock = Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stored': 0, 'damaged': 0}
+
+    def get(self, url, mutable=False):
+        """ Return the path of the cached file of url or None if the file is
+        not cached, damaged or, unless mutable is True, not final."""
+
+        meta = self.get_meta(url)
+        filename = self.__filename__(url, 'csv.gz')
+        if meta is None or not (meta['final'] or mutable) or \
+                not os.path.isfile(filename):
+            self.__count__('misses')
+            return None
+        if self.__digest__(filename) != meta['sha256']:
+            self.__count__('damaged')
+            self.remove(url)
+            return None
+        self.__count__('hits')
+        return filename
+
+    def get_meta(self, url):
+        """ Return the dict with the url, sha256, size, final and time of
+        the cached file of url or None if the file is not cached."""
+
+        filename = self.__filename__(url, 'json')
+        try:
+            with open(filename, 'r') as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return None
+
+    def store(self, url, fileobj, final):
+        """ Copy the content of fileobj into the cache and return the path
+        of the cached file.
+
+        Arguments:
+
+        url: string,
+            the url of the file.
+
+        fileobj: file-like object,
+            read in blocks until its end.
+
+        final: boolean,
+            whether the file will never change.
+        """
+
+        filename = self.__filename__(url, 'csv.gz')
+        # unique name, several threads or processes may store the same url
+        temp = '%s.%s.tmp' % (filename, uuid.uuid4().hex)
+        sha256 = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp, 'wb') as f:
+                while True:
+                    block = fileobj.read(self.block_size)
+                    if not block:
+                        break
+                    sha256.update(block)
+                    size += len(block)
+                    f.write(block)
+            os.replace(temp, filename)
+        finally:
+            if os.path.isfile(temp):
+                os.remove(temp)
+        meta = {'url': url, 'sha256': sha256.hexdigest(), 'size': size,
+                'final': bool(final), 'time': time.time()}
+        with open(temp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(temp, self.__filename__(url, 'json'))
+        self.__count__('stored')
+        return filename
+
+    def remove(self, url):
+        """ Remove the cached file of url."""
+
+        for extension in ('json', 'csv.gz'):
+            filename = self.__filename__(url, extension)
+            if os.path.isfile(filename):
+                os.remove(filename)
+
+    def get_size(self):
+        """ Return the size of the cache on disk in bytes."""
+
+        size = 0
+        for name in os.listdir(self.path):
+            size += os.path.getsize(os.path.join(self.path, name))
+        return size
+
+    def get_stats(self):
+        """ Return a dict with the number of hits, misses, stored and damaged
+        files and the size of the cache in bytes."""
+
+        with self.lock:
+            stats = dict(self.stats)
+        stats['size'] = self.get_size()
+        return stats
+
+    def __count__(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def __filename__(self, url, extension):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, '%s.%s' % (key, extension))
+
+    def __digest__(self, filename):
+        sha256 = hashlib.sha256()
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(self.block_size), b''):
+                sha256.update(block)
+        return sha256.hexdigest()
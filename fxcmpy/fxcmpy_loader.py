@@ -0,0 +1,206 @@
+#
+# fxcmpy_loader -- A Python Wrapper Class for the
+# RESTful API as provided by FXCM Forex Capital Markets Ltd.
+#
+# Proof-of-Concept | Prototype Version for Illustration
+# by The Python Quants GmbH
+#
+# The codes contained herein come without warranties or representations,
+# to the extent permitted by applicable law.
+#
+# Read the RISK DISCLAIMER carefully.
+#
+# (c) FXCM Forex Capital Markets Ltd.
+#
+
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from fxcmpy.fxcmpy_data_reader import fxcmpy_candles_data_reader
+from fxcmpy.fxcmpy_data_reader import fxcmpy_tick_data_reader
+
+
+def load_history(symbols, start, stop, period=None, processes=None,
+                 threads=2, cache_dir=None, offline=False, store_dir=None,
+                 store_dtype='float64', panel=False):
+    """ Load the historical data of several symbols in parallel.
+
+    Every symbol is downloaded and parsed by a data reader in its own
+    process of a process pool, so the parsing is not limited by the GIL.
+    The data is handed back through shared memory, one block of int64 dates
+    and float64 columns per symbol, instead of pickled DataFrames. If a
+    store is given, the processes convert the data into the store and the
+    result is memory-mapped from there. If symbols fail, the other symbols
+    are loaded to the end, their blocks are freed and an IOError naming the
+    failed symbols is raised.
+
+    Arguments:
+
+    symbols: list of strings,
+        the symbols, see fxcmpy_tick_data_reader.get_available_symbols().
+
+    start, stop: datetime.date,
+        the first and the last day to load data for.
+
+    period: string or None (default None),
+        None for ticks, or one of 'm1', 'H1' or 'D1' for candles.
+
+    processes: integer or None (default None),
+        the number of processes, the number of CPUs if None. With 1, all
+        symbols are loaded in the calling process.
+
+    threads: integer (default 2),
+        the number of concurrent downloads of each process.
+
+    cache_dir, offline, store_dir, store_dtype:
+        see fxcmpy_tick_data_reader.
+
+    panel: boolean (default False),
+        whether to return one DataFrame with the columns (symbol, field)
+        instead of a dict.
+
+    Returns:
+
+    A dict mapping the symbols to pandas DataFrames with DatetimeIndex or,
+    with panel=True, one DataFrame aligned on the union of all dates.
+    """
+
+    symbols = list(symbols)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    try:
+        processes = int(processes)
+    except:
+        raise TypeError('processes must be an integer.')
+    if processes < 1:
+        raise ValueError('processes must be a positive integer.')
+    kwargs = {'max_workers': threads, 'cache_dir': cache_dir,
+              'offline': offline, 'store_dir': store_dir,
+              'store_dtype': store_dtype}
+
+    ret = dict()
+    processes = min(processes, len(symbols))
+    if processes <= 1:
+        for symbol in symbols:
+            ret[symbol] = __create_reader__(symbol, start, stop, period,
+                                            kwargs).get_data()
+    else:
+        tasks = [(symbol, start, stop, period, kwargs) for symbol in symbols]
+        # the workers must share the tracker of the shared memory blocks
+        # with this process, which frees the blocks
+        resource_tracker.ensure_running()
+        futures = dict()
+        results = dict()
+        errors = dict()
+        try:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                for task in tasks:
+                    futures[executor.submit(__load_symbol__, task)] = task[0]
+                for future in as_completed(futures):
+                    try:
+                        results[futures[future]] = future.result()
+                    except Exception as inst:
+                        errors[futures[future]] = inst
+            if len(errors) == 0:
+                for symbol in symbols:
+                    result = results.pop(symbol)
+                    if store_dir is None:
+                        ret[symbol] = __receive__(result)
+                    else:
+                        # the store is complete, nothing is downloaded again
+                        # except weeks which are not final yet
+                        ret[symbol] = __create_reader__(
+                                          symbol, start, stop, period,
+                                          dict(kwargs, lazy=True)).get_data()
+        finally:
+            # free the blocks of all symbols not received, after an error in
+            # another worker or an interrupt
+            for future, symbol in futures.items():
+                if future.done() and not future.cancelled() and \
+                        future.exception() is None and symbol not in ret:
+                    __discard__(future.result())
+        if len(errors) > 0:
+            raise IOError('Can not load the data of %s.' % ', '.join(
+                          '%s (%s)' % (symbol, errors[symbol])
+                          for symbol in symbols if symbol in errors))
+    if panel:
+        return pd.concat(ret, axis=1, names=['symbol', 'field'], sort=True)
+    return ret
+
+
+def __create_reader__(symbol, start, stop, period, kwargs):
+    if period is None:
+        return fxcmpy_tick_data_reader(symbol, start, stop, **kwargs)
+    return fxcmpy_candles_data_reader(symbol, start, stop, period, **kwargs)
+
+
+def __load_symbol__(task):
+    """ Load the data of one symbol in a worker process. """
+
+    symbol, start, stop, period, kwargs = task
+    reader = __create_reader__(symbol, start, stop, period, kwargs)
+    if kwargs['store_dir'] is not None:
+        return None
+    return __send__(reader.get_data())
+
+
+def __send__(data):
+    """ Copy the dates and the numerical columns of data into one shared
+    memory block and return its description. """
+
+    columns = [col for col in data.columns
+               if np.issubdtype(data[col].dtype, np.number)]
+    if len(data) == 0 or len(columns) < len(data.columns):
+        return ('pickle', data)
+    rows = len(data)
+    size = (len(columns) + 1) * rows * 8
+    block = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        values = np.ndarray((len(columns) + 1, rows), dtype=np.float64,
+                            buffer=block.buf)
+        dates = np.asarray(data.index.values, dtype='datetime64[ns]')
+        values[0].view(np.int64)[:] = dates.view(np.int64)
+        for i, col in enumerate(columns, 1):
+            values[i] = data[col].to_numpy(dtype=np.float64)
+        del values
+    finally:
+        block.close()
+    return ('shared_memory', block.name, rows, columns)
+
+
+def __discard__(result):
+    """ Free the shared memory block of a result which is not received. """
+
+    if result is None or result[0] != 'shared_memory':
+        return
+    try:
+        block = shared_memory.SharedMemory(name=result[1])
+    except FileNotFoundError:
+        return
+    block.close()
+    block.unlink()
+
+
+def __receive__(result):
+    """ Rebuild the DataFrame described by result and free the shared
+    memory block. """
+
+    if result[0] == 'pickle':
+        return result[1]
+    name, rows, columns = result[1:]
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        values = np.ndarray((len(columns) + 1, rows), dtype=np.float64,
+                            buffer=block.buf).copy()
+    finally:
+        block.close()
+        block.unlink()
+    index = pd.DatetimeIndex(values[0].view('datetime64[ns]'), copy=False)
+    # the rows of values are the columns, the transposed array is one block
+    return pd.DataFrame(values[1:].T, index=index, columns=columns,
+                        copy=False)
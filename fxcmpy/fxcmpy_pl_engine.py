@@ -0,0 +1,211 @@
+#
+# fxcmpy_pl_engine -- A Python Wrapper Class for the
+# RESTful API as provided by FXCM Forex Capital Markets Ltd.
+#
+# Proof-of-Concept | Prototype Version for Illustration
+# by The Python Quants GmbH
+#
+# The codes contained herein come without warranties or representations,
+# to the extent permitted by applicable law.
+#
+# Read the RISK DISCLAIMER carefully.
+#
+# (c) FXCM Forex Capital Markets Ltd.
+#
+
+
+import numpy as np
+import pandas as pd
+
+
+class fxcmpy_pl_engine(object):
+    """ Mark-to-market profit and loss of the open positions.
+
+    The engine joins the price stream of subscribed instruments with the
+    open position table of the connection. Whenever a symbol ticks, the
+    profit and loss of all open positions in that symbol is recomputed
+    at once with array arithmetic.
+
+    Caution:
+
+    Do not initialize the engine manually, every fxcmpy connection owns one,
+    use the get_pl_engine() method of the fxcmpy class instead.
+    """
+
+    position_columns = ['accountId', 'currency', 'isBuy', 'amountK', 'open',
+                        'close', 'visiblePL', 'grossPL']
+
+    def __init__(self, connection):
+        self.__con__ = connection
+        # symbol -> dict of arrays describing the positions of that symbol
+        self.__tables__ = dict()
+        # symbols whose arrays have to be rebuilt before the next tick
+        self.__dirty__ = set()
+        self.__all_dirty__ = True
+
+    def invalidate(self, symbol=None):
+        """ Mark the position arrays of a symbol (or of all symbols if
+        symbol is None) as outdated, they are rebuilt on the next tick."""
+
+        if symbol is None:
+            self.__all_dirty__ = True
+        else:
+            self.__dirty__.add(symbol)
+
+    def get_position_pl(self, kind='dataframe'):
+        """ Return the mark-to-market P&L per open position.
+
+        Arguments:
+
+        kind: one of 'dataframe' (default) or 'list',
+            how to return the data, either as list or as a pandas DataFrame.
+
+        Returns:
+
+        The P&L of every open position, indexed by tradeId.
+
+        """
+
+        self.__refresh__()
+        rows = list()
+        for symbol, table in list(self.__tables__.items()):
+            for i in range(len(table['tradeId'])):
+                rows.append({
+                             'tradeId': int(table['tradeId'][i]),
+                             'accountId': int(table['accountId'][i]),
+                             'currency': symbol,
+                             'isBuy': bool(table['sign'][i] > 0),
+                             'amountK': float(table['amountK'][i]),
+                             'open': float(table['open'][i]),
+                             'close': float(table['close'][i]),
+                             'visiblePL': float(table['visiblePL'][i]),
+                             'grossPL': float(table['grossPL'][i])
+                            })
+        if kind == 'list':
+            return rows
+        else:
+            ret = pd.DataFrame(rows, columns=['tradeId'] +
+                               self.position_columns)
+            return ret.set_index('tradeId')
+
+    def get_symbol_pl(self):
+        """ Return the mark-to-market P&L aggregated per symbol as pandas
+        DataFrame with the net amount, the P&L in pips and the gross P&L."""
+
+        self.__refresh__()
+        rows = list()
+        for symbol, table in list(self.__tables__.items()):
+            rows.append({
+                         'currency': symbol,
+                         'amountK': float((table['sign'] *
+                                           table['amountK']).sum()),
+                         'visiblePL': float(table['visiblePL'].sum()),
+                         'grossPL': float(table['grossPL'].sum())
+                        })
+        ret = pd.DataFrame(rows, columns=['currency', 'amountK', 'visiblePL',
+                                          'grossPL'])
+        return ret.set_index('currency')
+
+    def get_account_pl(self):
+        """ Return the mark-to-market gross P&L aggregated per account as
+        pandas Series."""
+
+        self.__refresh__()
+        total = dict()
+        for table in list(self.__tables__.values()):
+            for account_id in np.unique(table['accountId']):
+                mask = table['accountId'] == account_id
+                account_id = int(account_id)
+                total[account_id] = (total.get(account_id, 0.0) +
+                                     float(table['grossPL'][mask].sum()))
+        ret = pd.Series(total, name='grossPL', dtype=float)
+        ret.index.name = 'accountId'
+        return ret
+
+    def __refresh__(self):
+        """ Rebuild outdated position arrays from the open position table."""
+
+        if self.__all_dirty__:
+            self.__all_dirty__ = False
+            self.__dirty__ = set()
+            symbols = None
+        elif self.__dirty__:
+            symbols = self.__dirty__
+            self.__dirty__ = set()
+        else:
+            return
+
+        positions = dict()
+        for pos in list(self.__con__.open_pos.values()):
+            symbol = pos.get_currency()
+            if symbols is None or symbol in symbols:
+                positions.setdefault(symbol, list()).append(pos)
+
+        tables = dict(self.__tables__)
+        if symbols is None:
+            tables = dict()
+        else:
+            for symbol in symbols:
+                tables.pop(symbol, None)
+        prices = self.__con__.prices
+        for symbol in positions:
+            table = self.__build_table__(symbol, positions[symbol])
+            if symbol in prices and len(prices[symbol]) > 0:
+                last = prices[symbol].iloc[-1]
+                table = self.__mark__(table, float(last['Bid']),
+                                      float(last['Ask']))
+            tables[symbol] = table
+        self.__tables__ = tables
+
+    def __build_table__(self, symbol, positions):
+        """ Return the arrays for the given positions of one symbol."""
+
+        pip = self.__con__.__get_pip_size__(symbol)
+        return {
+                'tradeId': np.array([p.get_tradeId() for p in positions],
+                                    dtype=np.int64),
+                'accountId': np.array([p.get_accountId() for p in positions],
+                                      dtype=np.int64),
+                'sign': np.array([1.0 if p.get_isBuy() else -1.0
+                                  for p in positions]),
+                'amountK': np.array([p.get_amount() for p in positions],
+                                    dtype=float),
+                'open': np.array([p.get_open() for p in positions],
+                                 dtype=float),
+                'currencyPoint': np.array([p.get_currencyPoint()
+                                           for p in positions], dtype=float),
+                'pip': pip,
+                'close': np.array([p.get_close() for p in positions],
+                                  dtype=float),
+                'visiblePL': np.array([p.get_visiblePL() for p in positions],
+                                      dtype=float),
+                'grossPL': np.array([p.get_grossPL() for p in positions],
+                                    dtype=float)
+               }
+
+    def __on_price_update__(self, symbol, bid, ask):
+        """ Recompute the P&L of all open positions in symbol for the new
+        bid and ask prices."""
+
+        if not self.__all_dirty__ and symbol not in self.__dirty__:
+            if symbol not in self.__tables__:
+                return
+        self.__refresh__()
+        if symbol not in self.__tables__:
+            return
+
+        self.__tables__[symbol] = self.__mark__(self.__tables__[symbol],
+                                                bid, ask)
+
+    def __mark__(self, table, bid, ask):
+        """ Return a copy of table marked to the given bid and ask. """
+
+        table = dict(table)
+        sign = table['sign']
+        # long positions are closed at the bid, short positions at the ask
+        close = np.where(sign > 0, bid, ask)
+        pips = (close - table['open']) * sign / table['pip']
+        table['close'] = close
+        table['visiblePL'] = pips
+        table['grossPL'] = pips * table['currencyPoint']
+        return table
@@ -0,0 +1,965 @@
+#
+# fxcmpy_replay -- A Python Wrapper Class for the
+# RESTful API as provided by FXCM Forex Capital Markets Ltd.
+#
+# Proof-of-Concept | Prototype Version for Illustration
+# by The Python Quants GmbH
+#
+# The codes contained herein come without warranties or representations,
+# to the extent permitted by applicable law.
+#
+# Read the RISK DISCLAIMER carefully.
+#
+# (c) FXCM Forex Capital Markets Ltd.
+#
+
+
+import logging
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from fxcmpy.fxcmpy_closed_position import fxcmpy_closed_position
+from fxcmpy.fxcmpy_open_position import fxcmpy_open_position
+from fxcmpy.fxcmpy_order import fxcmpy_order
+from fxcmpy.fxcmpy_pl_engine import fxcmpy_pl_engine
+from fxcmpy.fxcmpy_resample import get_session_labels
+
+
+class fxcmpy_price_history(object):
+    """ The prices of an instrument up to an event of fxcmpy_replay, given
+    to the callbacks in place of a DataFrame if the replay is created with
+    lazy_history=True.
+
+    The DataFrame, a slice of the historical data, costs about 15
+    microseconds per event and is only built if the callback uses it.
+    Attributes, indexing, operators and NumPy functions are passed on to
+    it, len() is answered without it. Where a DataFrame instance is needed,
+    e.g. for isinstance() or pd.concat(), use the attribute frame.
+    """
+
+    __slots__ = ('__source__', '__rows__', '__frame__')
+
+    def __init__(self, source, rows):
+        self.__source__ = source
+        self.__rows__ = rows
+        self.__frame__ = None
+
+    @property
+    def frame(self):
+        """ The prices as pandas DataFrame, a view of the historical
+        data. """
+
+        if self.__frame__ is None:
+            self.__frame__ = self.__source__.iloc[:self.__rows__]
+        return self.__frame__
+
+    def __getattr__(self, name):
+        if name.startswith('__') and name.endswith('__'):
+            raise AttributeError(name)
+        return getattr(self.frame, name)
+
+    def __len__(self):
+        return self.__rows__
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.frame, dtype=dtype)
+
+    __hash__ = None
+
+
+def __forward__(name):
+    """ Return a method calling the method name of the DataFrame. """
+
+    def method(self, *args):
+        return getattr(self.frame, name)(*args)
+    method.__name__ = name
+    return method
+
+
+for name in ('__getitem__', '__iter__', '__contains__', '__bool__',
+             '__repr__', '__str__', '__eq__', '__ne__', '__lt__', '__le__',
+             '__gt__', '__ge__', '__neg__', '__abs__', '__invert__',
+             '__add__', '__radd__', '__sub__', '__rsub__', '__mul__',
+             '__rmul__', '__truediv__', '__rtruediv__', '__pow__',
+             '__rpow__', '__and__', '__or__'):
+    setattr(fxcmpy_price_history, name, __forward__(name))
+del name
+
+
+class fxcmpy_replay(object):
+    """ An event-driven backtester which replays historical ticks or candles
+    through the price stream interface of the fxcmpy class.
+
+    A strategy written against a connection, i.e. using
+    subscribe_market_data(symbol, add_callbacks), get_prices(),
+    get_last_price() and the trading methods like create_market_buy_order()
+    or close_trade(), runs unchanged against a replay object. The callbacks
+    get the same arguments as in live trading, a dict with the keys
+    'Symbol', 'Updated' and 'Rates' and the DataFrame with the prices
+    received so far, but they are called synchronously in the order of the
+    events, one after the other. Building the DataFrame costs about 15
+    microseconds per event, with lazy_history=True the callbacks get a
+    fxcmpy_price_history instead, which builds it only if it is used.
+
+    The data of several symbols is merged into one stream ordered by time.
+    Market orders are filled at the current ask (buy) or bid (sell), entry
+    orders, stops and limits are triggered and filled at the first quote
+    reaching their rate. The P&L is computed like fxcmpy_pl_engine does,
+    converted into the account currency if possible.
+
+    Usage:
+
+    replay = fxcmpy_replay({'EUR/USD': reader.get_data()})
+    replay.subscribe_market_data('EUR/USD', (strategy,))
+    replay.run()
+    replay.get_closed_positions()
+    """
+
+    block_size = 65536
+    price_columns = ['Bid', 'Ask', 'High', 'Low']
+
+    def __init__(self, data=None, balance=50000, account_id=1,
+                 account_currency='USD', slippage=0, pip_sizes=None,
+                 lazy_history=False):
+        """ Constructor.
+
+        Arguments:
+
+        data: dict or None (default None),
+            maps symbols to historical data, see add_data().
+
+        balance: number (default 50000),
+            the initial balance of the simulated account.
+
+        account_id: integer (default 1),
+            the id of the simulated account.
+
+        account_currency: string (default 'USD'),
+            the currency of the account.
+
+        slippage: number (default 0),
+            the number of pips every market order is filled worse than the
+            current quote.
+
+        pip_sizes: dict or None (default None),
+            maps symbols to their pip size, 0.01 for JPY pairs and 0.0001
+            for all other symbols if not given.
+
+        lazy_history: boolean (default False),
+            whether the callbacks get the prices as fxcmpy_price_history,
+            which builds the DataFrame only on use, instead of the
+            DataFrame itself.
+        """
+
+        try:
+            self.default_account = int(account_id)
+            self.balance = float(balance)
+            self.slippage = float(slippage)
+        except:
+            raise TypeError('account_id must be an integer, balance and '
+                            'slippage must be numbers.')
+        if lazy_history not in (True, False):
+            raise ValueError('lazy_history must be True or False.')
+        self.lazy_history = lazy_history
+        self.account_ids = [self.default_account]
+        self.account_currency = account_currency
+        self.pip_sizes = dict(pip_sizes or dict())
+        self.logger = logging.getLogger('FXCM')
+
+        self.add_callbacks = dict()
+        self.orders = dict()
+        self.open_pos = dict()
+        self.closed_pos = dict()
+        self.pl_engine = fxcmpy_pl_engine(self)
+
+        self.__frames__ = dict()
+        self.__values__ = dict()
+        self.__dates__ = dict()
+        self.__rows__ = dict()
+        self.__subscribed__ = list()
+        # symbol -> dict of trade id -> exit rules of the open trades
+        self.__exits__ = dict()
+        # symbol -> dict of order id -> waiting entry orders
+        self.__entries__ = dict()
+        self.__warned__ = set()
+        self.__next_id__ = 1
+        self.__now__ = 0
+        self.__history__ = list()
+        self.stats = {'events': 0, 'seconds': 0.0}
+
+        for symbol in (data or dict()):
+            self.add_data(symbol, data[symbol])
+
+    def add_data(self, symbol, data):
+        """ Add the historical data of a symbol.
+
+        Arguments:
+
+        symbol: string,
+            the symbol, e.g. 'EUR/USD' or 'EURUSD'.
+
+        data: pandas.DataFrame,
+            ticks with the columns 'Bid' and 'Ask' as returned by
+            fxcmpy_tick_data_reader.get_data() or candles as returned by
+            fxcmpy.get_candles() or fxcmpy_candles_data_reader.get_data(),
+            indexed by date. Candles are replayed with their close prices.
+        """
+
+        if not isinstance(data, pd.DataFrame):
+            raise TypeError('data must be a pandas DataFrame.')
+        columns = dict((col.lower(), col) for col in data.columns)
+        if 'date' in columns and not isinstance(data.index,
+                                                pd.DatetimeIndex):
+            data = data.set_index(columns.pop('date'))
+        if 'bid' in columns and 'ask' in columns:
+            bid = data[columns['bid']].to_numpy(dtype=np.float64)
+            ask = data[columns['ask']].to_numpy(dtype=np.float64)
+            high = bid
+            low = bid
+        elif 'bidclose' in columns and 'askclose' in columns:
+            bid = data[columns['bidclose']].to_numpy(dtype=np.float64)
+            ask = data[columns['askclose']].to_numpy(dtype=np.float64)
+            high = data[columns.get('bidhigh', columns['bidclose'])] \
+                .to_numpy(dtype=np.float64)
+            low = data[columns.get('bidlow', columns['bidclose'])] \
+                .to_numpy(dtype=np.float64)
+        else:
+            raise ValueError('data must contain ticks or candles.')
+
+        index = pd.DatetimeIndex(data.index)
+        if index.tz is not None:
+            index = index.tz_convert('UTC').tz_localize(None)
+        dates = index.values.astype('datetime64[ns]')
+        order = None
+        if len(dates) > 1 and (dates[1:] < dates[:-1]).any():
+            order = np.argsort(dates, kind='stable')
+            dates = dates[order]
+            bid, ask, high, low = bid[order], ask[order], high[order], \
+                low[order]
+
+        values = np.empty((len(dates), 4), dtype=np.float64)
+        values[:, 0] = bid
+        values[:, 1] = ask
+        if len(dates) > 0:
+            # High and Low of the stream are the extremes of the trading day
+            session = pd.Series(get_session_labels(pd.DatetimeIndex(dates),
+                                                   'D1'))
+            values[:, 2] = pd.Series(high).groupby(session).cummax()
+            values[:, 3] = pd.Series(low).groupby(session).cummin()
+        frame = pd.DataFrame(values, columns=self.price_columns,
+                             index=pd.DatetimeIndex(dates), copy=False)
+        self.__frames__[symbol] = frame
+        self.__values__[symbol] = frame.to_numpy()
+        self.__dates__[symbol] = dates.view(np.int64)
+        self.__rows__[symbol] = 0
+        self.__exits__.setdefault(symbol, dict())
+        self.__entries__.setdefault(symbol, dict())
+
+    def get_instruments(self):
+        """ Return the symbols with historical data. """
+
+        return list(self.__frames__.keys())
+
+    def get_subscribed_symbols(self):
+        """ Returns a list of symbols for the subscribed instruments."""
+
+        return list(self.__subscribed__)
+
+    def is_subscribed(self, symbol):
+        """ Returns True if the instrument is subscribed and False else."""
+
+        return symbol in self.__subscribed__
+
+    def subscribe_market_data(self, symbol='', add_callbacks=()):
+        """ Replay the prices of an instrument, see
+        fxcmpy.subscribe_market_data().
+
+        Arguments:
+
+        symbol:  string,
+            the symbol of the instrument as given to add_data().
+
+        add_callbacks: list of callables,
+            all methods in that list will be called for every event of the
+            instrument with two positional arguments, the dict with the new
+            price data and the DataFrame with the prices up to the event,
+            or a fxcmpy_price_history with lazy_history=True.
+        """
+
+        if symbol == '':
+            raise ValueError('No symbol given.')
+        if symbol not in self.__frames__:
+            raise ValueError('No data for symbol %s.' % symbol)
+        for func in add_callbacks:
+            if not callable(func):
+                raise ValueError('Content of add_callbacks is not callable.')
+            self.add_callbacks.setdefault(symbol, dict())[func.__name__] = \
+                func
+        if symbol not in self.__subscribed__:
+            self.__subscribed__.append(symbol)
+
+    def unsubscribe_market_data(self, symbol=''):
+        """ Stop the replay of an instrument and remove its callbacks."""
+
+        if symbol == '':
+            raise ValueError('No symbol given.')
+        if symbol in self.__subscribed__:
+            self.__subscribed__.remove(symbol)
+        self.add_callbacks.pop(symbol, None)
+
+    @property
+    def prices(self):
+        """ The prices of the subscribed instruments up to the current
+        event, as for the fxcmpy class."""
+
+        return dict((symbol, self.get_prices(symbol))
+                    for symbol in self.__subscribed__)
+
+    def get_prices(self, symbol):
+        """ Return the prices of a given instrument up to the current event
+        as pandas DataFrame with the columns 'Bid', 'Ask', 'High' and 'Low'.
+        The DataFrame is a view of the historical data, no data is copied.
+        """
+
+        if symbol in self.__frames__ and self.__rows__[symbol] > 0:
+            return self.__frames__[symbol].iloc[:self.__rows__[symbol]]
+        return pd.DataFrame(columns=self.price_columns)
+
+    def get_last_price(self, symbol):
+        """ Return the last prices of a given instrument as pandas Series."""
+
+        if symbol in self.__frames__ and self.__rows__[symbol] > 0:
+            return self.__frames__[symbol].iloc[self.__rows__[symbol] - 1]
+        raise ValueError('Symbol %s is not subscripted' % symbol)
+
+    def get_time(self):
+        """ Return the time of the current event as pandas Timestamp."""
+
+        return pd.Timestamp(self.__now__, unit='ns')
+
+    def run(self, start=None, end=None, close_positions=False):
+        """ Replay the events of the subscribed instruments between start and
+        end in time order.
+
+        The prices before start are visible to get_prices() from the
+        beginning, e.g. as history of indicators. Exceptions raised by a
+        callback stop the replay.
+
+        Arguments:
+
+        start, end: datetime or None (default None),
+            the range of the events, both included.
+
+        close_positions: boolean (default False),
+            whether to close all positions and delete all orders at the end.
+
+        Returns:
+
+        A dict with the statistics of the replay, see get_stats().
+        """
+
+        symbols = list(self.__subscribed__)
+        if len(symbols) == 0:
+            raise ValueError('No symbol subscribed.')
+        first = self.__nanoseconds__(start, np.iinfo(np.int64).min)
+        last = self.__nanoseconds__(end, np.iinfo(np.int64).max)
+
+        bounds = list()
+        for symbol in symbols:
+            dates = self.__dates__[symbol]
+            lower = int(np.searchsorted(dates, first, 'left'))
+            upper = max(lower, int(np.searchsorted(dates, last, 'right')))
+            bounds.append((lower, upper))
+            self.__rows__[symbol] = lower
+
+        if len(symbols) == 1:
+            lower, upper = bounds[0]
+            dates = self.__dates__[symbols[0]][lower:upper]
+            values = self.__values__[symbols[0]][lower:upper]
+            codes = np.zeros(len(dates), dtype=np.int64)
+            rows = np.arange(lower, upper, dtype=np.int64)
+            order = None
+        else:
+            dates = np.concatenate([self.__dates__[symbol][lower:upper]
+                                    for symbol, (lower, upper)
+                                    in zip(symbols, bounds)])
+            values = np.concatenate([self.__values__[symbol][lower:upper]
+                                     for symbol, (lower, upper)
+                                     in zip(symbols, bounds)])
+            codes = np.concatenate([np.full(upper - lower, code,
+                                            dtype=np.int64)
+                                    for code, (lower, upper)
+                                    in enumerate(bounds)])
+            rows = np.concatenate([np.arange(lower, upper, dtype=np.int64)
+                                   for lower, upper in bounds])
+            # events of the same time keep the order of the subscriptions
+            order = np.argsort(dates, kind='stable')
+
+        t0 = time.time()
+        try:
+            for block in range(0, len(dates), self.block_size):
+                if order is None:
+                    index = slice(block, block + self.block_size)
+                else:
+                    index = order[block:block + self.block_size]
+                self.__replay_block__(symbols, dates[index].tolist(),
+                                      values[index].tolist(),
+                                      codes[index].tolist(),
+                                      rows[index].tolist())
+        finally:
+            self.stats['seconds'] += time.time() - t0
+        if close_positions:
+            for order_id in list(self.orders):
+                self.delete_order(order_id)
+            self.close_all()
+        return self.get_stats()
+
+    def get_stats(self):
+        """ Return a dict with the number of replayed events, the time the
+        replay took, the events per second, the number of closed trades,
+        the balance and the equity."""
+
+        stats = dict(self.stats)
+        stats['events_per_second'] = (stats['events'] /
+                                      max(stats['seconds'], 1e-9))
+        stats['trades'] = len(self.closed_pos)
+        stats['balance'] = self.balance
+        stats['equity'] = self.get_equity()
+        return stats
+
+    def get_equity(self):
+        """ Return the balance plus the P&L of the open positions."""
+
+        return self.balance + sum(self.__mark__(trade_id)[2]
+                                  for trade_id in self.open_pos)
+
+    def get_balance_history(self):
+        """ Return the balance after every closed trade as pandas Series
+        indexed by the close time."""
+
+        if len(self.__history__) == 0:
+            return pd.Series([], dtype=float, name='balance',
+                             index=pd.DatetimeIndex([], name='date'))
+        dates, values = zip(*self.__history__)
+        return pd.Series(values, name='balance',
+                         index=pd.DatetimeIndex(np.array(dates, dtype=np.int64)
+                                                .view('datetime64[ns]'),
+                                                name='date'))
+
+    def get_accounts(self, kind='dataframe'):
+        """ Return the simulated account with its balance, equity and gross
+        P&L."""
+
+        equity = self.get_equity()
+        data = [{'accountId': self.default_account,
+                 'accountName': str(self.default_account),
+                 'balance': self.balance, 'equity': equity,
+                 'grossPL': equity - self.balance}]
+        if kind == 'list':
+            return data
+        return pd.DataFrame(data)
+
+    def get_pl_engine(self):
+        """ Return the fxcmpy_pl_engine of the replay, marked to the prices
+        of the current event."""
+
+        self.pl_engine.invalidate()
+        return self.pl_engine
+
+    def get_open_positions(self, kind='dataframe'):
+        """ Return the open positions marked to the current prices. """
+
+        data = [self.__position_data__(self.get_open_position(trade_id))
+                for trade_id in self.open_pos]
+        if kind == 'list':
+            return data
+        return pd.DataFrame(data)
+
+    def get_closed_positions(self, kind='dataframe'):
+        """ Return the closed positions. """
+
+        data = [self.__position_data__(pos)
+                for pos in self.closed_pos.values()]
+        if kind == 'list':
+            return data
+        return pd.DataFrame(data)
+
+    def get_orders(self, kind='dataframe'):
+        """ Return the waiting entry orders. """
+
+        data = [self.__position_data__(order)
+                for order in self.orders.values()]
+        if kind == 'list':
+            return data
+        return pd.DataFrame(data)
+
+    def get_order_ids(self):
+        """ Returns a list of the waiting entry orders."""
+
+        return list(self.orders.keys())
+
+    def get_open_trade_ids(self):
+        """ Returns a list of the open trade ids."""
+
+        return list(self.open_pos.keys())
+
+    def get_closed_trade_ids(self):
+        """ Returns a list of the closed trade ids."""
+
+        return list(self.closed_pos.keys())
+
+    def get_all_trade_ids(self):
+        """ Returns a list of all trade ids."""
+
+        return sorted(self.get_open_trade_ids() +
+                      self.get_closed_trade_ids())
+
+    def get_open_position(self, position_id):
+        """ Return the open position with given id as fxcmpy_open_position
+        marked to the current prices."""
+
+        try:
+            position_id = int(position_id)
+        except:
+            raise TypeError('position id must be an integer.')
+        if position_id not in self.open_pos:
+            raise ValueError('No open position with id %s.' % position_id)
+        pos = self.open_pos[position_id]
+        close, pips, gross = self.__mark__(position_id)
+        pos.__set_attribute__('close', close)
+        pos.__set_attribute__('visiblePL', pips)
+        pos.__set_attribute__('grossPL', gross)
+        return pos
+
+    def get_closed_position(self, position_id):
+        """ Return the closed position with given id."""
+
+        try:
+            position_id = int(position_id)
+        except:
+            raise TypeError('position id must be an integer.')
+        if position_id not in self.closed_pos:
+            raise ValueError('No closed position with given id %s.'
+                             % position_id)
+        return self.closed_pos[position_id]
+
+    def get_order(self, order_id):
+        """ Returns the waiting entry order with the given id."""
+
+        try:
+            order_id = int(order_id)
+        except:
+            raise TypeError('order_id must be an integer.')
+        if order_id not in self.orders:
+            raise ValueError('No order with id %s.' % order_id)
+        return self.orders[order_id]
+
+    def create_market_buy_order(self, symbol, amount, account_id=None):
+        """ Buy at the current ask, see fxcmpy.create_market_buy_order(). """
+
+        return self.open_trade(symbol, True, amount, 'FOK', 'AtMarket',
+                               account_id=account_id)
+
+    def create_market_sell_order(self, symbol, amount, account_id=None):
+        """ Sell at the current bid, see fxcmpy.create_market_sell_order().
+        """
+
+        return self.open_trade(symbol, False, amount, 'FOK', 'AtMarket',
+                               account_id=account_id)
+
+    def open_trade(self, symbol, is_buy, amount, time_in_force, order_type,
+                   rate=0, is_in_pips=True, limit=None, at_market=0,
+                   stop=None, trailing_step=None, account_id=None):
+        """ Open a trade at the current quote, see fxcmpy.open_trade().
+
+        The stop and limit are relative to the fill in pips if is_in_pips
+        is True, negative stops and positive limits are on the losing and
+        winning side of the trade. The trade is filled immediately, the
+        returned fxcmpy_order is executed already.
+        """
+
+        self.__check_account__(account_id)
+        amount = self.__check_amount__(amount)
+        if order_type not in ['AtMarket', 'MarketRange']:
+            raise ValueError("order_type must be 'AtMarket' or "
+                             "'MarketRange'.")
+        if time_in_force not in ['IOC', 'GTC', 'FOK', 'DAY', 'GTD']:
+            raise ValueError("time_in_force must be in 'IOC', 'GTC', 'FOK', "
+                             "'DAY', 'GTD'")
+        if is_buy not in (True, False):
+            raise ValueError('is_buy must be True or False.')
+        bid, ask = self.__get_quote__(symbol)
+        order = self.__create_order__(symbol, is_buy, amount, time_in_force,
+                                      'AM', rate, stop, limit, is_in_pips,
+                                      trailing_step)
+        self.__fill__(order, bid, ask)
+        return order
+
+    def create_entry_order(self, symbol, is_buy, amount, time_in_force,
+                           order_type='Entry', limit=0, is_in_pips=True,
+                           rate=0, stop=None, trailing_step=None,
+                           account_id=None):
+        """ Create an entry order, see fxcmpy.create_entry_order().
+
+        A buy order at a rate above the current ask is a stop entry and is
+        filled once the ask rises to the rate, below the current ask it is a
+        limit entry and is filled once the ask falls to the rate. A sell
+        order at a rate below the current bid is a stop entry and is filled
+        once the bid falls to the rate, above the current bid it is a limit
+        entry and is filled once the bid rises to the rate. Stop and limit
+        are applied to the fill like in open_trade().
+        """
+
+        self.__check_account__(account_id)
+        amount = self.__check_amount__(amount)
+        if order_type != 'Entry':
+            raise ValueError("order_type must be 'Entry'.")
+        if time_in_force not in ['GTC', 'DAY', 'GTD', 'IOC', 'FOK']:
+            raise ValueError("time_in_force must be in 'GTC', 'DAY', 'GTD', "
+                             "'IOC', 'FOK'.")
+        if is_buy not in (True, False):
+            raise ValueError('is_buy must be True or False.')
+        try:
+            rate = float(rate)
+        except:
+            raise TypeError('rate must be a number.')
+        if limit == 0:
+            limit = None
+        bid, ask = self.__get_quote__(symbol)
+        if is_buy:
+            kind = 'SE' if rate > ask else 'LE'
+        else:
+            kind = 'SE' if rate < bid else 'LE'
+        order = self.__create_order__(symbol, is_buy, amount, time_in_force,
+                                      kind, rate, stop, limit, is_in_pips,
+                                      trailing_step)
+        self.orders[order.get_orderId()] = order
+        self.__entries__[symbol][order.get_orderId()] = order
+        return order
+
+    def delete_order(self, order_id):
+        """ Delete a waiting entry order."""
+
+        order = self.get_order(order_id)
+        order.__set_attribute__('status', 3)
+        del self.orders[order.get_orderId()]
+        self.__entries__[order.get_currency()].pop(order.get_orderId(), None)
+
+    def change_trade_stop_limit(self, trade_id, is_stop, rate,
+                                is_in_pips=True, trailing_step=0):
+        """ Change the stop or the limit of an open trade, see
+        fxcmpy.change_trade_stop_limit()."""
+
+        pos = self.get_open_position(trade_id)
+        try:
+            rate = float(rate)
+        except:
+            raise TypeError('rate must be a number.')
+        exit = self.__exits__[pos.get_currency()][pos.__tradeId__]
+        if is_in_pips:
+            rate = exit['open'] + exit['sign'] * rate * exit['pip']
+        if is_stop:
+            exit['stop'] = rate
+            exit['trailing'] = (float(trailing_step or 0) * exit['pip'],
+                                abs(exit['open'] - rate))
+            pos.__set_attribute__('stop', rate)
+            pos.__set_attribute__('stopMove', trailing_step or 0)
+        else:
+            exit['limit'] = rate
+            pos.__set_attribute__('limit', rate)
+
+    def close_trade(self, trade_id, amount, order_type='AtMarket',
+                    time_in_force='IOC', rate=0, at_market=0):
+        """ Close a trade or a part of it at the current quote, see
+        fxcmpy.close_trade(). The closed part gets a new trade id."""
+
+        try:
+            trade_id = int(trade_id)
+        except:
+            raise TypeError('trade_id must be an integer.')
+        try:
+            amount = float(amount)
+        except:
+            raise TypeError('amount must be a number.')
+        if order_type not in ['AtMarket', 'MarketRange']:
+            raise ValueError("order_type must be 'AtMarket' or "
+                             "'MarketRange'.")
+        if trade_id not in self.open_pos:
+            raise ValueError('No open position with id %s.' % trade_id)
+        symbol = self.open_pos[trade_id].get_currency()
+        bid, ask = self.__get_quote__(symbol)
+        self.__close__(trade_id, amount, bid, ask, slippage=True)
+
+    def close_all_for_symbol(self, symbol, order_type='AtMarket',
+                             time_in_force='GTC', account_id=None):
+        """ Close all positions of a symbol at the current quote."""
+
+        self.__check_account__(account_id)
+        for trade_id in list(self.open_pos):
+            if self.open_pos[trade_id].get_currency() == symbol:
+                self.close_trade(trade_id, 0, order_type)
+
+    def close_all(self, order_type='AtMarket', time_in_force='GTC',
+                  account_id=None):
+        """ Close all positions at the current quotes."""
+
+        self.__check_account__(account_id)
+        for trade_id in list(self.open_pos):
+            self.close_trade(trade_id, 0, order_type)
+
+    def __replay_block__(self, symbols, dates, values, codes, rows):
+        """ Process the events of one block, the arguments are lists. """
+
+        exits = self.__exits__
+        entries = self.__entries__
+        callbacks = self.add_callbacks
+        frames = self.__frames__
+        current = self.__rows__
+        lazy = self.lazy_history
+        for date, rates, code, row in zip(dates, values, codes, rows):
+            symbol = symbols[code]
+            current[symbol] = row + 1
+            self.__now__ = date
+            if exits[symbol] or entries[symbol]:
+                self.__check__(symbol, rates[0], rates[1])
+            funcs = callbacks.get(symbol)
+            if funcs:
+                data = {'Symbol': symbol, 'Updated': date // 1000000,
+                        'Rates': rates}
+                if lazy:
+                    # the DataFrame is built only if a callback uses it
+                    prices = fxcmpy_price_history(frames[symbol], row + 1)
+                else:
+                    prices = frames[symbol].iloc[:row + 1]
+                for func in list(funcs.values()):
+                    func(data, prices)
+        self.stats['events'] += len(dates)
+
+    def __check__(self, symbol, bid, ask):
+        """ Fill the triggered entry orders and close the trades whose stop
+        or limit is reached. """
+
+        for order in list(self.__entries__[symbol].values()):
+            if order.get_isBuy():
+                sign, price, rate = 1, ask, order.get_buy()
+            else:
+                sign, price, rate = -1, bid, order.get_sell()
+            # stop entries trigger when the price moves through the rate in
+            # the direction of the trade, limit entries against it
+            if order.get_type() == 'SE':
+                triggered = sign * (price - rate) >= 0
+            else:
+                triggered = sign * (price - rate) <= 0
+            if triggered:
+                del self.__entries__[symbol][order.get_orderId()]
+                del self.orders[order.get_orderId()]
+                self.__fill__(order, bid, ask, slippage=False)
+
+        for trade_id, exit in list(self.__exits__[symbol].items()):
+            sign = exit['sign']
+            price = bid if sign > 0 else ask
+            stop = exit['stop']
+            step, distance = exit['trailing']
+            if stop is not None and step > 0:
+                moves = math.floor((sign * (price - stop) - distance) / step)
+                if moves > 0:
+                    stop += sign * moves * step
+                    exit['stop'] = stop
+                    self.open_pos[trade_id].__set_attribute__('stop', stop)
+            if (stop is not None and sign * (price - stop) <= 0) or \
+                    (exit['limit'] is not None and
+                     sign * (price - exit['limit']) >= 0):
+                self.__close__(trade_id, 0, bid, ask)
+
+    def __create_order__(self, symbol, is_buy, amount, time_in_force, kind,
+                         rate, stop, limit, is_in_pips, trailing_step):
+        for name, value in (('stop', stop), ('limit', limit),
+                            ('trailing_step', trailing_step)):
+            if value is not None:
+                try:
+                    float(value)
+                except:
+                    raise TypeError('%s must be a number.' % name)
+        if is_in_pips not in (True, False):
+            raise ValueError('is_in_pips must be True or False.')
+        order_id = self.__new_id__()
+        order = fxcmpy_order(self, {
+            'orderId': order_id, 'time': self.__time_string__(),
+            'accountName': str(self.default_account),
+            'accountId': self.default_account,
+            'timeInForce': time_in_force, 'currency': symbol,
+            'isBuy': is_buy, 'buy': rate if is_buy else 0,
+            'sell': 0 if is_buy else rate, 'type': kind, 'status': 1,
+            'amountK': amount, 'currencyPoint': 0,
+            'stopMove': trailing_step or 0, 'stop': stop or 0,
+            'stopRate': 0, 'limit': limit or 0, 'limitRate': 0,
+            'isEntryOrder': kind != 'AM', 'ocoBulkId': 0,
+            'isNetQuantity': False, 'isLimitOrder': limit is not None,
+            'isStopOrder': stop is not None, 'isELSOrder': False,
+            'stopPegBaseType': -1, 'limitPegBaseType': -1, 'range': 0})
+        order.__in_pips__ = is_in_pips
+        return order
+
+    def __fill__(self, order, bid, ask, slippage=True):
+        """ Open the trade of order at the current quote. """
+
+        symbol = order.get_currency()
+        sign = 1.0 if order.get_isBuy() else -1.0
+        pip = self.__get_pip_size__(symbol)
+        price = ask if sign > 0 else bid
+        if slippage:
+            price += sign * self.slippage * pip
+        stop = order.get_stop() or None
+        limit = order.get_limit() or None
+        if order.__in_pips__:
+            if stop is not None:
+                stop = price + sign * float(stop) * pip
+            if limit is not None:
+                limit = price + sign * float(limit) * pip
+        step = float(order.get_stopMove() or 0) * pip
+        trade_id = self.__new_id__()
+        amount = order.get_amount()
+        self.open_pos[trade_id] = fxcmpy_open_position(self, {
+            'tradeId': trade_id, 'accountName': str(self.default_account),
+            'accountId': self.default_account, 'roll': 0, 'com': 0,
+            'open': price, 'valueDate': '', 'grossPL': 0, 'close': price,
+            'visiblePL': 0, 'isDisabled': False, 'currency': symbol,
+            'isBuy': sign > 0, 'amountK': amount,
+            'currencyPoint': amount * 1000 * pip *
+            self.__get_conversion__(symbol, price),
+            'time': self.__time_string__(), 'usedMargin': 0,
+            'stop': stop or 0, 'stopMove': order.get_stopMove(),
+            'limit': limit or 0})
+        self.__exits__[symbol][trade_id] = {
+            'sign': sign, 'open': price, 'pip': pip, 'stop': stop,
+            'limit': limit,
+            'trailing': (step, abs(price - stop) if stop is not None else 0)}
+        order.__set_attribute__('status', 9)
+        order.__tradeId__ = trade_id
+        self.pl_engine.invalidate(symbol)
+
+    def __close__(self, trade_id, amount, bid, ask, slippage=False):
+        """ Close amount of the trade, all of it if amount is 0, at the
+        current quote. """
+
+        pos = self.open_pos[trade_id]
+        symbol = pos.get_currency()
+        exit = self.__exits__[symbol][trade_id]
+        sign = exit['sign']
+        price = bid if sign > 0 else ask
+        if slippage:
+            price -= sign * self.slippage * exit['pip']
+        total = pos.get_amount()
+        if amount <= 0 or amount >= total:
+            amount = total
+        pips = (price - exit['open']) * sign / exit['pip']
+        point = pos.get_currencyPoint() * amount / total
+        gross = pips * point
+        self.balance += gross
+
+        closed_id = trade_id
+        if amount < total:
+            closed_id = self.__new_id__()
+            pos.__set_attribute__('amountK', total - amount)
+            pos.__set_attribute__('currencyPoint',
+                                  pos.get_currencyPoint() - point)
+        else:
+            del self.open_pos[trade_id]
+            del self.__exits__[symbol][trade_id]
+        self.closed_pos[closed_id] = fxcmpy_closed_position(self, {
+            'tradeId': closed_id, 'accountName': str(self.default_account),
+            'roll': 0, 'com': 0, 'open': exit['open'], 'valueDate': '',
+            'grossPL': gross, 'close': price, 'visiblePL': pips,
+            'currency': symbol, 'isBuy': sign > 0, 'amountK': amount,
+            'currencyPoint': point, 'closeTime': self.__time_string__(),
+            'openTime': pos.get_time().strftime('%m%d%Y%H%M%S')})
+        self.__history__.append((self.__now__, self.balance))
+        self.pl_engine.invalidate(symbol)
+
+    def __mark__(self, trade_id):
+        """ Return the close price, the P&L in pips and the gross P&L of an
+        open trade at the current prices. """
+
+        pos = self.open_pos[trade_id]
+        symbol = pos.get_currency()
+        exit = self.__exits__[symbol][trade_id]
+        bid, ask = self.__get_quote__(symbol)
+        close = bid if exit['sign'] > 0 else ask
+        pips = (close - exit['open']) * exit['sign'] / exit['pip']
+        return close, pips, pips * pos.get_currencyPoint()
+
+    def __get_quote__(self, symbol):
+        if symbol not in self.__frames__:
+            raise ValueError('Unknown symbol %s.' % symbol)
+        row = self.__rows__[symbol]
+        if row == 0:
+            raise ValueError('No prices of %s replayed yet.' % symbol)
+        values = self.__values__[symbol]
+        return float(values[row - 1, 0]), float(values[row - 1, 1])
+
+    def __get_pip_size__(self, symbol):
+        """ Return the pip size of the given symbol. """
+
+        if symbol in self.pip_sizes:
+            return float(self.pip_sizes[symbol])
+        if 'JPY' in symbol:
+            return 0.01
+        return 0.0001
+
+    def __get_conversion__(self, symbol, price):
+        """ Return the factor converting amounts in the quote currency of
+        symbol into the account currency. """
+
+        pair = symbol.replace('/', '')
+        base, quote = pair[:3], pair[3:]
+        account = self.account_currency
+        if quote == account:
+            return 1.0
+        if base == account:
+            return 1.0 / price
+        for other in self.__frames__:
+            if self.__rows__[other] == 0:
+                continue
+            name = other.replace('/', '')
+            if name == quote + account:
+                return self.__get_quote__(other)[0]
+            if name == account + quote:
+                return 1.0 / self.__get_quote__(other)[1]
+        if symbol not in self.__warned__:
+            self.__warned__.add(symbol)
+            self.logger.warn('No prices to convert %s into %s, the P&L of %s '
+                             'is in %s.' % (quote, account, symbol, quote))
+        return 1.0
+
+    def __position_data__(self, obj):
+        return dict((para, getattr(obj, '__%s__' % para))
+                    for para in sorted(obj.parameter))
+
+    def __check_account__(self, account_id):
+        if account_id is not None and account_id not in self.account_ids:
+            raise ValueError('Unknown account id %s.' % account_id)
+
+    def __check_amount__(self, amount):
+        try:
+            amount = int(amount)
+        except:
+            raise TypeError('amount must be an integer.')
+        if amount <= 0:
+            raise ValueError('amount must be positive.')
+        return amount
+
+    def __new_id__(self):
+        ret = self.__next_id__
+        self.__next_id__ += 1
+        return ret
+
+    def __time_string__(self):
+        return pd.Timestamp(self.__now__, unit='ns').strftime('%m%d%Y%H%M%S')
+
+    def __nanoseconds__(self, date, default):
+        if date is None:
+            return default
+        return int(pd.Timestamp(date).as_unit('ns').value)
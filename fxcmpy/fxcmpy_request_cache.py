@@ -0,0 +1,129 @@
+#
+# fxcmpy_request_cache -- A Python Wrapper Class for the
+# RESTful API as provided by FXCM Forex Capital Markets Ltd.
+#
+# Proof-of-Concept | Prototype Version for Illustration
+# by The Python Quants GmbH
+#
+# The codes contained herein come without warranties or representations,
+# to the extent permitted by applicable law.
+#
+# Read the RISK DISCLAIMER carefully.
+#
+# (c) FXCM Forex Capital Markets Ltd.
+#
+
+
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from threading import Lock
+
+
+class fxcmpy_request_cache(object):
+    """ A bounded in-memory LRU cache with time-to-live for server answers.
+
+    Identical requests which are in flight at the same time are coalesced,
+    only the first one is sent to the server and all callers share its
+    result.
+
+    Caution:
+
+    The cached values are shared between all callers and must not be
+    changed. Use the set_request_cache() method of the fxcmpy class to
+    enable the cache for get_candles().
+    """
+
+    def __init__(self, max_size=128):
+        """ Constructor.
+
+        Arguments:
+
+        max_size: integer (default 128),
+            the maximal number of cached answers, the least recently used
+            answers are dropped first.
+        """
+
+        try:
+            max_size = int(max_size)
+        except:
+            raise TypeError('max_size must be an integer.')
+        if max_size < 1:
+            raise ValueError('max_size must be a positive integer.')
+
+        self.max_size = max_size
+        self.lock = Lock()
+        self.entries = OrderedDict()
+        self.in_flight = dict()
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0}
+
+    def get(self, key, ttl, fetch):
+        """ Return the cached value for key or the result of fetch().
+
+        Arguments:
+
+        key: hashable,
+            identifies the request.
+
+        ttl: number,
+            the time in seconds the value of fetch() stays valid.
+
+        fetch: callable,
+            called without arguments to fetch the value on a cache miss.
+            If another thread is fetching the same key, the result of that
+            call is returned instead.
+        """
+
+        with self.lock:
+            if key in self.entries:
+                expires, value = self.entries[key]
+                if expires > time.time():
+                    self.entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return value
+                del self.entries[key]
+            if key in self.in_flight:
+                future = self.in_flight[key]
+                self.stats['coalesced'] += 1
+                owner = False
+            else:
+                future = Future()
+                self.in_flight[key] = future
+                self.stats['misses'] += 1
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = fetch()
+        except BaseException as inst:
+            with self.lock:
+                del self.in_flight[key]
+            future.set_exception(inst)
+            raise
+
+        with self.lock:
+            del self.in_flight[key]
+            if ttl > 0:
+                self.entries[key] = (time.time() + ttl, value)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+        future.set_result(value)
+        return value
+
+    def clear(self):
+        """ Drop all cached values."""
+
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        """ Return a dict with the number of hits, misses, coalesced
+        requests and cached entries."""
+
+        with self.lock:
+            stats = dict(self.stats)
+            stats['size'] = len(self.entries)
+        return stats
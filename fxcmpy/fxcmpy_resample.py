@@ -0,0 +1,119 @@
+#
+# fxcmpy_resample -- A Python Wrapper Class for the
+# RESTful API as provided by FXCM Forex Capital Markets Ltd.
+#
+# Proof-of-Concept | Prototype Version for Illustration
+# by The Python Quants GmbH
+#
+# The codes contained herein come without warranties or representations,
+# to the extent permitted by applicable law.
+#
+# Read the RISK DISCLAIMER carefully.
+#
+# (c) FXCM Forex Capital Markets Ltd.
+#
+
+
+import numpy as np
+import pandas as pd
+
+
+# the FXCM trading day starts at 17:00 New York time
+SESSION_TIMEZONE = 'America/New_York'
+SESSION_OFFSET = pd.Timedelta(hours=7)
+
+PERIOD_FREQUENCIES = {'m1': '1min', 'm5': '5min', 'm15': '15min',
+                      'm30': '30min', 'H1': '1h', 'H2': '2h', 'H3': '3h',
+                      'H4': '4h', 'H6': '6h', 'H8': '8h', 'D1': 'D'}
+
+AGGREGATIONS = {'bidopen': 'first', 'bidclose': 'last', 'bidhigh': 'max',
+                'bidlow': 'min', 'askopen': 'first', 'askclose': 'last',
+                'askhigh': 'max', 'asklow': 'min', 'tickqty': 'sum'}
+
+
+def resample_candles(data, period):
+    """ Resample bid/ask candles to a coarser period.
+
+    The candles are aggregated into buckets aligned to the FXCM trading
+    sessions which start at 17:00 New York time, daylight saving time
+    included. A 'D1' candle covers one session, a 'W1' candle the sessions
+    from Sunday to Friday and a 'M1' candle all sessions of a calendar month
+    whose trading day falls into that month. Intraday periods from 'H2'
+    upwards are aligned to the session start. Every bucket is labeled with
+    its start time in UTC.
+
+    Buckets at the beginning and the end of the data may be incomplete if
+    the data does not start or end at a bucket boundary.
+
+    Arguments:
+
+    data: pandas.DataFrame,
+        candles as returned by fxcmpy.get_candles(), either with the dates
+        as index or in the column 'date'. The dates are in UTC.
+
+    period: string,
+        the target granularity, one of 'm1', 'm5', 'm15', 'm30', 'H1', 'H2',
+        'H3', 'H4', 'H6', 'H8', 'D1', 'W1' or 'M1'. Must not be finer than
+        the granularity of data.
+
+    Returns:
+
+    A pandas DataFrame with the resampled candles in the layout of data.
+    """
+
+    if period not in PERIOD_FREQUENCIES and period not in ('W1', 'M1'):
+        raise ValueError('period must be one of %s.'
+                         % (list(PERIOD_FREQUENCIES) + ['W1', 'M1']))
+
+    with_index = 'date' not in data.columns
+    if not with_index:
+        data = data.set_index('date')
+
+    columns = [col for col in data.columns if col in AGGREGATIONS]
+    if len(columns) == 0:
+        raise ValueError('data contains no candle columns.')
+
+    if len(data) == 0:
+        ret = data[columns].copy()
+    else:
+        labels = get_session_labels(data.index, period)
+        ret = data[columns].groupby(labels, sort=True).agg(
+                  dict((col, AGGREGATIONS[col]) for col in columns))
+        ret.index.name = 'date'
+
+    if not with_index:
+        ret = ret.reset_index()
+    return ret
+
+
+def get_session_labels(index, period):
+    """ Return the start times in UTC of the period buckets the dates of
+    index, given in UTC, belong to."""
+
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    if period in ('m1', 'm5', 'm15', 'm30', 'H1'):
+        # New York is a whole number of hours away from UTC
+        return index.floor(PERIOD_FREQUENCIES[period])
+
+    # shift the local time such that every session starts at midnight
+    local = index.tz_localize('UTC').tz_convert(SESSION_TIMEZONE)
+    shifted = local.tz_localize(None) + SESSION_OFFSET
+
+    if period == 'W1':
+        days = shifted.normalize()
+        bucket = days - pd.to_timedelta(days.dayofweek, unit='D')
+    elif period == 'M1':
+        bucket = pd.DatetimeIndex(shifted.values.astype('datetime64[M]'))
+    else:
+        bucket = shifted.floor(PERIOD_FREQUENCIES[period])
+
+    # convert every distinct bucket start only once back to UTC
+    starts, inverse = np.unique(bucket.values, return_inverse=True)
+    starts = pd.DatetimeIndex(starts) - SESSION_OFFSET
+    starts = starts.tz_localize(SESSION_TIMEZONE,
+                                ambiguous=np.ones(len(starts), dtype=bool),
+                                nonexistent='shift_forward')
+    starts = starts.tz_convert('UTC').tz_localize(None)
+    return starts[inverse]
@@ -0,0 +1,164 @@
+#
+# fxcmpy_risk_engine -- A Python Wrapper Class for the
+# RESTful API as provided by FXCM Forex Capital Markets Ltd.
+#
+# Proof-of-Concept | Prototype Version for Illustration
+# by The Python Quants GmbH
+#
+# The codes contained herein come without warranties or representations,
+# to the extent permitted by applicable law.
+#
+# Read the RISK DISCLAIMER carefully.
+#
+# (c) FXCM Forex Capital Markets Ltd.
+#
+
+
+class RiskLimitError(Exception):
+    pass
+
+
+class fxcmpy_risk_engine(object):
+    """ Pre-trade risk checks for the order methods of the fxcmpy class.
+
+    The limits are evaluated against the in-memory order and open position
+    tables of the connection before a request is sent to the server. An
+    order violating a limit is rejected locally with a RiskLimitError.
+
+    Usage:
+
+    con.set_risk_engine(fxcmpy_risk_engine(max_order_amount=100,
+                                           max_exposure={'EUR/USD': 500},
+                                           max_open_orders=20))
+    """
+
+    def __init__(self, max_order_amount=None, max_exposure=None,
+                 max_open_orders=None):
+        """ Constructor.
+
+        Arguments:
+
+        max_order_amount: integer or None (default None),
+            the maximal amount in lots of a single order.
+
+        max_exposure: number, dict or None (default None),
+            the maximal absolute net amount in lots per symbol after the
+            order is filled. Either one limit for all symbols or a dict with
+            symbols as keys, symbols not in the dict are not limited.
+
+        max_open_orders: integer or None (default None),
+            the maximal number of orders which may exist at the same time.
+        """
+
+        self.max_order_amount = max_order_amount
+        self.max_exposure = max_exposure
+        self.max_open_orders = max_open_orders
+        self.checks = dict()
+
+    def add_check(self, func):
+        """ Add a custom check.
+
+        Arguments:
+
+        func: callable,
+            is called with two positional arguments, the connection and the
+            list of the new orders, each a dict with keys 'symbol', 'is_buy',
+            'amount' and 'account_id'. If the orders violate the check, func
+            must return a message describing the violation, else None.
+        """
+
+        if not callable(func):
+            raise ValueError('func must be callable.')
+        self.checks[func.__name__] = func
+
+    def remove_check(self, func):
+        """ Remove a custom check added by add_check()."""
+
+        name = func if isinstance(func, str) else func.__name__
+        if name in self.checks:
+            del self.checks[name]
+
+    def get_exposure(self, connection, symbol):
+        """ Return the net amount in lots of the open positions in symbol,
+        positive for long and negative for short exposure."""
+
+        exposure = 0
+        for pos in list(connection.open_pos.values()):
+            if pos.get_currency() == symbol:
+                if pos.get_isBuy():
+                    exposure += pos.get_amount()
+                else:
+                    exposure -= pos.get_amount()
+        return exposure
+
+    def check_orders(self, connection, orders, exclusive=False):
+        """ Check new orders against all limits.
+
+        Arguments:
+
+        connection: fxcmpy object,
+            the connection whose state the limits are checked against.
+
+        orders: list,
+            the new orders, each a dict with keys 'symbol', 'is_buy',
+            'amount' and 'account_id'.
+
+        exclusive: boolean (default False),
+            whether at most one of the orders can be filled, as for the
+            orders of an oco order. If True, the exposure limit is checked
+            for each order separately.
+
+        Raises a RiskLimitError if a limit is violated.
+        """
+
+        if self.max_order_amount is not None:
+            for order in orders:
+                if order['amount'] > self.max_order_amount:
+                    self.__reject__(connection,
+                                    'Order amount %s exceeds the limit of %s.'
+                                    % (order['amount'],
+                                       self.max_order_amount))
+
+        if self.max_open_orders is not None:
+            if len(connection.orders) + len(orders) > self.max_open_orders:
+                self.__reject__(connection,
+                                'Number of orders would exceed the limit '
+                                'of %s.' % self.max_open_orders)
+
+        if self.max_exposure is not None:
+            new_exposure = dict()
+            for order in orders:
+                symbol = order['symbol']
+                limit = self.__get_exposure_limit__(symbol)
+                if limit is None:
+                    continue
+                if symbol not in new_exposure:
+                    new_exposure[symbol] = self.get_exposure(connection,
+                                                             symbol)
+                current = new_exposure[symbol]
+                if order['is_buy']:
+                    exposure = current + order['amount']
+                else:
+                    exposure = current - order['amount']
+                # orders reducing the exposure are always allowed
+                if abs(exposure) > limit and abs(exposure) > abs(current):
+                    self.__reject__(connection,
+                                    'Exposure of %s in %s would exceed the '
+                                    'limit of %s.' % (exposure, symbol, limit))
+                if not exclusive:
+                    new_exposure[symbol] = exposure
+
+        for name in list(self.checks):
+            msg = self.checks[name](connection, orders)
+            if msg is not None:
+                self.__reject__(connection, msg)
+
+    def __get_exposure_limit__(self, symbol):
+        if isinstance(self.max_exposure, dict):
+            return self.max_exposure.get(symbol)
+        else:
+            return self.max_exposure
+
+    def __reject__(self, connection, msg):
+        connection.logger.error('Order rejected by risk engine: %s' % msg)
+        raise RiskLimitError(msg)
@@ -0,0 +1,62 @@
+#
+# fxcmpy_snapshot -- A Python Wrapper Class for the
+# RESTful API as provided by FXCM Forex Capital Markets Ltd.
+#
+# Proof-of-Concept | Prototype Version for Illustration
+# by The Python Quants GmbH
+#
+# The codes contained herein come without warranties or representations,
+# to the extent permitted by applicable law.
+#
+# Read the RISK DISCLAIMER carefully.
+#
+# (c) FXCM Forex Capital Markets Ltd.
+#
+
+
+from types import MappingProxyType
+
+
+class fxcmpy_snapshot(object):
+    """ An immutable, versioned view of the state tables of a fxcmpy
+    connection.
+
+    The connection never changes a table once it is published. Each change
+    is applied to a copy of the table which is then published together with
+    the other tables as a new snapshot. A snapshot can therefore be read
+    from any thread without locks and without copying, and all its tables
+    belong to the same version.
+
+    The tables are read-only mappings. The order and position objects in
+    the tables are shared with the connection, their attributes are still
+    updated by the streams.
+
+    Caution:
+
+    Do not initialize snapshots manually, use the get_snapshot() method of
+    the fxcmpy class instead.
+    """
+
+    tables = ('orders', 'old_orders', 'open_pos', 'closed_pos', 'oco_orders',
+              'prices', 'offer_table', 'account_table', 'summary_table')
+
+    __slots__ = ('version', ) + tables
+
+    def __init__(self, version, **tables):
+        object.__setattr__(self, 'version', version)
+        for table in self.tables:
+            object.__setattr__(self, table,
+                               MappingProxyType(tables.get(table, dict())))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('fxcmpy_snapshot objects are immutable.')
+
+    def __delattr__(self, name):
+        raise AttributeError('fxcmpy_snapshot objects are immutable.')
+
+    def __str__(self):
+        ret_str = '{:18}{}\n'.format('version:', self.version)
+        for table in self.tables:
+            ret_str += '{:18}{}\n'.format(table+':',
+                                          len(getattr(self, table)))
+        return ret_str
@@ -0,0 +1,223 @@
+#
+# fxcmpy_tick_resampler -- A Python Wrapper Class for the
+# RESTful API as provided by FXCM Forex Capital Markets Ltd.
+#
+# Proof-of-Concept | Prototype Version for Illustration
+# by The Python Quants GmbH
+#
+# The codes contained herein come without warranties or representations,
+# to the extent permitted by applicable law.
+#
+# Read the RISK DISCLAIMER carefully.
+#
+# (c) FXCM Forex Capital Markets Ltd.
+#
+
+
+import numpy as np
+import pandas as pd
+
+from fxcmpy.fxcmpy_resample import PERIOD_FREQUENCIES, get_session_labels
+
+
+BAR_COLUMNS = ['bidopen', 'bidclose', 'bidhigh', 'bidlow', 'askopen',
+               'askclose', 'askhigh', 'asklow', 'spreadmean', 'spreadmin',
+               'spreadmax', 'tickqty']
+
+
+class fxcmpy_tick_resampler(object):
+    """ A streaming resampler of ticks into bid/ask bars.
+
+    The ticks are fed in chunks, e.g. the chunks of
+    fxcmpy_tick_data_reader.iter_chunks(). Every chunk is aggregated with
+    array operations on the boundaries of its bars, the last bar of a chunk
+    is kept as partial bar and merged with the first bar of the next chunk.
+    Only the bars completed so far are returned, so the ticks need to be
+    held in memory one chunk at a time.
+
+    Every bar holds the open, close, high and low of bid and ask, the mean,
+    minimum and maximum of the spread ask - bid and the number of ticks.
+    Intervals without ticks do not produce a bar. The bars are labeled with
+    their start time. Bars of a fixed frequency are aligned to the Unix
+    epoch, 1970-01-01 00:00 UTC, like pandas resample() with
+    origin='epoch'. They start at midnight UTC only if their length divides
+    a day; '7min' bars, for example, do not restart every day and '7D' bars
+    start on Thursdays. Use the FXCM periods for bars aligned to the
+    trading sessions.
+
+    Usage:
+
+    resampler = fxcmpy_tick_resampler('5min')
+    for chunk in reader.iter_chunks():
+        bars = resampler.feed(chunk)
+        ...
+    bars = resampler.close()
+    """
+
+    def __init__(self, freq):
+        """ Constructor.
+
+        Arguments:
+
+        freq: string or pandas.Timedelta,
+            the length of the bars, either a fixed frequency like '10s',
+            '1min' or '4h' aligned to the Unix epoch, or one of the FXCM
+            periods 'm1', 'm5', 'm15', 'm30', 'H1', 'H2', 'H3', 'H4', 'H6',
+            'H8', 'D1', 'W1' or 'M1' aligned to the trading sessions, see
+            resample_candles().
+        """
+
+        self.period = None
+        self.step = None
+        if isinstance(freq, str) and (freq in PERIOD_FREQUENCIES or
+                                      freq in ('W1', 'M1')):
+            if freq in ('m1', 'm5', 'm15', 'm30', 'H1'):
+                freq = PERIOD_FREQUENCIES[freq]
+            else:
+                self.period = freq
+        if self.period is None:
+            try:
+                self.step = int(pd.Timedelta(freq).value)
+            except:
+                raise ValueError('freq must be a fixed frequency or one of '
+                                 '%s.' % (list(PERIOD_FREQUENCIES) +
+                                          ['W1', 'M1']))
+            if self.step <= 0:
+                raise ValueError('freq must be positive.')
+        self.freq = freq
+        self.partial = None
+        self.ticks = 0
+
+    def feed(self, data):
+        """ Add a chunk of ticks and return the bars completed by it.
+
+        Arguments:
+
+        data: pandas.DataFrame,
+            ticks with a DatetimeIndex in UTC and the columns 'Bid' and
+            'Ask', sorted by date and not older than the ticks fed before.
+
+        Returns:
+
+        A pandas DataFrame of the completed bars, possibly empty.
+        """
+
+        return self.__to_frame__(self.__feed__(data))
+
+    def close(self):
+        """ Return the last, partial bar as pandas DataFrame and reset the
+        resampler."""
+
+        ret = self.__to_frame__(self.partial)
+        self.partial = None
+        return ret
+
+    def resample(self, chunks):
+        """ Feed all chunks of the iterable chunks, close the resampler and
+        return all bars as one pandas DataFrame."""
+
+        bars = [self.__feed__(chunk) for chunk in chunks]
+        bars.append(self.partial)
+        self.partial = None
+        bars = [item for item in bars if item is not None]
+        if len(bars) == 0:
+            return self.__to_frame__(None)
+        return self.__to_frame__(dict((key, np.concatenate(
+                                           [item[key] for item in bars]))
+                                      for key in bars[0]))
+
+    def __feed__(self, data):
+        """ Add a chunk of ticks and return the completed bars as dict of
+        arrays or None. """
+
+        if 'Bid' not in data.columns or 'Ask' not in data.columns:
+            raise ValueError("data must have the columns 'Bid' and 'Ask'.")
+        if len(data) == 0:
+            return None
+        index = pd.DatetimeIndex(data.index)
+        if index.tz is not None:
+            index = index.tz_convert('UTC').tz_localize(None)
+        dates = index.values.astype('datetime64[ns]').view(np.int64)
+        bid = data['Bid'].to_numpy(dtype=np.float64)
+        ask = data['Ask'].to_numpy(dtype=np.float64)
+        if len(dates) > 1 and (dates[1:] < dates[:-1]).any():
+            order = np.argsort(dates, kind='stable')
+            dates, bid, ask = dates[order], bid[order], ask[order]
+
+        bars = self.__aggregate__(self.__get_labels__(dates), bid, ask)
+        self.ticks += len(dates)
+        if self.partial is not None:
+            if bars['date'][0] < self.partial['date'][0]:
+                raise ValueError('data must not be older than the ticks fed '
+                                 'before.')
+            if bars['date'][0] == self.partial['date'][0]:
+                bars = self.__merge__(self.partial, bars)
+            else:
+                bars = self.__concat__(self.partial, bars)
+        self.partial = self.__take__(bars, slice(-1, None))
+        return self.__take__(bars, slice(None, -1))
+
+    def __get_labels__(self, dates):
+        """ Return the start of the bar of every date as int64 nanoseconds.
+        Bars of a fixed frequency are multiples of the step since the Unix
+        epoch. """
+
+        if self.period is not None:
+            labels = get_session_labels(pd.DatetimeIndex(dates.view(
+                                            'datetime64[ns]')), self.period)
+            return labels.values.astype('datetime64[ns]').view(np.int64)
+        return dates - dates % self.step
+
+    def __aggregate__(self, labels, bid, ask):
+        """ Aggregate the ticks of every label, labels being sorted. """
+
+        first = np.concatenate(([0], np.flatnonzero(labels[1:] !=
+                                                    labels[:-1]) + 1))
+        last = np.concatenate((first[1:], [len(labels)])) - 1
+        spread = ask - bid
+        return {'date': labels[first],
+                'bidopen': bid[first], 'bidclose': bid[last],
+                'bidhigh': np.maximum.reduceat(bid, first),
+                'bidlow': np.minimum.reduceat(bid, first),
+                'askopen': ask[first], 'askclose': ask[last],
+                'askhigh': np.maximum.reduceat(ask, first),
+                'asklow': np.minimum.reduceat(ask, first),
+                'spreadsum': np.add.reduceat(spread, first),
+                'spreadmin': np.minimum.reduceat(spread, first),
+                'spreadmax': np.maximum.reduceat(spread, first),
+                'tickqty': last - first + 1}
+
+    def __merge__(self, partial, bars):
+        """ Merge the partial bar into the first of bars. """
+
+        ret = dict((key, values.copy()) for key, values in bars.items())
+        for key in ('bidopen', 'askopen'):
+            ret[key][0] = partial[key][0]
+        for key in ('bidhigh', 'askhigh', 'spreadmax'):
+            ret[key][0] = max(partial[key][0], ret[key][0])
+        for key in ('bidlow', 'asklow', 'spreadmin'):
+            ret[key][0] = min(partial[key][0], ret[key][0])
+        for key in ('spreadsum', 'tickqty'):
+            ret[key][0] += partial[key][0]
+        return ret
+
+    def __concat__(self, first, second):
+        return dict((key, np.concatenate((first[key], second[key])))
+                    for key in first)
+
+    def __take__(self, bars, rows):
+        return dict((key, values[rows]) for key, values in bars.items())
+
+    def __to_frame__(self, bars):
+        if bars is None:
+            index = pd.DatetimeIndex([], dtype='datetime64[ns]', name='date')
+            return pd.DataFrame(dict((col, np.empty(0, dtype=np.int64 if
+                                                    col == 'tickqty' else
+                                                    np.float64))
+                                     for col in BAR_COLUMNS), index=index)
+        data = dict((col, bars[col]) for col in BAR_COLUMNS
+                    if col != 'spreadmean')
+        data['spreadmean'] = bars['spreadsum'] / bars['tickqty']
+        index = pd.DatetimeIndex(bars['date'].view('datetime64[ns]'),
+                                 name='date')
+        return pd.DataFrame(data, index=index, columns=BAR_COLUMNS)
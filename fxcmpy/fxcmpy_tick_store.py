@@ -0,0 +1,237 @@
+#
+# fxcmpy_tick_store -- A Python Wrapper Class for the
+# RESTful API as provided by FXCM Forex Capital Markets Ltd.
+#
+# Proof-of-Concept | Prototype Version for Illustration
+# by The Python Quants GmbH
+#
+# The codes contained herein come without warranties or representations,
+# to the extent permitted by applicable law.
+#
+# Read the RISK DISCLAIMER carefully.
+#
+# (c) FXCM Forex Capital Markets Ltd.
+#
+
+
+import json
+import os
+import shutil
+import uuid
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+
+
+class fxcmpy_tick_store(object):
+    """ A columnar binary store for historical ticks and candles.
+
+    The data of every symbol is kept in partitions, one per weekly or
+    yearly file of the data readers. A partition is a directory with one
+    NumPy .npy file per column, the dates as int64 nanoseconds. The file
+    index.json of every symbol holds the first and last date and the number
+    of rows of its partitions.
+
+    Reading memory-maps only the partitions overlapping the requested range
+    and returns views of the mapped files, nothing is parsed or copied if
+    the range lies within one partition.
+
+    Usage:
+
+    reader = fxcmpy_tick_data_reader('EURUSD', start, stop,
+                                     store_dir='/path/to/store')
+    data = reader.get_data(start, end)
+    """
+
+    def __init__(self, path, dtype='float64'):
+        """ Constructor.
+
+        Arguments:
+
+        path: string,
+            the directory of the store, created if it does not exist.
+
+        dtype: string (default 'float64'),
+            the type the prices are stored with, 'float64' or 'float32'.
+        """
+
+        if dtype not in ('float64', 'float32'):
+            raise ValueError("dtype must be 'float64' or 'float32'.")
+        self.path = path
+        self.dtype = dtype
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self.lock = Lock()
+
+    def has(self, name, partition):
+        """ Return True if the partition of name is stored."""
+
+        return partition in self.get_index(name)
+
+    def get_index(self, name):
+        """ Return a dict mapping the partitions of name to dicts with the
+        first and last date in nanoseconds ('min', 'max'), the number of rows
+        and the columns."""
+
+        filename = os.path.join(self.__directory__(name), 'index.json')
+        try:
+            with open(filename, 'r') as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return dict()
+
+    def get_partitions(self, name, start=None, end=None):
+        """ Return the partitions of name overlapping the range from start to
+        end, ordered by their first date."""
+
+        index = self.get_index(name)
+        first = self.__nanoseconds__(start, np.iinfo(np.int64).min)
+        last = self.__nanoseconds__(end, np.iinfo(np.int64).max)
+        partitions = [partition for partition, entry in index.items()
+                      if entry['rows'] > 0 and entry['max'] >= first and
+                      entry['min'] <= last]
+        return sorted(partitions, key=lambda partition:
+                      (index[partition]['min'], partition))
+
+    def write(self, name, partition, data):
+        """ Store a partition.
+
+        Arguments:
+
+        name: string,
+            the name of the data, e.g. the symbol.
+
+        partition: string,
+            the name of the partition, e.g. '2018-W01'.
+
+        data: pandas.DataFrame,
+            the data with a DatetimeIndex. Its numerical columns are stored
+            with the dtype of the store.
+        """
+
+        if not data.index.is_monotonic_increasing:
+            data = data.sort_index(kind='stable')
+        columns = [col for col in data.columns
+                   if np.issubdtype(data[col].dtype, np.number)]
+        dates = np.asarray(data.index.values, dtype='datetime64[ns]')
+
+        directory = self.__directory__(name)
+        target = os.path.join(directory, partition)
+        temp = '%s.%s.tmp' % (target, uuid.uuid4().hex)
+        os.makedirs(temp)
+        np.save(os.path.join(temp, 'date.npy'), dates.view(np.int64))
+        for col in columns:
+            np.save(os.path.join(temp, '%s.npy' % col),
+                    data[col].to_numpy(dtype=self.dtype))
+        with self.lock:
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            os.replace(temp, target)
+            index = self.get_index(name)
+            index[partition] = {'min': int(dates[0].view(np.int64))
+                                if len(dates) > 0 else 0,
+                                'max': int(dates[-1].view(np.int64))
+                                if len(dates) > 0 else 0,
+                                'rows': len(dates), 'columns': columns}
+            self.__write_index__(name, index)
+
+    def load(self, name, start=None, end=None, partitions=None):
+        """ Return the stored data of name between start and end as pandas
+        DataFrame with DatetimeIndex.
+
+        Arguments:
+
+        name: string,
+            the name of the data.
+
+        start, end: datetime or None (default None),
+            the range of the data, both included.
+
+        partitions: list or None (default None),
+            the partitions to read, all partitions overlapping the range if
+            None.
+
+        Returns:
+
+        A pandas DataFrame of read-only views of the memory-mapped
+        partitions if the range lies within one partition, a copy
+        otherwise.
+        """
+
+        index = self.get_index(name)
+        if partitions is None:
+            partitions = self.get_partitions(name, start, end)
+        first = self.__nanoseconds__(start, None)
+        last = self.__nanoseconds__(end, None)
+        frames = list()
+        columns = None
+        for partition in partitions:
+            entry = index[partition]
+            columns = entry['columns']
+            if entry['rows'] == 0:
+                continue
+            frame = self.__map__(name, partition, columns, first, last)
+            if len(frame) > 0:
+                frames.append(frame)
+        if len(frames) == 1:
+            return frames[0]
+        if len(frames) > 1:
+            return pd.concat(frames)
+        return pd.DataFrame(columns=columns or [],
+                            index=pd.DatetimeIndex([], dtype='datetime64[ns]'))
+
+    def remove(self, name, partition=None):
+        """ Remove a partition of name or, if partition is None, all
+        partitions of name."""
+
+        directory = self.__directory__(name)
+        with self.lock:
+            if partition is None:
+                if os.path.isdir(directory):
+                    shutil.rmtree(directory)
+                return
+            index = self.get_index(name)
+            if partition in index:
+                del index[partition]
+                self.__write_index__(name, index)
+            target = os.path.join(directory, partition)
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+
+    def __map__(self, name, partition, columns, first, last):
+        """ Memory-map a partition and slice it to the range first, last."""
+
+        directory = os.path.join(self.__directory__(name), partition)
+        dates = np.load(os.path.join(directory, 'date.npy'), mmap_mode='r')
+        lower = 0
+        upper = len(dates)
+        if first is not None:
+            lower = np.searchsorted(dates, first, 'left')
+        if last is not None:
+            upper = np.searchsorted(dates, last, 'right')
+        upper = max(lower, upper)
+        data = dict()
+        for col in columns:
+            values = np.load(os.path.join(directory, '%s.npy' % col),
+                             mmap_mode='r')
+            data[col] = values[lower:upper]
+        index = pd.DatetimeIndex(dates[lower:upper].view('datetime64[ns]'),
+                                 copy=False)
+        return pd.DataFrame(data, index=index, columns=columns, copy=False)
+
+    def __write_index__(self, name, index):
+        filename = os.path.join(self.__directory__(name), 'index.json')
+        temp = '%s.%s.tmp' % (filename, uuid.uuid4().hex)
+        with open(temp, 'w') as f:
+            json.dump(index, f, indent=1, sort_keys=True)
+        os.replace(temp, filename)
+
+    def __directory__(self, name):
+        return os.path.join(self.path, name.replace('/', '').replace(os.sep,
+                                                                     '_'))
+
+    def __nanoseconds__(self, date, default):
+        if date is None:
+            return default
+        return int(pd.Timestamp(date).as_unit('ns').value)
@@ -20,14 +20,20 @@ setup(
     url = 'https://github.com/fxcm/fxcmpy', 
     download_url = 'https://github.com/fxcm/fxcmpy', 
     keywords = 'FXCM API Python Wrapper Finance Algo Trading',
-    install_requires=['pandas', 'socketIO_client', 'configparser', 'requests'], 
-    python_requires='>=3.4',
+    install_requires=['numpy', 'pandas>=2.0', 'socketIO_client',
+                      'configparser', 'requests'],
+    python_requires='>=3.8',
+    entry_points={
+        'console_scripts': ['fxcmpy-download=fxcmpy.fxcmpy_download:main']
+    },
     include_package_data = True,
     package_data={
         '': ['*.txt']
     },
-    classifiers = ['Programming Language :: Python :: 3.4',
-                   'Programming Language :: Python :: 3.5',
-                   'Programming Language :: Python :: 3.6'],
+    classifiers = ['Programming Language :: Python :: 3.8',
+                   'Programming Language :: Python :: 3.9',
+                   'Programming Language :: Python :: 3.10',
+                   'Programming Language :: Python :: 3.11',
+                   'Programming Language :: Python :: 3.12'],
 
 )